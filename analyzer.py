@@ -39,8 +39,16 @@ import scipy.signal as signal
 from datetime import datetime, timedelta
 from collections import defaultdict
 # import nitime
-import scipy.optimize as opt
-import igraph as ig
+
+from spikestore import get_spike_store
+from netgraph import get_network_graph
+from syntable import SynapseTable, get_synapse_table, get_synapse_index
+from runconfig import get_runconfig
+import epochs
+import psth
+from probabilities import spike_following_probability_grid
+from pairsampler import PairSampler
+from batchrun import run_batch, print_report
 
 # This is mostly taken from SciPy cookbook FIR filter example.
 # See: http://www.scipy.org/Cookbook/FIRFilter
@@ -176,19 +184,15 @@ def is_spiking(filehandle, cellname, ignore_time):
     return False
 
 def get_spiking_cellnames(filehandle, celltype, ignoretime):
-    ret = []
-    for spiking_cell in filehandle['spikes']:
-        if spiking_cell.startswith(celltype) and is_spiking(filehandle, spiking_cell, ignoretime):
-            ret.append(spiking_cell)
-    return ret
+    store = get_spike_store(filehandle)
+    rows = store.rows(celltype)
+    # spike trains are sorted, so it is enough to check the last spike
+    spiking = rows[store.last_spikes(rows) > ignoretime]
+    return store.names[spiking].tolist()
     
 def get_presynaptic_cells(netfile, cellname):
-    """Return a list of all presynaptic cell names"""
-    precells = set()
-    for item in netfile['/network/synapse']:
-        if cellname in item[1]:
-            precells.add(item[0].partition('/')[0])
-    return precells
+    """Return a set of all presynaptic cell names"""
+    return set(get_synapse_index(netfile.filename).presynaptic(cellname))
 
 def find_presynaptic_spike_sources(netfile, datafile, cellname, ignore_time):
     """Return a list of presynaptic cells that fired.
@@ -202,29 +206,24 @@ def find_presynaptic_spike_sources(netfile, datafile, cellname, ignore_time):
     ignore_time -- ignore spikes before this time    
     
     """
-    source_cells = []
-    spiking_sources = []
-    for item in netfile['/network/synapse']:
-        target_cell = item[1].partition('/')[0]        
-        if target_cell == cellname:
-            source_cells.append(item[0].partition('/')[0])
-    for cell in source_cells:
-        if is_spiking(datafile, cell, ignore_time):
-            spiking_sources.append(cell)
-    return spiking_sources
+    source_cells = get_synapse_index(netfile.filename).presynaptic(cellname)
+    store = get_spike_store(datafile)
+    source_cells = [cell for cell in source_cells if cell in store]
+    rows = np.array([store.index[cell] for cell in source_cells], dtype=np.int64)
+    # spike trains are sorted, so it is enough to check the last spike
+    spiking = np.nonzero(store.last_spikes(rows) > ignore_time)[0]
+    return [source_cells[ii] for ii in spiking]
 
 def get_pre_spikes(netfile, datafile, spiking_cells, ignore_time):
     """Get the datasets for all presynaptic entites that spiked for
     the cells in spiking_cells list"""
     src_set = defaultdict(list)
     ret = {}
+    store = get_spike_store(datafile)
     for cell in spiking_cells:
-        sources = find_presynaptic_spike_sources(netfile, datafile, cell, ignore_time)
-        for src in sources:
-            if src not in src_set[cell]:
-                src_set[cell].append(src)
+        src_set[cell].extend(find_presynaptic_spike_sources(netfile, datafile, cell, ignore_time))
         ectopic_src = 'ectopic_'+cell
-        if is_spiking(datafile, ectopic_src, ignore_time):
+        if ectopic_src in store and store.last_spikes(np.array([store.index[ectopic_src]]))[0] > ignore_time:
             src_set[cell].append(ectopic_src)
     for key, value in src_set.items():
         ret[key] = [datafile['spikes'][v] for v in value]
@@ -252,25 +251,13 @@ def plot_spikes_and_prespikes(netfile, datafile, spiking_cells, ignore_time):
              jj += 1
 
 def get_simtime(filehandle):
-    ret = None
-    for row in filehandle['runconfig']['scheduling']:
-        if row[0] == 'simtime':
-            ret = float(row[1])
-    return ret
+    return get_runconfig(filehandle).simtime
 
 def get_simdt(filehandle):
-    ret = None
-    for row in filehandle['runconfig']['scheduling']:
-        if row[0] == 'simdt':
-            ret = float(row[1])
-    return ret
+    return get_runconfig(filehandle).simdt
 
 def get_plotdt(filehandle):
-    ret = None
-    for row in filehandle['runconfig']['scheduling']:
-        if row[0] == 'plotdt':
-            ret = float(row[1])
-    return ret
+    return get_runconfig(filehandle).plotdt
 
 def get_bgtimes(filehandle):
     stim_bg = filehandle['stimulus']['stim_bg'][:]
@@ -365,67 +352,24 @@ def find_spikes_by_stim(datafile, netfile, timewindow):
 
 def get_bgstim_aligned_chunks(datafile, cellname):
     ret = []
-    spikes = datafile['/spikes']
-    simtime = get_simtime(datafile)    
-    stimulus_node = datafile['/runconfig/stimulus']
-    stimulus_info = {}
-    for row in stimulus_node:
-        try:
-            value = int(row[1])
-        except ValueError:
-            try:
-                value = float(row[1])
-            except ValueError:
-                value = row[1]
-        stimulus_info[row[0]] = value
+    store = get_spike_store(datafile)
+    stimulus_info = get_stiminfo_dict(datafile)
     stim_width = stimulus_info['bg_interval'] + stimulus_info['pulse_width'] + stimulus_info['isi']
     print cellname, stim_width
-    for name in spikes:
+    t_stim = stimulus_info['onset'] + stimulus_info['bg_interval']
+    for name in store:
         if cellname in name and not name.startswith('ectopic'):
-            t_stim = stimulus_info['onset'] + stimulus_info['bg_interval']
-            spiketrain = spikes[name][:] - t_stim
-            indices = np.nonzero(spiketrain > 0)[0]
-            while len(indices) > 0:
-                spiketrain = spiketrain[indices]
-                chunk_indices = np.nonzero(spiketrain < stim_width)[0]                
-                if len(chunk_indices) > 0:
-                    chunk = spiketrain[chunk_indices]
-                    ret.append(chunk)
-                spiketrain = spiketrain - stim_width
-                indices = np.nonzero(spiketrain > 0)[0]
+            ret += extract_chunks(store[name], t_stim, stim_width)
     return (ret, stim_width)
     
 def calculate_psth(datafile, cellname, binsize):
-    spikes = datafile['/spikes']
-    simtime = get_simtime(datafile)    
-    stimulus_node = datafile['/runconfig/stimulus']
-    stimulus_info = {}
-    for row in stimulus_node:
-        try:
-            value = int(row[1])
-        except ValueError:
-            try:
-                value = float(row[1])
-            except ValueError:
-                value = row[1]
-        stimulus_info[row[0]] = value
+    store = get_spike_store(datafile)
+    stimulus_info = get_stiminfo_dict(datafile)
     stim_width = stimulus_info['bg_interval'] + stimulus_info['pulse_width'] + stimulus_info['isi']
-    psth = np.zeros(int(stim_width/binsize))
     bins = np.arange(0, stim_width, binsize)
-    for name in spikes:
-        if cellname in name and not name.startswith('ectopic'):
-            t_stim = stimulus_info['onset'] + stimulus_info['bg_interval']
-            spiketrain = spikes[name][:] - t_stim
-            indices = np.nonzero(spiketrain > 0)[0]
-            while len(indices) > 0:
-                spiketrain = spiketrain[indices]
-                chunk_indices = np.nonzero(spiketrain < stim_width)[0]                
-                if len(chunk_indices) > 0:
-                    chunk = spiketrain[chunk_indices]
-                    psth += np.histogram(chunk, bins)[0]
-                spiketrain = spiketrain - stim_width
-                indices = np.nonzero(spiketrain > 0)[0]
-    return (psth, bins)
+    t_stim = stimulus_info['onset'] + stimulus_info['bg_interval']
+    counts, trials, = psth.stim_aligned_counts(store, [cellname], t_stim, stim_width, bins)
+    return (counts[0], bins)
 
 def plot_psth(datafile, celltypes, binsize):
     celltype_st_map = {}
@@ -446,111 +390,188 @@ def plot_psth(datafile, celltypes, binsize):
     return celltype_st_map
 
 def get_stiminfo_dict(fhandle):
-    stimulus_node = fhandle['/runconfig/stimulus']
-    stimulus_info = {}
-    for row in stimulus_node:
-        try:
-            value = int(row[1])
-        except ValueError:
-            try:
-                value = float(row[1])
-            except ValueError:
-                value = row[1]
-        stimulus_info[row[0]] = value
-    return stimulus_info
+    return dict(get_runconfig(fhandle).stimulus)
 
 def extract_chunks(spiketrain, stimstart, stimwidth):
-    ret = []
-    spiketrain = spiketrain - stimstart
-    indices = np.nonzero(spiketrain > 0)[0]
-    while len(indices) > 0:
-        spiketrain = spiketrain[indices]
-        indices = np.nonzero(spiketrain < stimwidth)[0]
-        if len(indices) > 0:
-            chunk = spiketrain[indices]
-            ret.append(chunk)
-        spiketrain = spiketrain - stimwidth
-        indices = np.nonzero(spiketrain > 0)[0]
-    return ret
-
-def chunks_from_multiple_datafile(filenames, celltypes, bg_interval=None, isi=None, pulse_width=None):    
+    """Cut spiketrain into consecutive chunks of stimwidth starting
+    at stimstart. Returns the non-empty chunks with the spike times
+    relative to the start of each chunk. Spikes falling exactly on a
+    chunk boundary are dropped."""
+    spiketrain = np.asarray(spiketrain)
+    if len(spiketrain) == 0:
+        return []
+    starts = epochs.periodic_starts(stimstart, stimwidth, spiketrain.max())
+    epoch_ids, reltimes, = epochs.align_spikes(spiketrain, starts, stimwidth, inclusive_start=False)
+    return [chunk for chunk in epochs.split_by_epoch(epoch_ids, reltimes, len(starts)) if len(chunk) > 0]
+
+def stimulus_params(fhandle, bg_interval=None, isi=None, pulse_width=None):
+    """Return (t_stim, stim_width) for the background stimulus cycle
+    of an open data file, or None if bg_interval, isi and pulse_width
+    are all specified and the file has a different bg_interval or
+    isi."""
+    stimulus_info = get_stiminfo_dict(fhandle)
+    if (bg_interval is not None and isi is not None and pulse_width is not None) and (float(stimulus_info['bg_interval']) != bg_interval or float(stimulus_info['isi']) != isi):
+        return None
+    stim_width = stimulus_info['bg_interval'] + stimulus_info['pulse_width'] + stimulus_info['isi']
+    t_stim = stimulus_info['onset'] + stimulus_info['bg_interval']
+    return (t_stim, stim_width)
+
+def collect_file_chunks(filename, celltypes, bg_interval=None, isi=None, pulse_width=None):
+    """Spikes of each celltype in one data file cut into chunks
+    aligned with the first of the background pulse pair.
+
+    Returns None if the file is skipped (see stimulus_params),
+    otherwise (stim_width, parts) where parts has an entry
+    (reltimes, chunk_ids, nchunks, ncells) for each celltype (see
+    psth.aligned_chunks)."""
+    fhandle = h5.File(filename, 'r')
+    try:
+        params = stimulus_params(fhandle, bg_interval, isi, pulse_width)
+        if params is None:
+            return None
+        store = get_spike_store(fhandle)
+    finally:
+        fhandle.close()
+    t_stim, stim_width, = params
+    return (stim_width, psth.aligned_chunks(store, celltypes, t_stim, stim_width))
+
+def collect_chunks_multifile(filenames, celltypes, bg_interval=None, isi=None, pulse_width=None, workers=None):
+    """Run collect_file_chunks on all the files in filenames in
+    `workers` processes (all CPUs if None) and merge the results.
+
+    Returns (chunks, stim_width_map, cellcount_map) where
+    chunks[celltype] is (reltimes, chunk_ids, nchunks) over all the
+    files (see psth.merge_chunks), stim_width_map maps each file
+    used to its stimulus cycle and cellcount_map[celltype] is the
+    number of cells of celltype in all the files."""
+    results = run_batch(collect_file_chunks, filenames, args=(celltypes, bg_interval, isi, pulse_width), workers=workers)
+    failed = [result for result in results if not result.ok]
+    if len(failed) > 0:
+        print_report(failed)
+        raise RuntimeError('Could not read spikes from %d files, first: %s' % (len(failed), failed[0].item))
+    stim_width_map = {}
+    parts = defaultdict(list)
+    cellcount_map = defaultdict(int)
+    for result in results:
+        if result.value is None:
+            continue
+        stim_width, file_parts, = result.value
+        stim_width_map[result.item] = stim_width
+        for celltype, part, in zip(celltypes, file_parts):
+            parts[celltype].append(part)
+            cellcount_map[celltype] += part[3]
+    chunks = dict([(celltype, psth.merge_chunks(parts[celltype])) for celltype in celltypes])
+    return (chunks, stim_width_map, cellcount_map)
+
+def chunks_from_multiple_datafile(filenames, celltypes, bg_interval=None, isi=None, pulse_width=None, workers=None):
     """Collect spiketimes for each entry in celltypes from all files
     in filenames into chunks aligned with first of the background
-    pulse pair."""
+    pulse pair.
+
+    Returns (chunks, stim_width_map, cellcount_map) where
+    chunks[celltype][filename] is the list of non-empty chunks. See
+    collect_chunks_multifile for the same data as arrays."""
+    results = run_batch(collect_file_chunks, filenames, args=(celltypes, bg_interval, isi, pulse_width), workers=workers)
     ret = {}
     stim_width_map = {}
     cellcount_map = defaultdict(int)
     for celltype in celltypes:
         ret[celltype] = defaultdict(list)
-    for filename in filenames:
-        fhandle = h5.File(filename, 'r')
-        simtime = get_simtime(fhandle)    
-        stimulus_info = get_stiminfo_dict(fhandle)
-        if (bg_interval is not None and isi is not None and pulse_width is not None) and (float(stimulus_info['bg_interval']) != bg_interval or float(stimulus_info['isi']) != isi):
+    for result in results:
+        if not result.ok:
+            raise RuntimeError('Could not read spikes from %s:\n%s' % (result.item, result.error))
+        if result.value is None:
             continue
-            
-        stim_width = stimulus_info['bg_interval'] + stimulus_info['pulse_width'] + stimulus_info['isi']
-        stim_width_map[filename] = stim_width
-        t_stim = stimulus_info['onset'] + stimulus_info['bg_interval']
-        spikes = fhandle['/spikes']
-        for name in spikes:
-            for celltype in celltypes:
-                if not celltype.startswith('ectopic') and celltype in name:
-                    chunks = extract_chunks(spikes[name][:], t_stim, stim_width)
-                    ret[celltype][filename] += chunks
-                    cellcount_map[celltype] += 1
-        fhandle.close()
+        stim_width, file_parts, = result.value
+        stim_width_map[result.item] = stim_width
+        for celltype, (reltimes, chunk_ids, nchunks, ncells), in zip(celltypes, file_parts):
+            ret[celltype][result.item] = epochs.split_by_epoch(chunk_ids, reltimes, nchunks)
+            cellcount_map[celltype] += ncells
     return (ret, stim_width_map, cellcount_map)
 
-def psth_multifile(filenames, celltypes, binsize, combined=False, bg_interval=None, isi=None, pulse_width=None):
+def file_psth_counts(filename, celltypes, bins, bg_interval=None, isi=None, pulse_width=None):
+    """PSTH counts and trials for each entry in celltypes in one data
+    file (see psth.stim_aligned_counts), or None if the file is
+    skipped (see stimulus_params)."""
+    fhandle = h5.File(filename, 'r')
+    try:
+        params = stimulus_params(fhandle, bg_interval, isi, pulse_width)
+        if params is None:
+            return None
+        store = get_spike_store(fhandle)
+        simtime = get_simtime(fhandle)
+    finally:
+        fhandle.close()
+    t_stim, stim_width, = params
+    return psth.stim_aligned_counts(store, celltypes, t_stim, stim_width, bins, stop=simtime)
+
+def psth_counts_multifile(filenames, celltypes, binsize, bg_interval=None, isi=None, pulse_width=None, workers=None):
+    """Compute the PSTH counts for each entry in celltypes in each
+    file in filenames.
+
+    If bg_interval, isi and pulse_width are all specified, files with
+    a different bg_interval or isi are skipped.
+
+    The files are counted in parallel by `workers` processes (all
+    CPUs if None).
+
+    Returns (bins, counts, trials) where bins are the bin edges common
+    to all the files, covering the longest stimulus cycle, counts is
+    a dict mapping filename to a (celltype x bin) count matrix and
+    trials maps filename to the number of stimulus presentations x
+    cells for each celltype."""
+    stim_widths = {}
+    for filename in filenames:
+        fhandle = h5.File(filename, 'r')
+        params = stimulus_params(fhandle, bg_interval, isi, pulse_width)
+        fhandle.close()
+        if params is not None:
+            stim_widths[filename] = params[1]
+    if len(stim_widths) == 0:
+        return (np.arange(0, 0), {}, {})
+    if bg_interval is None or isi is None or pulse_width is None:
+        stim_width = max(stim_widths.values())
+    else:
+        stim_width = bg_interval + isi + pulse_width
+    bins = np.arange(0, stim_width, binsize)
+    used = [filename for filename in filenames if filename in stim_widths]
+    results = run_batch(file_psth_counts, used, args=(celltypes, bins, bg_interval, isi, pulse_width), workers=workers)
+    counts = {}
+    trials = {}
+    for result in results:
+        if not result.ok:
+            raise RuntimeError('Could not compute PSTH for %s:\n%s' % (result.item, result.error))
+        counts[result.item], trials[result.item], = result.value
+    return (bins, counts, trials)
+
+def psth_multifile(filenames, celltypes, binsize, combined=False, bg_interval=None, isi=None, pulse_width=None, workers=None):
     numrows = len(celltypes)
-    chunks, stimwidths, cellcounts = chunks_from_multiple_datafile(filenames, celltypes, bg_interval=bg_interval, isi=isi, pulse_width=pulse_width)
+    bins, counts, trials, = psth_counts_multifile(filenames, celltypes, binsize, bg_interval=bg_interval, isi=isi, pulse_width=pulse_width, workers=workers)
+    if len(counts) == 0:
+        print 'No matching file'
+        return
+    rates = dict([(filename, psth.normalize(counts[filename], trials[filename], binsize)) for filename in counts])
+    if combined:
+        total_counts = np.sum(counts.values(), axis=0)
+        total_trials = np.sum(trials.values(), axis=0)
+        total_rates = psth.normalize(total_counts, total_trials, binsize)
     for ii in range(len(celltypes)):
         print 'Processing', celltypes[ii]
-        pylab.subplot(numrows, 1, ii)
+        pylab.subplot(numrows, 1, ii+1)
         pylab.title(celltypes[ii])
-        x = []
-        for filename, chunked_data in chunks[celltypes[ii]].items():
-            if len(chunked_data) == 0:
-                continue
-            tmp = np.concatenate(chunked_data)
-            print celltypes[ii], filename, tmp.shape
-            if len(tmp) == 0:
-                continue
-            if not combined:
-                tmp.sort()
-                bins = np.arange(0, stimwidths[filename], binsize)
-                hist, edges = np.histogram(tmp, bins)
-                hist = hist / (len(chunked_data) * binsize) # normalize by number of stim presentations and binsize
-                tmp = np.zeros(len(bins)-1)
-                tmp[:len(hist)] = hist[:]
-                pylab.bar(bins[:-1], tmp, binsize, label=os.path.basename(filename))
-                pylab.xlim(0, edges[-1])
-                maxy = pylab.ylim()[1]
-                pylab.yticks([int(y) for y in np.linspace(0, maxy, 5)])
-
-            else:
-                x = np.concatenate([x, tmp])
-            print 'Processed', filename, len(x)
-        if combined:
-            if bg_interval is None:
-                # print stimwidths.values()
-                stim_width = max(stimwidths.values())
-            else:
-                stim_width = bg_interval + isi + pulse_width
-            x.sort()            
-            print 'Total number of spikes', len(x)
-            bins = np.arange(0, stimwidths[filename], binsize)
-            hist, edges = np.histogram(x, bins)
-            hist = hist / (len(chunked_data) * binsize) # normalize by number of stim presentations and binsize
-            tmp = np.zeros(len(bins)-1)
-            tmp[:len(hist)] = hist[:]            
-            pylab.bar(bins[:-1], tmp, binsize, label=celltypes[ii])
-            pylab.xlim(0, edges[-1])
-            maxy = pylab.ylim()[1]
-            pylab.yticks([int(y) for y in np.linspace(0, maxy, 5)])
-        else:
+        if not combined:
+            for filename in rates:
+                print celltypes[ii], filename, np.sum(counts[filename][ii])
+                if np.sum(counts[filename][ii]) == 0:
+                    continue
+                pylab.bar(bins[:-1], rates[filename][ii], binsize, label=os.path.basename(filename))
             pylab.legend()
+        else:
+            print 'Total number of spikes', np.sum(total_counts[ii])
+            pylab.bar(bins[:-1], total_rates[ii], binsize, label=celltypes[ii])
+        pylab.xlim(0, bins[-1])
+        maxy = pylab.ylim()[1]
+        pylab.yticks([int(y) for y in np.linspace(0, maxy, 5)])
     pylab.subplots_adjust(hspace=1)
     pylab.show()
 
@@ -626,26 +647,32 @@ def cost_psth(binsize, timewindow, spiketrains):
     variance_count = np.var(hist)
     return (2 * mean_count - variance_count)/(num_spike_trains * binsize)**2
     
-def get_optimal_psth_binsize(spiketrain, timewindow, min_binsize, max_binsize):
-    xopt, fval, ierr, numfunc, = opt.fminbound(cost_psth, min_binsize, max_binsize, args=(timewindow, spiketrain), full_output=True, disp=3)
-    print 'optimal binsize:', xopt, 'cost:', fval, 'error code:', ierr, 'no. of evaluations:', numfunc
+def get_optimal_psth_binsize(spiketrain, timewindow, min_binsize, max_binsize, candidates=2000):
+    """Find the binsize minimizing cost_psth among `candidates`
+    equally spaced values between min_binsize and max_binsize
+    (inclusive). The cost is not smooth in the binsize, so the whole
+    range is scanned instead of a local search."""
+    binsizes = np.linspace(min_binsize, max_binsize, candidates)
+    spikes = np.concatenate(spiketrain) if len(spiketrain) > 0 else np.zeros(0)
+    xopt, fval, costs, = psth.optimal_binsize(spikes, timewindow, binsizes, len(spiketrain))
+    print 'optimal binsize:', xopt, 'cost:', fval, 'no. of evaluations:', len(binsizes)
     return xopt
 
             
         
-def plot_psth_optimal_binsize(filenames, celltypes, min_binsize, max_binsize, bg_interval, isi, pulse_width):
+def plot_psth_optimal_binsize(filenames, celltypes, min_binsize, max_binsize, bg_interval, isi, pulse_width, workers=None, candidates=2000):
     stimwidth = bg_interval + isi + pulse_width
-    spikechunks, stimwidths, cellcounts, = chunks_from_multiple_datafile(filenames, celltypes, bg_interval, isi, pulse_width)
-    spiketrains = defaultdict(list)
+    spikechunks, stimwidths, cellcounts, = collect_chunks_multifile(filenames, celltypes, bg_interval, isi, pulse_width, workers=workers)
+    binsizes = np.linspace(min_binsize, max_binsize, candidates)
     numrows = len(celltypes)
     ii = 1
     for cell in celltypes:        
-        for chunks in spikechunks[cell].values():
-            spiketrains[cell] += chunks
+        reltimes, chunk_ids, nchunks, = spikechunks[cell]
         print cell, 
-        binsize = get_optimal_psth_binsize(spiketrains[cell], stimwidth, min_binsize, max_binsize)
-        hist, edges, = get_psth(binsize, stimwidth, spiketrains[cell])
-        hist /= (len(spiketrains[cell]) * binsize)
+        binsize, cost, costs, = psth.optimal_binsize(reltimes, stimwidth, binsizes, nchunks)
+        print 'optimal binsize:', binsize, 'cost:', cost, 'no. of evaluations:', len(binsizes)
+        hist, edges, = np.histogram(reltimes, np.arange(0, stimwidth, binsize))
+        hist = hist / (nchunks * binsize)
         pylab.subplot(numrows, 1, ii)
         pylab.title(cell)
         pylab.bar(edges[:-1], hist, binsize, label=cell)
@@ -657,60 +684,49 @@ def plot_psth_optimal_binsize(filenames, celltypes, min_binsize, max_binsize, bg
     pylab.show()
 
 def plot_conncounts(netfilepath):
-    netfile = h5.File(netfilepath, 'r')
-    syn = np.asarray(netfile['/network/synapse'])
-    netfile.close()
-    conndict = defaultdict(int)
-    for row in syn:
-        conn = row[0] + '-' + row[1]
-        conndict[conn] += 1
-    pylab.plot(range(len(conndict)), conndict.values(), '.')
-    # pylab.xticks(np.array(range(len(syn))), conndict.keys())
+    """Plot number of synapses between each connected compartment
+    pair"""
+    rows, counts, = get_synapse_table(netfilepath).compartment_pair_counts()
+    pylab.plot(range(len(counts)), counts, '.')
     pylab.show()
 
 def plot_cellcell_conncounts(netfilepath):
     """Plot number synapses between each connected cell pair"""
-    netfile = h5.File(netfilepath, 'r')
-    syn = np.asarray(netfile['/network/synapse'])
-    netfile.close()
-    conndict = defaultdict(int)
-    for row in syn:
-        conn = row[0].partition('/')[0] + '-' + row[1].partition('/')[0]
-        conndict[conn] += 1
-    pylab.plot(range(len(conndict)), conndict.values(), '.')
-    pylab.xticks(np.array(range(len(syn))), conndict.keys())
+    table = get_synapse_table(netfilepath)
+    rows, counts, = table.cell_pair_counts()
+    pylab.plot(range(len(counts)), counts, '.')
+    pylab.xticks(np.arange(len(counts)), table.pair_labels(rows).tolist())
     pylab.show()
 
 def get_cellcell_conncounts(netfilepath):
     """Return number synapses between each connected cell pair"""
-    netfile = h5.File(netfilepath, 'r')
-    syn = np.asarray(netfile['/network/synapse'])
-    netfile.close()
-    conndict = defaultdict(int)
-    for row in syn:
-        conn = row[0].partition('/')[0] + '-' + row[1].partition('/')[0]
-        conndict[conn] += 1
-    return conndict
-
-def find_bad_files(netfilelist):
+    table = get_synapse_table(netfilepath)
+    rows, counts, = table.cell_pair_counts()
+    return dict(zip(table.pair_labels(rows).tolist(), counts.tolist()))
+
+def max_conncount(netfilepath):
+    """Largest number of synapses between any pair of compartments in
+    a network file. Reads the file without writing a sidecar or
+    keeping the table, as this is for checking files."""
+    rows, counts, = SynapseTable(netfilepath, cache=False).compartment_pair_counts()
+    if len(counts) == 0:
+        return 0
+    return int(counts.max())
+
+def find_bad_files(netfilelist, maxcount=2, workers=None):
     """A counterpart of plot_conncounts to find out files that have
-    compartment-pairs with excess connections or are not readable"""
+    compartment-pairs with more than maxcount connections or are not
+    readable. The files are checked in parallel by `workers`
+    processes (all CPUs if None).
+
+    Returns (io_err_list, conn_err_list)."""
     io_err_list = []
     conn_err_list = []
-    for filename in netfilelist:
-        try:
-            netfile = h5.File(filename, 'r')
-            syn = np.asarray(netfile['/network/synapse'])
-            netfile.close()
-        except Exception, e:
-            io_err_list.append(filename)
-            continue
-        conndict = defaultdict(int)
-        for row in syn:
-            conn = row[0] + '-' + row[1]
-            conndict[conn] += 1
-        if max(conndict.values()) > 2:
-            conn_err_list.append(filename)
+    for result in run_batch(max_conncount, netfilelist, workers=workers):
+        if not result.ok:
+            io_err_list.append(result.item)
+        elif result.value > maxcount:
+            conn_err_list.append(result.item)
     return (io_err_list, conn_err_list)
 
 def firstspike_time(tstart, train):
@@ -735,71 +751,19 @@ def get_cell_index(cellstartindices, cellname):
     return cellstartindices[celltype] + int(index)
 
 def load_cell_graph(netfilepath):
-    filehandle = h5.File(netfilepath, 'r')
-    syninfo = np.asarray(filehandle['/network/synapse'])
-    cellinfo = np.asarray(filehandle['/runconfig/cellcount'])
-    filehandle.close()
-    # first extract the starting index of the celltypes in whole population
-    cellstart = {}
-    startindex = 0    
-    for row in cellinfo:
-        cellstart[row[0]] = startindex
-        startindex += int(row[1])
-    edges = defaultdict(set)
-    for row in syninfo:
-        src_name = row[0].partition('/')[0]        
-        celltype, index_str, = src_name.split('_')
-        src = cellstart[celltype] + int(index_str)
-        dst_name = row[1].partition('/')[0]
-        celltype, index_str, = dst_name.split('_')
-        dst = cellstart[celltype] + int(index_str)
-        edges[row[2]].add((src, dst))
-    cellgraph = ig.Graph(0, directed=True)
-    cellgraph.add_vertices(startindex)
-    cellgraph.vs['name'] = ['%s_%d' % (celltype, index) for (celltype, count) in cellinfo for index in range(int(count))]
-    celltypes = []
-    for celltype, count in cellinfo:
-        celltypes.extend([celltype] * int(count))
-    cellgraph.vs['celltype'] = celltypes
-    cellgraph.add_edges(edges['ampa'])
-    cellgraph.add_edges(edges['gaba'])
-    edge_types = []
-    edge_types.extend(['ampa'] * len(edges['ampa']))
-    edge_types.extend(['gaba'] * len(edges['gaba']))    
-    cellgraph.es['synapse'] = edge_types
-    return cellgraph
+    """Graph of the cells with an edge for each pair connected by
+    AMPA synapses followed by one for each pair connected by GABA
+    synapses (edge attribute `synapse`)."""
+    return get_network_graph(netfilepath).to_igraph()
 
 def read_networkgraph(filename):
-    netfile = h5.File(filename, 'r')
-    syninfo = np.asarray(netfile['/network/synapse'])
-    cellinfo = np.asarray(netfile['/runconfig/cellcount'])
-    labels = []
-    cellstartindices = {}
-    current_start = 0
-    for row in cellinfo:
-        cellstartindices[row[0]] = current_start
-        labels += ['%s_%d' % (row[0], ii) for ii in range(int(row[1]))]
-        current_start += int(row[1])
-    graph = ig.Graph(0, directed=True)
-    graph.add_vertices(current_start)
-    graph.vs['label'] = labels
-    # Now add the edges
-    edges = defaultdict(list)
-    for row in syninfo:
-        source = row[0].partition('/')[0]        
-        dest = row[1].partition('/')[0]
-        e1 = get_cell_index(cellstartindices, source)
-        e2 = get_cell_index(cellstartindices, dest)
-        edges[row[2]].append((e1, e2))
-    ampa_edges = list(set(edges['ampa']))
-    gaba_edges = list(set(edges['gaba']))
-    
-    graph.add_edges(ampa_edges + gaba_edges)    
+    """Same as load_cell_graph, but with the cell names in vertex
+    attribute `label` and the synapse type in edge attribute
+    `label`."""
+    graph = get_network_graph(filename).to_igraph(attribute='label')
+    graph.vs['label'] = graph.vs['name']
     print len(graph.es)
-    print len(ampa_edges), len(gaba_edges)
-    labels = ['ampa'] * len(ampa_edges) + ['gaba'] * len(gaba_edges)
-    print len(labels)
-    graph.es['label'] = labels
+    print len(graph.es.select(label_eq='ampa')), len(graph.es.select(label_eq='gaba'))
     return graph
         
 def get_files_with_same_settings(filelist, originalfile, hdfnodepath):
@@ -850,18 +814,28 @@ def get_spike_following_probability(srctrain, dsttrain, window):
             count += 1
     return float(count) / len(srctrain)
 
-def find_spike_following_probability_in_connected_cells(netfilepath, datafilepath, timewindow):
-    cellgraph = load_cell_graph(netfilepath)
+def spike_following_probability_grid_in_connected_cells(netfilepath, datafilepath, timewindows):
+    """Calculate the spike following probability over AMPA synapses
+    for all the windows in `timewindows` together.
+
+    Returns (pairs, probabilities) where pairs is a list of
+    'source-target' cell names and probabilities[i, j] is the
+    probability for pairs[i] with window timewindows[j]."""
+    network = get_network_graph(netfilepath)
+    edges = network.edges('ampa')
+    names = network.names.tolist()
     datafile = h5.File(datafilepath, 'r')
-    probabilities = {}
-    for edge in cellgraph.es(synapse_eq='ampa'):
-        src = cellgraph.vs[edge.source]['name']
-        srctrain = np.asarray(datafile['/spikes'][src])
-        dst = cellgraph.vs[edge.target]['name']
-        dsttrain = np.asarray(datafile['/spikes'][dst])
-        probabilities['%s-%s' % (src, dst)]  = get_spike_folloing_probability(srctrain, dsttrain, timewindow)
-    datafile.close()
-    return probabilities
+    try:
+        spiketimes, offsets, = get_spike_store(datafile).take(names)
+    finally:
+        datafile.close()
+    probabilities = spike_following_probability_grid(spiketimes, offsets, edges[:, 0], edges[:, 1], timewindows, [0.0])
+    pairs = ['%s-%s' % (names[src], names[dst]) for (src, dst) in edges]
+    return (pairs, probabilities[:, :, 0])
+
+def find_spike_following_probability_in_connected_cells(netfilepath, datafilepath, timewindow):
+    pairs, probabilities, = spike_following_probability_grid_in_connected_cells(netfilepath, datafilepath, [timewindow])
+    return dict(zip(pairs, probabilities[:, 0]))
 
 def dump_spike_following_probabilities_in_connected_cells(netfilepathlist, datafilepathlist, timewindows):
     for netfilepath, datafilepath in zip(netfilepathlist, datafilepathlist):
@@ -871,15 +845,14 @@ def dump_spike_following_probabilities_in_connected_cells(netfilepathlist, dataf
         try:            
             outfile = h5.File(outfilename, 'w')
             grp = outfile.create_group('/spiking_prob')
-            delta = timedelta(0,0,0)
-            for ii in range(6):
-                window = ii*1e-3
-                start = datetime.now()
-                probabilities = find_spike_following_probability_in_connected_cells(netfilepath, datafilepath, window)
-                end = datetime.now()
-                delta = delta + (end-start)
-                data = np.asarray(probabilities.items(), dtype=('|S35,f'))
-                print data[0]
+            start = datetime.now()
+            pairs, probabilities, = spike_following_probability_grid_in_connected_cells(netfilepath, datafilepath, timewindows)
+            end = datetime.now()
+            delta = end - start
+            for ii, window in enumerate(timewindows):
+                data = np.asarray(zip(pairs, probabilities[:, ii]), dtype=('|S35,f'))
+                if len(data) > 0:
+                    print data[0]
                 dset = grp.create_dataset('delta_%d' % (ii), data=data)
                 dset.attrs['window'] = window       
             print 'Time to find probabilities:', (delta.seconds + delta.microseconds * 1e-6)
@@ -888,59 +861,41 @@ def dump_spike_following_probabilities_in_connected_cells(netfilepathlist, dataf
                 outfile.close()
 
 
-def dump_spike_following_probability_in_unconnected_cells(netfilepath, datafilepath, timewindows):
+def dump_spike_following_probability_in_unconnected_cells(netfilepath, datafilepath, timewindows, seed=0):
     """
     For each edge, randomly select a cell from the same population
     that is not connected to this source. Use this similarly to
     postsynaptic cell in
     find_spike_following_probability_in_connected_cells.
+
+    `seed` is the seed for the random number generator, the same seed
+    gives the same control pairs.
     """
-    ex = None
     print 'Netfile path: %s, Datafile path: %s' % (datafilepath, netfilepath)
-    cellgraph = load_cell_graph(netfilepath)
-    cellindices = {}
-    datafile = h5.File(datafilepath, 'r')
-    for row in datafile['/runconfig/cellcount']:
-        cellindices[row[0]] = np.arange(0, int(row[1]))
+    network = get_network_graph(netfilepath)
     outfilename = datafilepath.replace('/data_', '/noconn_prob_')
     print 'Saving probabilities in', outfilename
     outfile = None
-    dsets = defaultdict(dict)
+    names = network.names.tolist()
+    # the edges of load_cell_graph
+    graph_edges = np.concatenate((network.edges('ampa'), network.edges('gaba')))
+    sampler = PairSampler(len(names), graph_edges[:, 0], graph_edges[:, 1], network.celltypes)
+    edges = sampler.sample_targets(graph_edges[:, 0], graph_edges[:, 1], unique=False, seed=seed)
+    # a pair picked for more than one edge is saved once
+    edges = edges[np.unique(edges[:, 0] * len(names) + edges[:, 1], return_index=True)[1]]
+    keys = ['%s-%s' % (names[src], names[dst]) for (src, dst) in edges]
+    datafile = h5.File(datafilepath, 'r')
     try:
-        probabilities = {}
-        for edge in cellgraph.es:
-            src = cellgraph.vs[edge.source]['name']
-            srctrain = np.asarray(datafile['/spikes'][src])
-            dst = cellgraph.vs[edge.target]['name']
-            dst_type, dst_index = dst.split('_')
-            forbidden = set([src])
-            neighbors = cellgraph.vs[cellgraph.neighbors(edge.source, ig.OUT)]['name']
-            for nn in neighbors:
-                forbidden.add(nn)
-            index = cellindices[dst_type][np.random.randint(len(cellindices[dst_type]))]
-            target = '%s_%d' % (dst_type, index)
-            while target in forbidden:
-                index = cellindices[dst_type][np.random.randint(len(cellindices[dst_type]))]
-                target = '%s_%d' % (dst_type, index)
-            targettrain = np.asarray(datafile['/spikes'][target])
-            for ii in range(len(timewindows)):
-                prob = get_spike_following_probability(srctrain, targettrain, timewindows[ii])
-                name = 'delta_%d' % (ii)
-                dsets[name]['%s-%s' % (src, target)] = prob
-    # except Exception, e:
-    #     ex = e        
+        spiketimes, offsets, = get_spike_store(datafile).take(names)
     finally:
         datafile.close()
-    # if ex is not None:
-    #     raise ex
-    #     return
+    probabilities = spike_following_probability_grid(spiketimes, offsets, edges[:, 0], edges[:, 1], timewindows, [0.0])
     try:
         outfile = h5.File(outfilename, 'w')
         grp = outfile.create_group('spiking_prob')
         for ii in range(len(timewindows)):
             key = 'delta_%d' % (ii)
-            value = dsets[key]
-            dset = grp.create_dataset(key, data=np.asarray(value.items(), dtype=('|S35,f')))
+            dset = grp.create_dataset(key, data=np.asarray(zip(keys, probabilities[:, ii, 0]), dtype=('|S35,f')))
             dset.attrs['window'] = timewindows[ii]
     finally:
         if outfile:
@@ -0,0 +1,177 @@
+# batchrun.py ---
+#
+# Filename: batchrun.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 19:02:17 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 19:02:17 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Run a function over many data files in a pool of worker processes.
+#
+# Each file is processed independently, so run_batch() hands them out
+# one at a time to `workers` processes and collects a BatchResult for
+# every file with the time taken and the traceback if it failed. A
+# failure in one file does not stop the others.
+#
+# The function must be defined at module level so that it can be
+# pickled for the worker processes. Output files should be written
+# through atomic_output() so that an interrupted or failed run does
+# not leave a truncated file that looks complete.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import os
+import sys
+import time
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+
+class BatchResult(object):
+    """Outcome of processing one item.
+
+    item -- the item (usually a file path) passed to the function.
+
+    ok -- True if the function returned without an exception.
+
+    seconds -- wall clock time taken.
+
+    value -- return value of the function (None on failure).
+
+    error -- formatted traceback on failure (None on success).
+    """
+    def __init__(self, item, ok, seconds, value=None, error=None):
+        self.item = item
+        self.ok = ok
+        self.seconds = seconds
+        self.value = value
+        self.error = error
+
+    def __repr__(self):
+        if self.ok:
+            return 'BatchResult(%r, ok, %.3f s)' % (self.item, self.seconds)
+        return 'BatchResult(%r, failed, %.3f s)' % (self.item, self.seconds)
+
+def _call(task):
+    """Run one task in a worker and return (index, BatchResult)."""
+    index, func, item, args, kwargs, = task
+    start = time.time()
+    try:
+        value = func(item, *args, **kwargs)
+    except Exception:
+        return (index, BatchResult(item, False, time.time() - start, error=traceback.format_exc()))
+    return (index, BatchResult(item, True, time.time() - start, value=value))
+
+def run_batch(func, items, args=(), kwargs=None, workers=None):
+    """Call func(item, *args, **kwargs) for every entry in items.
+
+    workers -- number of worker processes. None uses all the CPUs, 1
+    runs everything in this process (handy for debugging).
+
+    Returns a list of BatchResult in the same order as items."""
+    if kwargs is None:
+        kwargs = {}
+    items = list(items)
+    tasks = [(index, func, item, args, kwargs) for index, item in enumerate(items)]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        results = []
+        for task in tasks:
+            index, result, = _call(task)
+            results.append(result)
+            report_progress(result, len(results), len(tasks))
+        return results
+    # A fresh process per item so that memory held by one file (open
+    # handles, cached spike stores) is released before the next.
+    pool = multiprocessing.Pool(workers, maxtasksperchild=1)
+    results = [None] * len(tasks)
+    done = 0
+    try:
+        for index, result, in pool.imap_unordered(_call, tasks, chunksize=1):
+            results[index] = result
+            done += 1
+            report_progress(result, done, len(tasks))
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+def report_progress(result, done, total):
+    if result.ok:
+        print '[%d/%d] finished %s in %.3f s' % (done, total, result.item, result.seconds)
+    else:
+        print '[%d/%d] FAILED %s after %.3f s' % (done, total, result.item, result.seconds)
+    sys.stdout.flush()
+
+def print_report(results, out=None):
+    """Print the time taken for each item and the tracebacks of the
+    failed ones."""
+    if out is None:
+        out = sys.stdout
+    failed = [result for result in results if not result.ok]
+    total = sum([result.seconds for result in results])
+    out.write('# item\tstatus\tseconds\n')
+    for result in results:
+        status = 'ok' if result.ok else 'failed'
+        out.write('%s\t%s\t%.3f\n' % (result.item, status, result.seconds))
+    out.write('# %d items, %d failed, total processing time %.3f s\n' % (len(results), len(failed), total))
+    for result in failed:
+        out.write('# Error in %s:\n' % (result.item))
+        for line in result.error.splitlines():
+            out.write('#   %s\n' % (line))
+
+def save_report(results, path):
+    with atomic_output(path) as tmppath:
+        out = open(tmppath, 'w')
+        try:
+            print_report(results, out)
+        finally:
+            out.close()
+
+@contextmanager
+def atomic_output(path):
+    """Context manager giving a temporary path to write in place of
+    `path`. The temporary file is renamed to `path` only if the block
+    completes without an exception, otherwise it is removed.
+
+    with atomic_output(outfilepath) as tmppath:
+        outfile = h5.File(tmppath, 'w')
+        ...
+        outfile.close()
+    """
+    directory, name, = os.path.split(path)
+    tmppath = os.path.join(directory, '.%s.tmp%d' % (name, os.getpid()))
+    try:
+        yield tmppath
+    except:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+        raise
+    os.rename(tmppath, path)
+
+
+#
+# batchrun.py ends here
@@ -53,6 +53,12 @@ from collections import defaultdict
 from matplotlib import pyplot as plt
 
 import analyzer
+import epochs
+import raggedarray
+from spikestore import get_spike_store
+from syntable import get_synapse_table
+from runcatalog import RunCatalog, network_filename
+from netfingerprint import get_fingerprint, diff_rows
 
 def find_data_with_stimulus(filenamelist):
     """Open files passed in `filenamelist` and check for background
@@ -82,65 +88,84 @@ def find_data_with_stimulus(filenamelist):
         fh.close()
     return files_with_stim
 
-def categorise_networks(filehandles):
+def categorise_networks(filehandles, catalog=None):
     """Categorize the files based on cellcount and network generation
     rng seed. filehandles should be a list of data files.
 
-    Returns a dict whose keys are seeds and values are list of
-    filehandles that used that seed.
+    The seed and the hashes of the cellcount and stimulus connection
+    tables come from `catalog` (a runcatalog.RunCatalog, the per-user
+    default catalog if None), which reads only the files it has not indexed
+    yet.
+
+    Returns a dict whose keys are seeds and values are dicts mapping
+    network hash to the list of filehandles with that network.
 
     """
+    if catalog is None:
+        catalog = RunCatalog()
+    handles = dict([(fh.filename, fh) for fh in filehandles])
+    catalog.update(handles.keys())
     seeds = defaultdict(dict)
-    for fh in filehandles:
-        try:
-            numinfo = dict(fh['runconfig/numeric'])
-            cellcount = dict(fh['runconfig/cellcount'])        
-        except KeyError, e:
-            print fh.filename, 'does not have a key', e
-            continue
-        # Here we combine the seed and the hash of the entries in
-        # cellcount map to create a unique key.
-        # The hash is computed from the string
-        # 'key1,key2,...,keyN:val1,val2,...,valN'
-        sorted_keys = sorted(cellcount.keys())
-        sorted_values = [cellcount[key] for key in sorted_keys]
-        cellcountinfo = ','.join(sorted_keys)+':'+','.join(sorted_values)
-        directory = os.path.dirname(fh.filename)
-        filename = os.path.basename(fh.filename)
-        if filename.startswith('data_'):
-            netfilename = filename.replace('data_', 'network_').replace('.h5', '.h5.new')
-            netfile = h5.File(os.path.join(directory, netfilename), 'r')
-            try:
-                stim_conn = dict(netfile['/stimulus/connection'])
-                netfile.close()
-                sorted_keys = sorted(stim_conn.keys())
-                stiminfo = ','.join(sorted_keys) + ':' + \
-                    ','.join([stim_conn[key] for key in sorted_keys])
-            except KeyError:
-                print netfilename, ' - has no stimulus connection information.'
-                netfile.close()
-                continue                                    
-        k = None
-        if 'rngseed' in numinfo:
-            k = numinfo['rngseed']
-        else:
-            k = numinfo['numpy_rngseed']
-        d = seeds[k]        
-        nethash = hash(cellcountinfo + '.' + stiminfo)
-        if nethash not in d:
-            d[nethash] = [fh]
-        else:
-            d[nethash].append(fh)
+    for seed, groups in catalog.categorise(handles.keys()).items():
+        for nethash, filenames in groups.items():
+            seeds[seed][nethash] = [handles[filename] for filename in filenames]
+    for filename in set(handles.keys()) - set([filename for groups in seeds.values() for filenames in groups.values() for filename in filenames]):
+        print filename, 'does not have rng seed, cellcount or stimulus connection information.'
     print '--------- Catgorise network ---------'
     for key, value in seeds.items():
         for nethash, fh in value.items():
             for f in fh:
-                print 'k"%s" #"%d" f"%s"' % (key, nethash, f.filename)
+                print 'k"%s" #"%s" f"%s"' % (key, nethash, f.filename)
     print '----- end catgorise networks --------'
     return seeds        
 
+def synapse_file(fh):
+    """Path of the file holding /network/synapse for a data or network
+    file handle."""
+    if '/network/synapse' in fh:
+        return fh.filename
+    return network_filename(fh.filename)
+
 def compare_synapses(filehandles):
-    raise NotImplementedError('Synapse-by-synapse comparison is yet to be implemented')    
+    """Check that the network files of all the files in filehandles
+    have the same synapses as the first, comparing the fingerprints
+    of /network/synapse (see netfingerprint.py). For a file that
+    differs, the synapse rows that differ are printed."""
+    if len(filehandles) == 0:
+        return True
+    left = synapse_file(filehandles[0])
+    if left is None:
+        print 'No network file for', filehandles[0].filename
+        return False
+    leftprint = get_fingerprint(left)
+    ret = True
+    for fh in filehandles[1:]:
+        right = synapse_file(fh)
+        if right is None:
+            print 'No network file for', fh.filename
+            ret = False
+            continue
+        rightprint = get_fingerprint(right)
+        if leftprint.same_as(rightprint, 'network/synapse'):
+            continue
+        ret = False
+        if 'network/synapse' not in leftprint or 'network/synapse' not in rightprint:
+            print 'No /network/synapse in', left, 'or', right
+        else:
+            lfile = h5.File(left, 'r')
+            rfile = h5.File(right, 'r')
+            try:
+                lsyn = lfile['/network/synapse']
+                rsyn = rfile['/network/synapse']
+                if lsyn.dtype != rsyn.dtype:
+                    print 'Synapse tables of different type:', left, right
+                else:
+                    rows = diff_rows(lsyn, rsyn, leftprint, rightprint, 'network/synapse')
+                    print 'Synapses differ between', left, 'and', right, '- %d rows:' % (len(rows)), rows[:10].tolist()
+            finally:
+                lfile.close()
+                rfile.close()
+    return ret
     
 def compare_networks(filehandles, paranoid=False):
     """Compare a set of network files for identity, taking the first
@@ -242,19 +267,19 @@ def get_stim_aligned_spike_times(fhandles, cellnames):
         probetimes = analyzer.get_probetimes(fh)
         print 'Background times', bgtimes
         print 'Probe times', probetimes
-        bgbins = [(bgtimes[ii], bgtimes[ii]+interval+stimwidth) for ii in range(0, len(bgtimes), 2)]
-        print bgbins
-        probebins = [(pt, pt+interval+stimwidth) for pt in probetimes]
-        print probebins
+        bgstarts = np.asarray(bgtimes[::2], dtype=float)
+        print 'Background epochs', bgstarts, 'width', interval+stimwidth
+        probestarts = np.asarray(probetimes, dtype=float)
+        print 'Probe epochs', probestarts, 'width', interval+stimwidth
         # Probe stimulus is designed to align with every alternet bg
         # stmulus.
         cell_no = 1
         for cell, spikes in spike_times.items():
-            bg = [spikes[(spikes >= bin[0]) & (spikes < bin[1])]
-                  for bin in bgbins]
+            epoch_ids, reltimes, = epochs.align_spikes(spikes, bgstarts, interval+stimwidth)
+            bg = epochs.split_by_epoch(epoch_ids, spikes, len(bgstarts))
             bg_spikes[cell] += bg
-            probe = [spikes[(spikes >= bin[0]) & (spikes < (bin[1]))]
-                     for bin in probebins]
+            epoch_ids, reltimes, = epochs.align_spikes(spikes, probestarts, interval+stimwidth)
+            probe = epochs.split_by_epoch(epoch_ids, spikes, len(probestarts))
             probe_spikes[cell] += probe
             for x in bg:
                 print 'bg', x
@@ -278,9 +303,10 @@ def get_stim_aligned_spike_times(fhandles, cellnames):
 def get_spike_times(filehandle, cellnames):
     """Return a dict of cellname, spiketime list for all cells in
     `cellnames`."""
+    store = get_spike_store(filehandle)
     ret = {}
     for cell in cellnames:
-        ret[cell] = filehandle['spikes/%s' % (cell)][:]
+        ret[cell] = store[cell]
     return ret
 
 def get_square_wave_edges(filehandle, path):
@@ -333,17 +359,24 @@ def get_max_spike_count(spike_time_list, window=10e-3):
     spikes within the window for each array in `spike_time_list`.
     
     """
-    ret = []
-    for spikes in spike_time_list:
-        max_count = 0
-        max_time = 0
-        for spike in spikes:
-            count = len(np.nonzero((spikes <= spike) & (spikes > (spike - window)))[0])
-            if count > max_count: 
-                max_count = count
-                max_time = spike - window / 2.0
-        ret.append((max_time, max_count / window))
-    return np.array(ret)
+    values, offsets, = raggedarray.from_arrays(spike_time_list)
+    rows = raggedarray.row_ids(offsets)
+    # sort each array in place within the ragged representation
+    order = np.lexsort((values, rows))
+    values = values[order]
+    # number of spikes in (spike - window, spike] for each spike
+    counts = raggedarray.count_between(values, offsets, rows, values - window, values)
+    ret = np.zeros((len(spike_time_list), 2))
+    nonempty = np.nonzero(np.diff(offsets) > 0)[0]
+    if len(nonempty) == 0:
+        return ret
+    max_counts = np.maximum.reduceat(counts, offsets[nonempty])
+    # the first spike in each array attaining the maximum
+    peak = np.nonzero(counts == np.repeat(max_counts, np.diff(offsets)[nonempty]))[0]
+    first = peak[np.searchsorted(peak, offsets[nonempty])]
+    ret[nonempty, 0] = values[first] - window / 2.0
+    ret[nonempty, 1] = max_counts / window
+    return ret
 
 def get_probed_cells(filehandle, hop=1):
     ret = []
@@ -366,17 +399,15 @@ def get_probed_cells(filehandle, hop=1):
         return ret
     probe_dests = np.char.split(probe_dests, '/')
     probe_dests = [token[-2] for token in probe_dests]
+    netfile.close()
     try:
-        sources = netfile['/network/synapse']['source']
-        dests = netfile['/network/synapse']['dest']
+        syntable = get_synapse_table(netfilename)
     except KeyError:
-        print netfile.filename, 'missing synapse information'
-        netfile.close()
+        print netfilename, 'missing synapse information'
         return ret
-    sources = [row[0] for row in np.char.split(sources, '/')]
-    dests = [row[0] for row in np.char.split(dests, '/')]
-    ret = set([dests[ii] for ii in range(len(sources)) if sources[ii] in probe_dests])
-    netfile.close()
+    probe_ids = [syntable.cell_id(cell) for cell in probe_dests]
+    rows = np.nonzero(np.in1d(syntable.src_cell, probe_ids))[0]
+    ret = set(syntable.cells[np.unique(syntable.dst_cell[rows])].tolist())
     return ret
 
 def collect_statistics(datafiles, celltypes):
@@ -443,15 +474,27 @@ def collect_statistics(datafiles, celltypes):
             # print bg_info[cell]
     return (bg_info, probe_info)
             
-import subprocess
-
-def get_valid_files_handles(directory):
-    # Files smaller than 1 MB will not have any usefule data for analysis
-    pipe = subprocess.Popen(['find', directory, '-type', 'f', '-name', 'data*.h5', '-size','+1M'], stdout=subprocess.PIPE)
-    # TODO use subprocess.communicate to avoid issues with large amount of output
-    files = [line.strip() for line in pipe.stdout]
-    return find_data_with_stimulus(files)
-    
+def get_valid_files(directory, catalog=None, where='1', params=()):
+    """Data files larger than 1 MB under directory with both
+    background and probe stimulus, further restricted by the SQL
+    condition `where` on the catalog (see runcatalog.py). Only files
+    not yet in `catalog` (the per-user default catalog if None, see
+    runcatalog.default_dbpath) are opened."""
+    if catalog is None:
+        catalog = RunCatalog()
+    catalog.scan(directory)
+    prefix = os.path.join(directory, '')
+    return [filename for filename in catalog.with_stimulus(where, params) if filename.startswith(prefix)]
+
+def get_valid_files_handles(directory, catalog=None, where='1', params=()):
+    """Open handles of the files from get_valid_files."""
+    handles = []
+    for filename in get_valid_files(directory, catalog, where, params):
+        try:
+            handles.append(h5.File(filename, 'r'))
+        except IOError:
+            print filename, 'could not be opened'
+    return handles
 
 
 import sys
@@ -35,23 +35,18 @@ from mpl_toolkits.mplot3d import Axes3D
 from bgprobe import *
 
 if __name__ == '__main__':
-    # First, exclude files older than a cutoff date or simulations which lasted less than 5 s
-    candidate_fh = get_valid_files_handles('/data/subha/rsync_ghevar_cortical_data_clone/')
-    # The 2012_01_28 is control data with only background stimulus.
-    # candidate_fh = get_valid_files_handles('/data/subha/rsync_ghevar_cortical_data_clone/2012_01_28')
-    # candidate_fh = get_valid_files_handles('/data/subha/rsync_ghevar_cortical_data_clone/2012_03_09/')
+    # First, exclude files older than a cutoff date or simulations
+    # which lasted less than 5 s. The catalog remembers the files
+    # already seen, so only new or modified files are opened.
+    catalog = RunCatalog()
     cutoff_date = datetime.datetime(2012, 01, 01)
-    good_fh = []    
-    for fh in candidate_fh:
-        token = fh.filename.split('_')
-        date = datetime.datetime.strptime(token[-3], '%Y%m%d')
-        simtime = float(dict(fh['runconfig/scheduling'])['simtime'])
-        if (date < cutoff_date) or (simtime < 5.0):
-            fh.close()
-        else:
-            good_fh.append(fh)
+    good_fh = get_valid_files_handles('/data/subha/rsync_ghevar_cortical_data_clone/', catalog,
+                                      'date >= ? AND simtime >= ?', (cutoff_date.strftime('%Y-%m-%d'), 5.0))
+    # The 2012_01_28 is control data with only background stimulus.
+    # good_fh = get_valid_files_handles('/data/subha/rsync_ghevar_cortical_data_clone/2012_01_28', catalog)
+    # good_fh = get_valid_files_handles('/data/subha/rsync_ghevar_cortical_data_clone/2012_03_09/', catalog)
     # Now categorize these files according to network types
-    cats = categorise_networks(good_fh)
+    cats = categorise_networks(good_fh, catalog)
     celltypes = ['SpinyStellate']
     markers = {'SpinyStellate': 'p'}
     # Now go through all the files and dump some statistics for each interesting cell type
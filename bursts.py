@@ -0,0 +1,91 @@
+# bursts.py ---
+#
+# Filename: bursts.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 17:10:36 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 17:10:36 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Burst detection on the spike trains of many cells at once.
+#
+# A burst is a run of at least `minspikes` consecutive interspike
+# intervals shorter than `maxinterval`, i.e. at least minspikes+1
+# spikes. The runs are found by run length encoding the mask isi <
+# maxinterval over the whole ragged spike array (see raggedarray.py),
+# with the intervals between the last spike of one cell and the first
+# spike of the next masked out.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+import raggedarray
+
+def burst_stats(values, offsets, minspikes=4, maxinterval=10e-3):
+    """Find the bursts in every row of a ragged spike array.
+
+    values, offsets -- ragged array with one sorted spike train per
+    row.
+
+    Returns (burst_offsets, starts, lengths, counts) where the bursts
+    of row i are entries burst_offsets[i]:burst_offsets[i+1] of the
+    other arrays. starts is the time of the first spike in the burst,
+    lengths the sum of the interspike intervals in the burst and
+    counts the number of spikes in the burst.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    nrows = len(offsets) - 1
+    rows = raggedarray.row_ids(offsets)
+    isi = np.diff(values)
+    # isi[i] is between spikes i and i+1, valid only inside a row
+    short = np.zeros(len(isi) + 2, dtype=bool)
+    short[1:-1] = (isi < maxinterval) & (rows[1:] == rows[:-1])
+    change = np.diff(short.astype(np.int8))
+    run_starts = np.nonzero(change == 1)[0]
+    run_ends = np.nonzero(change == -1)[0]
+    keep = np.nonzero(run_ends - run_starts >= minspikes)[0]
+    run_starts = run_starts[keep]
+    run_ends = run_ends[keep]
+    if len(keep) > 0:
+        # sum the intervals in each run in order
+        bounds = np.empty(2 * len(keep), dtype=np.int64)
+        bounds[0::2] = run_starts
+        bounds[1::2] = run_ends
+        lengths = np.add.reduceat(np.r_[isi, 0.0], bounds)[0::2]
+    else:
+        lengths = np.zeros(0)
+    owner = rows[run_starts] if len(values) > 0 else np.zeros(0, dtype=np.int64)
+    burst_offsets = np.zeros(nrows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=nrows), out=burst_offsets[1:])
+    return (burst_offsets, values[run_starts], lengths, run_ends - run_starts + 1)
+
+def after_onset(values, offsets, onset):
+    """Drop the spikes at or before `onset` from every row. Returns
+    the new (values, offsets)."""
+    keep = values > onset
+    counts = np.bincount(raggedarray.row_ids(offsets)[keep], minlength=len(offsets) - 1)
+    new_offsets = np.zeros(len(offsets), dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    return (values[keep], new_offsets)
+
+
+#
+# bursts.py ends here
@@ -39,6 +39,8 @@ from collections import defaultdict
 from datetime import datetime
 from mpl_toolkits import mplot3d as m3
 
+import epochs
+
 files = [
     # 'data_20120128_120809_21820.h5',
     'data_20120128_120931_21882.h5',
@@ -84,8 +86,11 @@ if __name__ == '__main__':
             print spiketimes
             odds = []
             evens = []
+            # The epochs run from one background stimulus to the next
+            epoch_ids, reltimes, = epochs.align_spikes(spiketimes, bgtimes[:-1], np.diff(bgtimes))
+            chunks = epochs.split_by_epoch(epoch_ids, reltimes, len(bgtimes) - 1)
             for ii in range(1, len(bgtimes)):
-                spikes = spiketimes[(spiketimes >= bgtimes[ii-1]) & (spiketimes < bgtimes[ii])] - bgtimes[ii-1]
+                spikes = chunks[ii-1]
                 print ii, spikes
                 datadict[cell].append(spikes)
                 if ii % 2 == 1:
@@ -0,0 +1,121 @@
+# curvelod.py ---
+#
+# Filename: curvelod.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 03:58:40 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 03:58:40 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Level of detail for plotting long series.
+#
+# A 10 s Vm trace at fine plotdt has millions of points but the plot
+# canvas is at most a few thousand pixels wide, so most of the points
+# drawn on every replot fall on the same pixel column. MinMaxPyramid
+# keeps, for level k, the index of the minimum and of the maximum of
+# y in every bin of 2^k consecutive points, each level built from the
+# one below it. points(xmin, xmax, npoints) picks the finest level
+# with at most npoints/2 bins in the visible range and returns the
+# minimum and maximum of each bin in the order they occur. Drawn as a
+# line this is the envelope of the data, so narrow peaks such as
+# spikes are not lost, and the cost of a replot does not depend on the
+# length of the series. When the visible range has no more than
+# npoints points they are returned as they are.
+#
+# The x values must be in ascending order.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+class MinMaxPyramid(object):
+    """Min/max envelopes of (x, y) at successive halvings of the
+    resolution.
+
+    levels[k-1] is (lo, hi) for level k: the indices of the minimum and
+    the maximum of y[i * 2**k:(i+1) * 2**k] for each bin i.
+    """
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        if len(self.x) != len(self.y):
+            raise ValueError('x and y must have the same length: %d != %d' % (len(self.x), len(self.y)))
+        if len(self.x) < 2**31:
+            dtype = np.int32
+        else:
+            dtype = np.int64
+        self.levels = []
+        lo = hi = np.arange(len(self.y), dtype=dtype)
+        while len(lo) > 1:
+            lo, hi, = self.__halve(lo, hi)
+            self.levels.append((lo, hi))
+
+    def __halve(self, lo, hi):
+        if len(lo) % 2 == 1:
+            lo = np.r_[lo, lo[-1:]]
+            hi = np.r_[hi, hi[-1:]]
+        left, right, = lo[0::2], lo[1::2]
+        newlo = np.where(self.y[right] < self.y[left], right, left)
+        left, right, = hi[0::2], hi[1::2]
+        newhi = np.where(self.y[right] > self.y[left], right, left)
+        return (newlo, newhi)
+
+    def __len__(self):
+        return len(self.x)
+
+    def indices(self, xmin=None, xmax=None, npoints=2000):
+        """Indices of about npoints points (at most npoints + 2)
+        covering xmin <= x <= xmax (all if None) plus one point on
+        either side, in ascending order without repeats. The first and
+        last of these are always included so that the line reaches the
+        edges."""
+        npoints = max(2, int(npoints))
+        start = 0
+        stop = len(self.x)
+        if xmin is not None:
+            start = max(0, np.searchsorted(self.x, xmin, side='left') - 1)
+        if xmax is not None:
+            stop = min(len(self.x), np.searchsorted(self.x, xmax, side='right') + 1)
+        if stop - start <= npoints:
+            return np.arange(start, stop)
+        level = 1
+        while ((stop - 1) >> level) - (start >> level) + 1 > npoints // 2:
+            level += 1
+        lo, hi, = self.levels[level - 1]
+        first = start >> level
+        last = (stop - 1) >> level
+        # the first and last bins can extend past the range: take the
+        # extremes of their parts inside it from y itself
+        edges = []
+        for left, right, in [(start, min(stop, (first + 1) << level)), (max(start, last << level), stop)]:
+            edges += [left + np.argmin(self.y[left:right]), left + np.argmax(self.y[left:right])]
+        index = np.r_[start, lo[first+1:last], hi[first+1:last], edges, stop - 1]
+        return np.unique(index)
+
+    def points(self, xmin=None, xmax=None, npoints=2000):
+        """(x, y) of the points to draw for the range xmin to xmax on a
+        canvas that can show about npoints / 2 distinct columns. See
+        indices."""
+        index = self.indices(xmin, xmax, npoints)
+        return (self.x[index], self.y[index])
+
+
+#
+# curvelod.py ends here
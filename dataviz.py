@@ -70,6 +70,7 @@ from datalist import UniqueListModel, UniqueListView
 from plotconfig import PlotConfig
 from datasetmodel import HDFDatasetModel
 import analyzer
+from syntable import get_synapse_index
 
 
 default_settings = {
@@ -1010,12 +1011,9 @@ class DataVizWidget(QtGui.QMainWindow):
             datafile = self.h5tree.fhandles[filepath]
             net_file_name = self.data_model_dict[filepath]
             self.h5tree.addH5Handle(net_file_name)
-            syntab = self.h5tree.getData(net_file_name + '/network/synapse')[:]
             cell_name = path.rpartition('/')[-1]
             presyn_vm_paths = []
-            presyn_ix = numpy.char.startswith(syntab['dest'], cell_name+'/')
-            syntab = syntab[presyn_ix]
-            presyn_cell = set([item[0] for item in numpy.char.split(syntab['source'], '/')])
+            presyn_cell = set(get_synapse_index(net_file_name).presynaptic(cell_name))
             available_cell = set(datafile['Vm'].keys())
             valid_cell = presyn_cell & available_cell
             valid_path = ['%s/Vm/%s' % (filepath, cell) for cell in valid_cell]
@@ -1041,11 +1039,8 @@ class DataVizWidget(QtGui.QMainWindow):
             datafile = self.h5tree.fhandles[filepath]
             net_file_name = self.data_model_dict[filepath]
             self.h5tree.addH5Handle(net_file_name)
-            syntab = self.h5tree.getData(net_file_name + '/network/synapse')
             cell_name = path.rpartition('/')[-1]
-            presyn_ix = numpy.char.startswith(syntab['dest'], cell_name+'/')
-            syntab = syntab[presyn_ix]
-            presyn_cell = set([item[0] for item in numpy.char.split(syntab['source'], '/')])
+            presyn_cell = get_synapse_index(net_file_name).presynaptic(cell_name)
             presyn_spike_paths = ['%s/spikes/%s' % (filepath, cell) for cell in presyn_cell]
             ts = self.h5tree.getTimeSeries(presyn_spike_paths[0])[:]
             presyn_spike = [(ts, self.h5tree.getData(path)[:]) for path in presyn_spike_paths]
@@ -1061,11 +1056,8 @@ class DataVizWidget(QtGui.QMainWindow):
             datafile = self.h5tree.fhandles[filepath]
             net_file_name = self.data_model_dict[filepath]
             self.h5tree.addH5Handle(net_file_name)
-            syntab = self.h5tree.getData(net_file_name + '/network/synapse')
             cell_name = path.rpartition('/')[-1]
-            postsyn_ix = numpy.char.startswith(syntab['source'], cell_name+'/')
-            syntab = syntab[postsyn_ix]
-            postsyn_cell = set([item[0] for item in numpy.char.split(syntab['dest'], '/')])
+            postsyn_cell = get_synapse_index(net_file_name).postsynaptic(cell_name)
             postsyn_spike_paths = ['%s/spikes/%s' % (filepath, cell) for cell in postsyn_cell]
             ts = self.h5tree.getTimeSeries(postsyn_spike_paths[0])[:]
             postsyn_spike = [(ts, self.h5tree.getData(path)[:]) for path in postsyn_spike_paths]
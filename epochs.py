@@ -0,0 +1,97 @@
+# epochs.py ---
+#
+# Filename: epochs.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 14:20:41 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 14:20:41 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Alignment of spike trains to stimulus epochs.
+#
+# An epoch is a time interval [start, start+width) following a
+# stimulus. align_spikes() finds for every spike the epoch it falls
+# in and its time relative to the start of that epoch with a single
+# searchsorted over the epoch starts, instead of cutting the spike
+# train one epoch at a time.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+def periodic_starts(start, width, stop):
+    """Start times of back to back epochs of `width` beginning at
+    `start`: start, start+width, ... up to (excluding) `stop`."""
+    if width <= 0:
+        raise ValueError('Epoch width must be positive, got: %g' % (width))
+    count = int(np.ceil((stop - start) / float(width)))
+    if count <= 0:
+        return np.zeros(0)
+    return start + width * np.arange(count)
+
+def align_spikes(spiketimes, starts, widths, inclusive_start=True):
+    """Assign each spike to an epoch.
+
+    spiketimes -- spike times (need not be sorted).
+
+    starts -- start times of the epochs in ascending order. The epochs
+    must not overlap.
+
+    widths -- width of each epoch, or a scalar if all the epochs have
+    the same width.
+
+    inclusive_start -- if True the epochs are [start, start+width),
+    otherwise (start, start+width).
+
+    Returns (epoch_ids, reltimes), both of the same length as
+    spiketimes. epoch_ids[i] is the index of the epoch containing
+    spiketimes[i] or -1 if it is not in any epoch, and reltimes[i] is
+    spiketimes[i] - starts[epoch_ids[i]] (undefined where epoch_ids is
+    -1).
+    """
+    spiketimes = np.asarray(spiketimes, dtype=np.float64).ravel()
+    starts = np.asarray(starts, dtype=np.float64).ravel()
+    widths = np.ones(len(starts)) * widths
+    if inclusive_start:
+        side = 'right'
+    else:
+        side = 'left'
+    epoch_ids = np.searchsorted(starts, spiketimes, side=side) - 1
+    inside = np.nonzero(epoch_ids >= 0)[0]
+    reltimes = np.zeros(len(spiketimes))
+    reltimes[inside] = spiketimes[inside] - starts[epoch_ids[inside]]
+    outside = inside[reltimes[inside] >= widths[epoch_ids[inside]]]
+    epoch_ids[outside] = -1
+    return (epoch_ids, reltimes)
+
+def split_by_epoch(epoch_ids, values, nepochs):
+    """Split `values` into a list of `nepochs` arrays where entry k
+    has values[i] for all i with epoch_ids[i] == k, in their original
+    order. Epochs without any entry get an empty array."""
+    values = np.asarray(values)
+    inside = np.nonzero(epoch_ids >= 0)[0]
+    order = inside[np.argsort(epoch_ids[inside], kind='mergesort')]
+    bounds = np.searchsorted(epoch_ids[order], np.arange(nepochs + 1), side='left')
+    values = values[order]
+    return [values[bounds[ii]:bounds[ii+1]] for ii in range(nepochs)]
+
+
+#
+# epochs.py ends here
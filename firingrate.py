@@ -19,6 +19,14 @@
 # 
 # compute firing rates
 # 
+# The spikes of all the cells are binned at resolution `dt` with a
+# single np.bincount over (group, bin) where a group is a cell, a
+# celltype or a cortical layer. The binned counts are then convolved
+# with a boxcar, gaussian or causal exponential kernel, directly for
+# short kernels and via FFT for long ones.
+# 
+# dump_spike_rates() and the command line interface replace the
+# spike rate tool in c/connfinder.cpp.
 # 
 
 # Change log:
@@ -29,30 +37,276 @@
 
 # Code:
 
+import sys
+import getopt
 import numpy as np
 import pylab as pl
 import h5py as h5
 
+import raggedarray
+from spikestore import get_spike_store
+
+KERNELS = ['boxcar', 'gaussian', 'exponential']
+
+# Above this many kernel points the convolution is done by FFT
+FFT_THRESHOLD = 64
+
+# Cortical layer of each celltype. TCR and nRT (thalamus) are put in
+# layer 7. Ectopic spike sources go with their celltype.
+celltype_layer_map = {
+    'SupPyrRS': '3',
+    'SupPyrFRB': '3',
+    'SupBasket': '3',
+    'SupAxoaxonic': '3',
+    'SupLTS': '3',
+    'SpinyStellate': '4',
+    'TuftedIB': '5',
+    'TuftedRS': '5',
+    'NontuftedRS': '6',
+    'DeepBasket': '4',
+    'DeepAxoaxonic': '4',
+    'DeepLTS': '4',
+    'TCR': '7',
+    'nRT': '7'
+    }
+
 def compute_firing_rate(spike_times, t_total, binsize=1.0, t_start=0.0, t_end=-1.0):
+    """Spike counts in windows of width binsize centred at 0,
+    binsize/2, binsize, ... considering only spikes in [t_start,
+    t_end]. Kept for old scripts, see firing_rate() for rates with
+    other kernels."""
     if t_end <= 0.0:
         t_end = t_total
-    num_bins = 2.0 * (t_end - t_start) / binsize - 1
-    firing_rate = np.zeros(num_bins)
-    t = 0.0
-    for ii in range(num_bins):
-        for spike_time in spike_times:
-            if spike_time < t_start:
+    num_bins = int(2.0 * (t_end - t_start) / binsize - 1)
+    if num_bins <= 0:
+        return np.zeros(0)
+    spike_times = np.sort(np.asarray(spike_times, dtype=np.float64).ravel())
+    spike_times = spike_times[(spike_times >= t_start) & (spike_times <= t_end)]
+    centres = np.arange(num_bins) * (binsize / 2.0)
+    # count the spikes in the open interval around each centre
+    upper = np.searchsorted(spike_times, centres + binsize / 2.0, side='left')
+    lower = np.searchsorted(spike_times, centres - binsize / 2.0, side='right')
+    return np.asarray(upper - lower, dtype=np.float64)
+
+def make_kernel(kernel, width, dt):
+    """Return (lags, weights) for a smoothing kernel sampled at dt.
+
+    kernel -- 'boxcar': flat window of total width `width` centred on
+    the bin. 'gaussian': gaussian with standard deviation `width`,
+    truncated at 4 standard deviations. 'exponential': causal
+    exponential decay with time constant `width`, truncated at 5 time
+    constants.
+
+    lags are in bins, rate[i] gets weights[j] * count[i - lags[j]].
+    The weights sum to 1."""
+    if kernel == 'boxcar':
+        npoints = max(1, int(round(width / dt)))
+        lags = np.arange(npoints) - npoints // 2
+        weights = np.ones(npoints)
+    elif kernel == 'gaussian':
+        half = max(1, int(np.ceil(4.0 * width / dt)))
+        lags = np.arange(-half, half + 1)
+        weights = np.exp(-0.5 * (lags * dt / width) ** 2)
+    elif kernel == 'exponential':
+        lags = np.arange(max(1, int(np.ceil(5.0 * width / dt))) + 1)
+        weights = np.exp(-lags * dt / width)
+    else:
+        raise ValueError('Unknown kernel: %s. Must be one of %s' % (kernel, KERNELS))
+    return (lags, weights / np.sum(weights))
+
+def convolve_rows(data, lags, weights, method='auto'):
+    """Convolve each row of `data` with the kernel (lags, weights)
+    (see make_kernel) keeping the length of the rows. Values outside
+    the rows are taken as 0.
+
+    method -- 'direct', 'fft' or 'auto' (fft for long kernels)."""
+    nrows, ncols = data.shape
+    if method == 'auto':
+        if len(lags) > FFT_THRESHOLD:
+            method = 'fft'
+        else:
+            method = 'direct'
+    if method == 'direct':
+        ret = np.zeros(data.shape)
+        for lag, weight in zip(lags, weights):
+            if lag >= ncols or -lag >= ncols:
                 continue
-            if spike_time > t_end or spike_time > t+binsize/2.0:
-                break
-            if (t - binsize/2.0) < spike_time and (t + binsize/2.0) > spike_time:
-                print 'Adding', spike_time, 'to bin centred at', t
-                firing_rate[ii] += 1.0
-        t += binsize/2.0
-    return firing_rate
+            if lag >= 0:
+                ret[:, lag:] += weight * data[:, :ncols-lag]
+            else:
+                ret[:, :ncols+lag] += weight * data[:, -lag:]
+        return ret
+    elif method == 'fft':
+        # kernel as a dense array starting at the smallest lag
+        first = lags[0]
+        kernel = np.zeros(lags[-1] - first + 1)
+        kernel[lags - first] = weights
+        size = ncols + len(kernel) - 1
+        nfft = 1
+        while nfft < size:
+            nfft *= 2
+        full = np.fft.irfft(np.fft.rfft(data, nfft, axis=1) * np.fft.rfft(kernel, nfft), nfft, axis=1)
+        # full[:, k] is the output at index k + first
+        start = -first
+        ret = np.zeros(data.shape)
+        lo = max(0, first)
+        hi = min(ncols, size + first)
+        ret[:, lo:hi] = full[:, lo+start:hi+start]
+        return ret
+    raise ValueError('Unknown convolution method: %s' % (method))
+
+def bin_counts(values, offsets, groups, ngroups, t_start, t_end, dt):
+    """Count the spikes of each group in bins of width dt from
+    t_start to t_end.
+
+    values, offsets -- ragged array of the spike trains of the cells.
+
+    groups -- group index of each cell (row). Cells with a negative
+    group are ignored.
+
+    Returns an array of shape (ngroups, number of bins)."""
+    nbins = int(np.ceil((t_end - t_start) / dt))
+    groups = np.asarray(groups, dtype=np.int64)
+    spike_groups = groups[raggedarray.row_ids(offsets)]
+    bins = np.floor((np.asarray(values) - t_start) / dt).astype(np.int64)
+    valid = np.nonzero((spike_groups >= 0) & (bins >= 0) & (bins < nbins))[0]
+    counts = np.bincount(spike_groups[valid] * nbins + bins[valid], minlength=ngroups * nbins)
+    return counts.reshape((ngroups, nbins)).astype(np.float64)
+
+def group_cells(cellnames, mode='celltype'):
+    """Group the cells for averaging.
+
+    mode -- 'cell': each cell by itself, 'celltype': by celltype (the
+    cell name up to the last '_', ectopic sources are separate
+    celltypes), 'layer': by cortical layer as in celltype_layer_map.
+
+    Returns (groups, labels) where groups[i] is the index in labels of
+    the group of cellnames[i], -1 if it does not belong to any."""
+    if mode == 'cell':
+        return (np.arange(len(cellnames)), list(cellnames))
+    keys = []
+    for name in cellnames:
+        celltype = name.rpartition('_')[0]
+        if mode == 'celltype':
+            keys.append(celltype)
+        elif mode == 'layer':
+            if celltype.startswith('ectopic_'):
+                celltype = celltype[len('ectopic_'):]
+            keys.append(celltype_layer_map.get(celltype))
+        else:
+            raise ValueError('Unknown mode: %s. Must be one of cell, celltype, layer' % (mode))
+    labels = sorted(set([key for key in keys if key is not None]))
+    index = dict(zip(labels, range(len(labels))))
+    groups = np.array([index.get(key, -1) for key in keys], dtype=np.int64)
+    return (groups, labels)
+
+def firing_rate(values, offsets, t_start, t_end, dt, kernel='boxcar', width=None, groups=None, ngroups=None, method='auto'):
+    """Firing rate (spikes/s) per cell or averaged over groups of
+    cells.
+
+    values, offsets -- ragged array of spike trains, one row per cell.
+
+    t_start, t_end, dt -- the rates are computed at the centres of
+    the bins of width dt from t_start to t_end.
+
+    kernel, width -- see make_kernel. Default width is dt.
+
+    groups, ngroups -- group index of each cell (see group_cells). The
+    rate of a group is the average over its cells. Default: every
+    cell by itself.
+
+    Returns (times, rates) where rates has shape (ngroups, len(times)).
+    """
+    ncells = len(offsets) - 1
+    if groups is None:
+        groups = np.arange(ncells)
+        ngroups = ncells
+    elif ngroups is None:
+        ngroups = int(np.max(groups)) + 1 if len(groups) > 0 else 0
+    if width is None:
+        width = dt
+    counts = bin_counts(values, offsets, groups, ngroups, t_start, t_end, dt)
+    lags, weights, = make_kernel(kernel, width, dt)
+    rates = convolve_rows(counts, lags, weights, method) / dt
+    groups = np.asarray(groups, dtype=np.int64)
+    cellcount = np.bincount(groups[groups >= 0], minlength=ngroups)
+    nonempty = np.nonzero(cellcount > 0)[0]
+    rates[nonempty] /= cellcount[nonempty, np.newaxis]
+    times = t_start + (np.arange(counts.shape[1]) + 0.5) * dt
+    return (times, rates)
+
+def get_firing_rates(filehandle, mode='celltype', t_start=0.0, t_end=-1.0, dt=1e-3, kernel='boxcar', width=None, method='auto'):
+    """Firing rates from all the cells in an open data file.
+
+    mode -- 'cell', 'celltype' or 'layer' (see group_cells).
+
+    t_end -- if not positive, the simulation time of the data file.
+
+    Returns (times, labels, rates)."""
+    if t_end <= 0.0:
+        t_end = float(dict(filehandle['/runconfig/scheduling'])['simtime'])
+    store = get_spike_store(filehandle)
+    groups, labels, = group_cells(store.names.tolist(), mode)
+    times, rates, = firing_rate(store.values, store.offsets, t_start, t_end, dt, kernel=kernel, width=width, groups=groups, ngroups=len(labels), method=method)
+    return (times, labels, rates)
 
+def dump_spike_rates(datafilepath, outfilepath, binsize=1.0, dt=100e-3, start=0.0, end=-1.0, mode='celltype', kernel='boxcar'):
+    """Compute spike rates from a data file and save them in
+    /spikerate/{label} of a new file as an array of (time, rate)
+    rows. `binsize` is the kernel width."""
+    datafile = h5.File(datafilepath, 'r')
+    try:
+        times, labels, rates, = get_firing_rates(datafile, mode=mode, t_start=start, t_end=end, dt=dt, kernel=kernel, width=binsize)
+    finally:
+        datafile.close()
+    outfile = h5.File(outfilepath, 'w-')
+    try:
+        grp = outfile.create_group('spikerate')
+        for label, rate in zip(labels, rates):
+            grp.create_dataset(label, data=np.vstack((times, rate)).T)
+        outfile.attrs['binsize'] = binsize
+        outfile.attrs['dt'] = dt
+        outfile.attrs['kernel'] = kernel
+        outfile.attrs['datasource'] = datafilepath
+    finally:
+        outfile.close()
 
+def main(argv):
+    usage = 'Usage: %s [-b binsize] [-d dt] [-s start] [-e end] [-m cell|celltype|layer] [-k %s] -i inputfile -o outputfile' % (argv[0], '|'.join(KERNELS))
+    try:
+        opts, args, = getopt.getopt(argv[1:], 'b:s:e:i:o:m:d:k:')
+    except getopt.GetoptError, e:
+        print e
+        print usage
+        return 1
+    params = {}
+    infile = None
+    outfile = None
+    for opt, arg in opts:
+        if opt == '-b':
+            params['binsize'] = float(arg)
+        elif opt == '-d':
+            params['dt'] = float(arg)
+        elif opt == '-s':
+            params['start'] = float(arg)
+        elif opt == '-e':
+            params['end'] = float(arg)
+        elif opt == '-m':
+            params['mode'] = arg
+        elif opt == '-k':
+            params['kernel'] = arg
+        elif opt == '-i':
+            infile = arg
+        elif opt == '-o':
+            outfile = arg
+    if infile is None or outfile is None:
+        print usage
+        return 1
+    dump_spike_rates(infile, outfile, **params)
+    return 0
 
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
 
 # 
 # firingrate.py ends here
@@ -31,28 +31,23 @@
 # Code:
 import sys
 import igraph as ig
-import h5py as h5
 import numpy
 
+from netgraph import get_network_graph
+
 class HDFGraph(object):
     def __init__(self, filename):
         self.filename = filename
-        filehandle = h5.File(filename, 'r')
-        self.syntab = numpy.asarray(filehandle['/network/synapse'])
+        network = get_network_graph(filename)
+        # One vertex for each cell that has a synapse, one edge for
+        # each synapse
+        cells, ends, = numpy.unique(numpy.concatenate((network.sources(), network.targets)), return_inverse=True)
         self.graph = ig.Graph(0, directed=True)
-        src = [row[0].rpartition('/')[0] for row in self.syntab]
-        dst = [row[1].rpartition('/')[0] for row in self.syntab]
-        weight = [row[3] for row in self.syntab]
-        syntypes = [row[2] for row in self.syntab]
-        nodeset = set(src) | set(dst)
-        nodeindex = dict(zip(nodeset, range(len(nodeset))))
-        self.graph.add_vertices(len(nodeset))
-        self.graph.add_edges([(nodeindex[src[ii]], 
-                               nodeindex[dst[ii]]) 
-                              for ii in range(len(src))])
-        self.graph.es['weight'] = weight
-        self.graph.es['type'] = syntypes
-        self.graph.vs['label'] = list(nodeset)
+        self.graph.add_vertices(len(cells))
+        self.graph.add_edges(ends.reshape((2, -1)).T.tolist())
+        self.graph.es['weight'] = network.gbar.tolist()
+        self.graph.es['type'] = network.syntypes[network.types].tolist()
+        self.graph.vs['label'] = network.names[cells].tolist()
 
     def write_dot(self, filename):
         self.graph.write_dot(filename)
@@ -36,6 +36,8 @@ import h5py
 import numpy
 from PyQt4 import Qt, QtCore, QtGui
 
+from runconfig import get_runconfig
+
 class H5TreeWidgetItem(QtGui.QTreeWidgetItem):
     def __init__(self, parent, h5node):
         QtGui.QTreeWidgetItem.__init__(self, parent)
@@ -182,20 +184,7 @@ class H5TreeWidget(QtGui.QTreeWidget):
     
     def getTimeSeries(self, path):
         h5f = self.fhandles[self.getOpenFileName(path)]
-        scheduling = h5f.get('/runconfig/scheduling')
-        if scheduling is not None:
-            for item in scheduling:
-                if item[0] == 'simtime':
-                    simtime = float(item[1])
-                if item[0] == 'plotdt':
-                    plotdt = float(item[1])
-        else:
-            try:
-                simtime = h5f.attrs['simtime']
-                plotdt = h5f.attrs['plotdt']
-            except KeyError:
-                simtime = None
-                plotdt = 1.0
+        simtime = get_runconfig(h5f).simtime
         data = self.getData(path)
         num_points = len(data)
         if simtime is not None:
@@ -206,23 +195,11 @@ class H5TreeWidget(QtGui.QTreeWidget):
 
     def get_plotdt(self, path):
         h5f = self.fhandles[self.getOpenFileName(path)]
-        scheduling = h5f.get('/runconfig/scheduling')
-        if scheduling is not None:
-            for item in scheduling:
-                if item[0] == 'plotdt':
-                    return float(item[1])
-        else:
-            return h5f.attrs['plotdt']
+        return get_runconfig(h5f).plotdt
 
     def get_simtime(self, path):
         h5f = self.fhandles[self.getOpenFileName(path)]
-        scheduling = h5f.get('/runconfig/scheduling')
-        if scheduling is not None:
-            for item in scheduling:
-                if item[0] == 'simtime':
-                    return float(item[1])
-        else:
-            return h5f.attrs['simtime']
+        return get_runconfig(h5f).simtime
         
 
     def saveSelectedDataToCsvFile(self, filename):
@@ -0,0 +1,282 @@
+# netfingerprint.py ---
+#
+# Filename: netfingerprint.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 03:02:51 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 03:02:51 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Content hashes of HDF5 files for checking whether two network files
+# are the same.
+#
+# Each dataset is read in chunks of `chunkrows` rows and every chunk
+# gets a SHA1 digest of its bytes. The digest of the dataset is that
+# of its dtype, shape and chunk digests, and the digest of a group
+# that of the names, kinds and digests of its children, so that the
+# digest of the root group changes if anything in the file changes
+# (a Merkle tree). Attributes are not included.
+#
+# Once two files have been fingerprinted, comparing them is comparing
+# the root digests. When they differ, diff() follows the mismatched
+# digests down the tree to the datasets that differ without reading
+# the files, and diff_rows() reads only the chunks whose digests
+# differ and compares them row by row with numpy to find exactly
+# which rows (e.g. synapses in /network/synapse) are different.
+#
+# The fingerprint of a file is saved as a sidecar (see sidecar.py).
+# get_fingerprint(filename) also holds on to the fingerprints of the
+# files compared most recently, so comparing one file against many
+# reads its sidecar once.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import hashlib
+import numpy as np
+import h5py as h5
+
+import sidecar
+
+SUFFIX = 'fingerprint'
+CHUNKROWS = 65536
+
+GROUP = 'group'
+DATASET = 'dataset'
+
+def chunk_digest(data):
+    """SHA1 hex digest of the contents of an array."""
+    data = np.asarray(data)
+    if data.dtype.hasobject:
+        # variable length strings: hash the values, not the pointers
+        return hashlib.sha1(repr(data.tolist())).hexdigest()
+    return hashlib.sha1(np.ascontiguousarray(data).tobytes()).hexdigest()
+
+def dataset_meta(dataset):
+    """String describing the dtype and shape of a dataset."""
+    return '%r %r' % (dataset.dtype.descr, dataset.shape)
+
+def dataset_chunks(dataset, chunkrows=CHUNKROWS):
+    """(start, stop) rows of the chunks of a dataset. A scalar dataset
+    is one chunk (0, 0)."""
+    if len(dataset.shape) == 0:
+        return [(0, 0)]
+    return [(start, min(dataset.shape[0], start + chunkrows)) for start in range(0, dataset.shape[0], chunkrows)]
+
+def read_chunk(dataset, start, stop):
+    if len(dataset.shape) == 0:
+        return dataset[()]
+    return dataset[start:stop]
+
+def combine(lines):
+    return hashlib.sha1('\n'.join(lines)).hexdigest()
+
+def node_entries(node, chunkrows=CHUNKROWS):
+    """Fingerprint entries of an h5py group or dataset and everything
+    below it.
+
+    Returns a list of (path, kind, meta, digest, chunk digests), paths
+    relative to node ('' for node itself), children before their
+    parents."""
+    if isinstance(node, h5.Dataset):
+        chunks = [chunk_digest(read_chunk(node, start, stop)) for start, stop in dataset_chunks(node, chunkrows)]
+        meta = dataset_meta(node)
+        return [('', DATASET, meta, combine([meta, str(chunkrows)] + chunks), chunks)]
+    entries = []
+    lines = []
+    for name in sorted(node.keys()):
+        children = node_entries(node[name], chunkrows)
+        path, kind, meta, digest, chunks, = children[-1]
+        lines.append('%s\t%s\t%s' % (name, kind, digest))
+        for path, kind, meta, digest, chunks, in children:
+            entries.append(('%s/%s' % (name, path) if path else name, kind, meta, digest, chunks))
+    entries.append(('', GROUP, '', combine(lines), []))
+    return entries
+
+class Fingerprint(object):
+    """Digests of all the groups and datasets of an HDF5 file (or of a
+    node in it).
+
+    paths -- path of each node relative to the root ('' for the root).
+
+    kinds -- 'group' or 'dataset' for each path.
+
+    metas -- dtype and shape of each dataset ('' for groups).
+
+    digests -- hex digest of each node.
+
+    chunk_offsets, chunk_digests -- ragged array of the digests of the
+    chunks of chunkrows rows of each dataset, row i for paths[i].
+    """
+    def __init__(self, arrays):
+        for name in ['paths', 'kinds', 'metas', 'digests', 'chunk_offsets', 'chunk_digests']:
+            setattr(self, name, arrays[name])
+        self.chunkrows = int(arrays['chunkrows'][0])
+        self.index = dict(zip(self.paths.tolist(), range(len(self.paths))))
+
+    @classmethod
+    def from_node(cls, node, chunkrows=CHUNKROWS):
+        return cls(cls.arrays(node, chunkrows))
+
+    @staticmethod
+    def arrays(node, chunkrows=CHUNKROWS):
+        entries = node_entries(node, chunkrows)
+        offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+        np.cumsum([len(entry[4]) for entry in entries], out=offsets[1:])
+        return {'paths': np.array([entry[0] for entry in entries], dtype=str),
+                'kinds': np.array([entry[1] for entry in entries], dtype=str),
+                'metas': np.array([entry[2] for entry in entries], dtype=str),
+                'digests': np.array([entry[3] for entry in entries], dtype=str),
+                'chunk_offsets': offsets,
+                'chunk_digests': np.array([digest for entry in entries for digest in entry[4]], dtype='|S40'),
+                'chunkrows': np.array([chunkrows], dtype=np.int64)}
+
+    def __contains__(self, path):
+        return normpath(path) in self.index
+
+    def digest(self, path=''):
+        """Digest of the node at path (the root by default)."""
+        return self.digests[self.index[normpath(path)]]
+
+    def kind(self, path=''):
+        return self.kinds[self.index[normpath(path)]]
+
+    def meta(self, path=''):
+        return self.metas[self.index[normpath(path)]]
+
+    def chunks(self, path):
+        """Digests of the chunks of the dataset at path."""
+        row = self.index[normpath(path)]
+        return self.chunk_digests[self.chunk_offsets[row]:self.chunk_offsets[row+1]]
+
+    def children(self, path=''):
+        """Names of the children of the group at path."""
+        path = normpath(path)
+        prefix = path + '/' if path else ''
+        return sorted([child[len(prefix):] for child in self.index
+                       if child.startswith(prefix) and child != path and '/' not in child[len(prefix):]])
+
+    def same_as(self, other, path=''):
+        """True if the node at path has the same contents in both."""
+        return path in self and path in other and self.digest(path) == other.digest(path)
+
+def normpath(path):
+    """Path relative to the root without leading or trailing '/'."""
+    return path.strip('/')
+
+def fingerprint(filename, chunkrows=CHUNKROWS, cache=True):
+    """Fingerprint of an HDF5 file, from its sidecar if up to date."""
+    names = ['paths', 'kinds', 'metas', 'digests', 'chunk_offsets', 'chunk_digests', 'chunkrows']
+    data = None
+    if cache:
+        data = sidecar.load_arrays(filename, SUFFIX, names)
+        if data is not None and data['chunkrows'][0] != chunkrows:
+            data = None
+    if data is None:
+        filehandle = h5.File(filename, 'r')
+        try:
+            data = Fingerprint.arrays(filehandle, chunkrows)
+        finally:
+            filehandle.close()
+        if cache:
+            sidecar.save_arrays(filename, SUFFIX, data)
+    return Fingerprint(data)
+
+_fingerprints = sidecar.FileMemo()
+
+def get_fingerprint(filename):
+    """Return the Fingerprint of a file with the default
+    chunkrows."""
+    return _fingerprints.get(filename, lambda: fingerprint(filename))
+
+def node_fingerprint(node, chunkrows=CHUNKROWS):
+    """Fingerprint of an h5py group or dataset, the cached one of the
+    file if node is the root group."""
+    if isinstance(node, h5.Group) and node.name == '/':
+        if chunkrows == CHUNKROWS:
+            return get_fingerprint(node.file.filename)
+        return fingerprint(node.file.filename, chunkrows)
+    return Fingerprint.from_node(node, chunkrows)
+
+def same_network(leftfile, rightfile, path=''):
+    """True if the node at path (the whole file by default) has the
+    same contents in the two files."""
+    return get_fingerprint(leftfile).same_as(get_fingerprint(rightfile), path)
+
+def diff(left, right, path=''):
+    """Differences between the nodes at path of two Fingerprints.
+
+    Returns a list of (path, reason, left detail, right detail) with
+    reason one of 'missing', 'kind', 'meta' (dtype or shape) and
+    'content', for the groups and datasets that differ, the deepest
+    nodes only."""
+    path = normpath(path)
+    if path not in left or path not in right:
+        return [(path, 'missing', path in left, path in right)]
+    if left.digest(path) == right.digest(path):
+        return []
+    if left.kind(path) != right.kind(path):
+        return [(path, 'kind', left.kind(path), right.kind(path))]
+    if left.kind(path) == DATASET:
+        if left.meta(path) != right.meta(path):
+            return [(path, 'meta', left.meta(path), right.meta(path))]
+        return [(path, 'content', left.digest(path), right.digest(path))]
+    ret = []
+    prefix = path + '/' if path else ''
+    for name in sorted(set(left.children(path)) | set(right.children(path))):
+        ret += diff(left, right, prefix + name)
+    return ret
+
+def diff_rows(left, right, leftprint=None, rightprint=None, path=None):
+    """Indices of the rows that differ between two h5py datasets of
+    the same dtype, including the rows only one of them has.
+
+    If the fingerprints of the datasets are given (leftprint and
+    rightprint with the dataset at `path` in both), only the chunks
+    with different digests are read."""
+    nleft = left.shape[0] if len(left.shape) > 0 else 1
+    nright = right.shape[0] if len(right.shape) > 0 else 1
+    if leftprint is not None and rightprint is not None and leftprint.chunkrows == rightprint.chunkrows:
+        chunkrows = leftprint.chunkrows
+        lchunks = leftprint.chunks(path)
+        rchunks = rightprint.chunks(path)
+        common = min(len(lchunks), len(rchunks))
+        changed = np.nonzero(lchunks[:common] != rchunks[:common])[0]
+    else:
+        chunkrows = CHUNKROWS
+        common = (min(nleft, nright) + chunkrows - 1) // chunkrows
+        changed = np.arange(common)
+    ret = []
+    for chunk in changed:
+        start = chunk * chunkrows
+        stop = min(nleft, nright, start + chunkrows)
+        ldata = np.asarray(read_chunk(left, start, stop))
+        rdata = np.asarray(read_chunk(right, start, stop))
+        if ldata.ndim == 0:
+            if not np.array_equal(ldata, rdata):
+                ret.append(np.zeros(1, dtype=np.int64))
+            continue
+        unequal = (ldata != rdata).reshape((len(ldata), -1)).any(axis=1)
+        ret.append(start + np.nonzero(unequal)[0])
+    ret.append(np.arange(min(nleft, nright), max(nleft, nright)))
+    return np.concatenate(ret).astype(np.int64)
+
+
+#
+# netfingerprint.py ends here
@@ -0,0 +1,279 @@
+# netgraph.py ---
+#
+# Filename: netgraph.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 22:05:37 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 22:05:37 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Cell graph of a network file as integer arrays.
+#
+# /network/synapse has one row per synapse: (source compartment,
+# dest compartment, type, Gbar, ...) with compartment paths of the form
+# celltype_index/compartment. Cells are numbered in the order of
+# /runconfig/cellcount, the cells of each type being contiguous, so
+# that celltype_index has the id start[celltype] + index.
+#
+# NetworkGraph decodes the source and dest columns with np.char
+# operations and a lookup of the (few) distinct celltypes instead of
+# splitting every row in Python. The synapses are kept sorted by
+# source as a ragged array (see raggedarray.py): the targets of cell i
+# are targets[offsets[i]:offsets[i+1]], with the synapse type code and
+# Gbar of each. This is saved as a sidecar (see sidecar.py) next to the
+# network file, so opening the same network again skips the parsing.
+#
+# Use get_network_graph(filename) to get the graph of a network file;
+# repeated calls for the same file reuse it while it is among the
+# recently used ones (see sidecar.FileMemo).
+#
+# hop_distances() finds the shortest path lengths from a set of
+# vertices (e.g. the cells receiving a stimulus) to all the vertices
+# by breadth first search on the ragged adjacency, and
+# min_distance()/equivalent_distance() reduce them to one distance per
+# vertex.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+import h5py as h5
+import igraph as ig
+
+import raggedarray
+import sidecar
+
+SUFFIX = 'graph'
+
+def cell_names(cellcount):
+    """Names and celltypes of all the cells listed in cellcount, the
+    rows of /runconfig/cellcount as (celltype, count).
+
+    Returns (names, celltypes, starts) where starts maps each celltype
+    to the id of its first cell."""
+    names = []
+    celltypes = []
+    starts = {}
+    for row in cellcount:
+        celltype = str(row[0])
+        count = int(row[1])
+        starts[celltype] = len(names)
+        names.extend(['%s_%d' % (celltype, ii) for ii in range(count)])
+        celltypes.extend([celltype] * count)
+    return (np.array(names, dtype=str), np.array(celltypes, dtype=str), starts)
+
+def cell_ids(paths, starts):
+    """Convert compartment paths celltype_index/compartment into cell
+    ids using `starts`, the id of the first cell of each celltype.
+
+    Raises KeyError for a celltype missing in starts."""
+    paths = np.asarray(paths, dtype=str)
+    if len(paths) == 0:
+        return np.zeros(0, dtype=np.int64)
+    cells = np.char.partition(paths, '/')[:, 0]
+    parts = np.char.rpartition(cells, '_')
+    celltypes, inverse, = np.unique(parts[:, 0], return_inverse=True)
+    typestart = np.array([starts[celltype] for celltype in celltypes.tolist()], dtype=np.int64)
+    return typestart[inverse] + parts[:, 2].astype(np.int64)
+
+class NetworkGraph(object):
+    """Synapses of a network file between cells.
+
+    names -- cell names in id order.
+
+    celltypes -- celltype of each cell.
+
+    offsets, targets -- ragged array of the postsynaptic cell of all
+    synapses, row i for presynaptic cell i.
+
+    syntypes -- names of the synapse types ('ampa', 'gaba', ...).
+
+    types -- index in syntypes of the type of each synapse.
+
+    gbar -- Gbar of each synapse.
+
+    There is one entry for every row of /network/synapse, so a pair of
+    cells connected by several synapses appears more than once.
+    """
+    def __init__(self, filename, cache=True):
+        self.filename = filename
+        data = None
+        fields = ['names', 'celltypes', 'offsets', 'targets', 'syntypes', 'types', 'gbar']
+        if cache:
+            data = sidecar.load_arrays(filename, SUFFIX, fields)
+        if data is None:
+            data = self.__read(filename)
+            if cache:
+                sidecar.save_arrays(filename, SUFFIX, data)
+        for field in fields:
+            setattr(self, field, data[field])
+
+    def __read(self, filename):
+        filehandle = h5.File(filename, 'r')
+        try:
+            cellcount = np.asarray(filehandle['/runconfig/cellcount'])
+            syntab = np.asarray(filehandle['/network/synapse'])
+        finally:
+            filehandle.close()
+        names, celltypes, starts, = cell_names(cellcount)
+        columns = syntab.dtype.names
+        sources = cell_ids(syntab[columns[0]], starts)
+        targets = cell_ids(syntab[columns[1]], starts)
+        syntypes, types, = np.unique(np.asarray(syntab[columns[2]], dtype=str), return_inverse=True)
+        gbar = np.asarray(syntab[columns[3]], dtype=np.float64)
+        order = np.argsort(sources, kind='mergesort')
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(names)), out=offsets[1:])
+        return {'names': names,
+                'celltypes': celltypes,
+                'offsets': offsets,
+                'targets': targets[order],
+                'syntypes': syntypes,
+                'types': types[order].astype(np.int64),
+                'gbar': gbar[order]}
+
+    def __len__(self):
+        return len(self.names)
+
+    def sources(self):
+        """Presynaptic cell of each synapse."""
+        return raggedarray.row_ids(self.offsets)
+
+    def synapses(self, syntype=None):
+        """Indices of the synapses of type `syntype` (all if None)."""
+        if syntype is None:
+            return np.arange(len(self.targets))
+        code = np.nonzero(self.syntypes == syntype)[0]
+        if len(code) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.nonzero(self.types == code[0])[0]
+
+    def edges(self, syntype=None, unique=True):
+        """Array of (source, target) cell ids of the synapses of type
+        `syntype` (all types if None). If unique is True each pair of
+        cells appears once, sorted by source and then target."""
+        index = self.synapses(syntype)
+        edges = np.column_stack((self.sources()[index], self.targets[index]))
+        if unique and len(edges) > 0:
+            keys = np.unique(edges[:, 0] * len(self.names) + edges[:, 1])
+            edges = np.column_stack((keys // len(self.names), keys % len(self.names)))
+        return edges.reshape((-1, 2))
+
+    def to_igraph(self, syntypes=('ampa', 'gaba'), attribute='synapse'):
+        """igraph Graph with a vertex for every cell (attributes name
+        and celltype) and an edge for every connected pair of cells for
+        each synapse type in syntypes, the edge attribute `attribute`
+        holding the synapse type."""
+        graph = ig.Graph(0, directed=True)
+        graph.add_vertices(len(self.names))
+        graph.vs['name'] = self.names.tolist()
+        graph.vs['celltype'] = self.celltypes.tolist()
+        labels = []
+        for syntype in syntypes:
+            edges = self.edges(syntype)
+            graph.add_edges(edges.tolist())
+            labels.extend([syntype] * len(edges))
+        graph.es[attribute] = labels
+        return graph
+
+
+_graphs = sidecar.FileMemo()
+
+def get_network_graph(filename):
+    """Return the NetworkGraph for a network file."""
+    return _graphs.get(filename, lambda: NetworkGraph(filename))
+
+def read_cellnetwork(filehandle, syntype):
+    """Return (edges, weights) from /network/cellnetwork/g{syntype} of
+    an old format network file, which holds rows of (source, target,
+    weight) with integer cell ids."""
+    data = np.asarray(filehandle['/network/cellnetwork/g%s' % (syntype)])
+    edges = data[:, :2].astype(np.int64).reshape((-1, 2))
+    return (edges, data[:, 2].astype(np.float64))
+
+def csr_adjacency(nvertices, sources, targets):
+    """Out-neighbours of every vertex of a directed graph as a ragged
+    array (offsets, neighbours), each pair of vertices once."""
+    sources = np.asarray(sources, dtype=np.int64).ravel()
+    targets = np.asarray(targets, dtype=np.int64).ravel()
+    keys = np.unique(sources * nvertices + targets)
+    offsets = np.zeros(nvertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // nvertices, minlength=nvertices), out=offsets[1:])
+    return (offsets, keys % nvertices)
+
+def hop_distances(offsets, neighbours, sources):
+    """Length of the shortest path from each vertex in `sources` to
+    every vertex of the graph given as a ragged array of
+    out-neighbours (see csr_adjacency).
+
+    The breadth first searches from all the sources advance together,
+    one level at a time.
+
+    Returns an int16 array of shape (len(sources), number of
+    vertices) with -1 for unreachable vertices."""
+    sources = np.asarray(sources, dtype=np.int64).ravel()
+    nvertices = len(offsets) - 1
+    distances = -np.ones((len(sources), nvertices), dtype=np.int16)
+    rows = np.arange(len(sources))
+    distances[rows, sources] = 0
+    frontier = sources
+    level = 0
+    while len(frontier) > 0:
+        level += 1
+        owner, positions, = raggedarray.expand_rows(offsets, frontier)
+        rows = rows[owner]
+        vertices = neighbours[positions]
+        new = np.nonzero(distances[rows, vertices] < 0)[0]
+        keys = np.unique(rows[new] * nvertices + vertices[new])
+        rows = keys // nvertices
+        frontier = keys % nvertices
+        distances[rows, frontier] = level
+    return distances
+
+def min_distance(distances):
+    """Distance of every vertex from the nearest source, inf if no
+    source reaches it. `distances` is as returned by hop_distances."""
+    distances = np.where(distances < 0, np.inf, distances)
+    if len(distances) == 0:
+        return np.ones(distances.shape[1]) * np.inf
+    return np.min(distances, axis=0)
+
+def equivalent_distance(distances):
+    """Distance of every vertex from all the sources combined like
+    resistors in parallel:
+
+    1/equivalent = 1/d1 + 1/d2 + ...
+
+    over the sources that reach the vertex. This is 0 for the sources
+    themselves and inf for vertices no source reaches. `distances` is
+    as returned by hop_distances."""
+    distances = np.asarray(distances, dtype=np.float64)
+    inverse = np.zeros(distances.shape)
+    reached = distances > 0
+    inverse[reached] = 1.0 / distances[reached]
+    conductance = np.sum(inverse, axis=0)
+    ret = np.ones(distances.shape[1]) * np.inf
+    nonzero = np.nonzero(conductance > 0)[0]
+    ret[nonzero] = 1.0 / conductance[nonzero]
+    ret[np.any(distances == 0, axis=0)] = 0.0
+    return ret
+
+
+#
+# netgraph.py ends here
@@ -0,0 +1,189 @@
+# pairsampler.py ---
+#
+# Filename: pairsampler.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 21:14:52 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 21:14:52 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Random control pairs of unconnected cells.
+#
+# For the spike following probabilities we compare every synapse
+# (source, target) with a control pair where one end is kept and the
+# other is replaced by a random cell of the same type that is not
+# connected to the kept one. PairSampler keeps the vertices of each
+# type as a ragged array and the adjacency matrix as a bitset packed
+# with np.packbits (one bit per pair of vertices, so a network of 10k
+# cells needs 12.5 MB). All the control pairs are drawn together:
+# each round draws a candidate for every pair still missing one, and
+# the candidates that are connected, equal to the kept vertex or
+# already picked are drawn again in the next round.
+#
+# The random numbers come from a np.random.RandomState created from
+# `seed`, so the same seed gives the same pairs.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+class PairSampler(object):
+    """Draw unconnected pairs of cells from a directed graph.
+
+    nvertices -- number of vertices.
+
+    sources, targets -- the edges of the graph.
+
+    types -- type of each vertex (any values that np.unique can sort,
+    e.g. celltype names).
+    """
+    def __init__(self, nvertices, sources, targets, types):
+        self.nvertices = nvertices
+        self.sources = np.asarray(sources, dtype=np.int64).ravel()
+        self.targets = np.asarray(targets, dtype=np.int64).ravel()
+        labels, self.types, = np.unique(np.asarray(types), return_inverse=True)
+        self.ntypes = len(labels)
+        # vertices of type t are type_vertices[type_offsets[t]:type_offsets[t+1]]
+        self.type_vertices = np.argsort(self.types, kind='mergesort')
+        self.type_offsets = np.zeros(self.ntypes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.types, minlength=self.ntypes), out=self.type_offsets[1:])
+        self._bitsets = {}
+
+    def bitset(self, reverse=False):
+        """Packed adjacency matrix: bit j of row i is set if there is
+        an edge i->j (j->i if reverse is True). Built on first use."""
+        if reverse not in self._bitsets:
+            if reverse:
+                rows, cols, = self.targets, self.sources
+            else:
+                rows, cols, = self.sources, self.targets
+            rowbytes = (self.nvertices + 7) // 8
+            bits = np.zeros(self.nvertices * rowbytes, dtype=np.uint8)
+            if len(rows) > 0:
+                # byte and bit within the byte as np.packbits lays them out
+                bytepos = rows * rowbytes + cols // 8
+                bitval = np.left_shift(1, 7 - cols % 8).astype(np.uint8)
+                order = np.argsort(bytepos, kind='mergesort')
+                bytepos = bytepos[order]
+                bitval = bitval[order]
+                first = np.r_[0, np.nonzero(np.diff(bytepos))[0] + 1]
+                bits[bytepos[first]] = np.bitwise_or.reduceat(bitval, first)
+            self._bitsets[reverse] = bits.reshape((self.nvertices, rowbytes))
+        return self._bitsets[reverse]
+
+    def connected(self, fixed, others, reverse=False):
+        """True for each i where there is an edge fixed[i]->others[i]
+        (others[i]->fixed[i] if reverse is True)."""
+        fixed = np.asarray(fixed, dtype=np.int64)
+        others = np.asarray(others, dtype=np.int64)
+        bits = self.bitset(reverse)
+        byte = bits[fixed, others // 8]
+        return np.right_shift(byte, 7 - others % 8) & 1 == 1
+
+    def neighbor_type_counts(self, reverse=False):
+        """Array of shape (nvertices, ntypes) with the number of
+        distinct out-neighbours (in-neighbours if reverse is True) of
+        each type for every vertex."""
+        if reverse:
+            rows, cols, = self.targets, self.sources
+        else:
+            rows, cols, = self.sources, self.targets
+        pairs = np.unique(rows * self.nvertices + cols)
+        rows = pairs // self.nvertices
+        cols = pairs % self.nvertices
+        counts = np.bincount(rows * self.ntypes + self.types[cols], minlength=self.nvertices * self.ntypes)
+        return counts.reshape((self.nvertices, self.ntypes))
+
+    def sample(self, fixed, like, reverse=False, unique=True, seed=None):
+        """For each i pick a random vertex of the same type as
+        like[i] that is neither fixed[i] nor connected to it.
+
+        reverse -- if False the picked vertex must not receive an edge
+        from fixed[i] (use for control targets), if True it must not
+        send an edge to fixed[i] (use for control sources).
+
+        unique -- if True no (fixed, picked) pair is picked twice.
+
+        seed -- seed for np.random.RandomState.
+
+        Returns the array of picked vertices. Raises ValueError if
+        some fixed vertex does not have enough unconnected vertices
+        of the required type."""
+        fixed = np.asarray(fixed, dtype=np.int64).ravel()
+        pooltypes = self.types[np.asarray(like, dtype=np.int64).ravel()]
+        self.__check_feasible(fixed, pooltypes, reverse, unique)
+        random = np.random.RandomState(seed)
+        poolstart = self.type_offsets[pooltypes]
+        poolsize = self.type_offsets[pooltypes + 1] - poolstart
+        picked = -np.ones(len(fixed), dtype=np.int64)
+        accepted_keys = np.zeros(0, dtype=np.int64)
+        pending = np.arange(len(fixed))
+        while len(pending) > 0:
+            draw = (random.random_sample(len(pending)) * poolsize[pending]).astype(np.int64)
+            candidates = self.type_vertices[poolstart[pending] + draw]
+            good = (candidates != fixed[pending]) & ~self.connected(fixed[pending], candidates, reverse)
+            if unique:
+                keys = fixed[pending] * self.nvertices + candidates
+                good &= ~np.in1d(keys, accepted_keys)
+                # keep the first of any repeats within this round
+                index = np.nonzero(good)[0]
+                keys, first, = np.unique(keys[index], return_index=True)
+                good[:] = False
+                good[index[first]] = True
+                accepted_keys = np.union1d(accepted_keys, keys)
+            picked[pending[good]] = candidates[good]
+            pending = pending[~good]
+        return picked
+
+    def __check_feasible(self, fixed, pooltypes, reverse, unique):
+        if len(fixed) == 0:
+            return
+        poolsize = np.diff(self.type_offsets)[pooltypes]
+        neighbors = self.neighbor_type_counts(reverse)[fixed, pooltypes]
+        # fixed itself is not allowed either, unless already counted as a neighbour
+        available = poolsize - neighbors - ((self.types[fixed] == pooltypes) & ~self.connected(fixed, fixed, reverse))
+        if unique:
+            keys = fixed * self.ntypes + pooltypes
+            requests = np.bincount(keys, minlength=self.nvertices * self.ntypes)[keys]
+        else:
+            requests = np.ones(len(fixed), dtype=np.int64)
+        bad = np.nonzero(requests > available)[0]
+        if len(bad) > 0:
+            raise ValueError('Vertex %d has only %d unconnected vertices of the required type, %d pairs requested' % (fixed[bad[0]], available[bad[0]], requests[bad[0]]))
+
+    def sample_targets(self, sources, like, unique=True, seed=None):
+        """For each i pick a target of the same type as like[i] that
+        does not receive an edge from sources[i]. Returns an array of
+        (source, target) pairs."""
+        sources = np.asarray(sources, dtype=np.int64).ravel()
+        targets = self.sample(sources, like, reverse=False, unique=unique, seed=seed)
+        return np.column_stack((sources, targets))
+
+    def sample_sources(self, targets, like, unique=True, seed=None):
+        """For each i pick a source of the same type as like[i] that
+        does not send an edge to targets[i]. Returns an array of
+        (source, target) pairs."""
+        targets = np.asarray(targets, dtype=np.int64).ravel()
+        sources = self.sample(targets, like, reverse=True, unique=unique, seed=seed)
+        return np.column_stack((sources, targets))
+
+
+#
+# pairsampler.py ends here
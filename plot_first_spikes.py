@@ -50,9 +50,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import h5py as h5
 import random
-from scipy import weave
 from datetime import datetime
 
+from spikestore import get_spike_store
+import raggedarray
+import bursts
+
 # These are all the files with runconfig/cellcount info with > 10 MB
 # data
 filenames = [
@@ -210,16 +213,16 @@ def get_early_spikes(stim_times, celltype, t):
     spike times where there was a spike within t s after the stimulus"""
     early = defaultdict(list)
     for f, st in stim_times.items():
-        for cell in f['/spikes']:
-            if cell.startswith(celltype):
-                data = f['/spikes'][cell][:]
-                deltas = []
-                for x in st:
-                    dt = np.where(((data - x) < t) & (data > x), data-x, 0.0)
-                    dt = np.array(dt[dt > 0])
-                    deltas = np.r_[deltas, dt]
-                if len(deltas) > 0:
-                    early[f].append((cell, deltas))
+        store = get_spike_store(f)
+        for cell in store.names[store.rows(celltype)]:
+            data = store[cell]
+            deltas = []
+            for x in st:
+                dt = np.where(((data - x) < t) & (data > x), data-x, 0.0)
+                dt = np.array(dt[dt > 0])
+                deltas = np.r_[deltas, dt]
+            if len(deltas) > 0:
+                early[f].append((cell, deltas))
     return early
 
 def plot_early_spikes(files, celltype, t):
@@ -273,24 +276,27 @@ def plot_isi_hist(filenames, celltype, count):
             cellcount = dict(f['/runconfig/cellcount'])
             inhibitory = sum([int(v) for k, v in cellcount.items() if k in ['DeepBasket', 'DeepAxoaxonic', 'DeepLTS', 'SupBasket', 'SupAxoaxonic', 'SupLTS']])
             bins = np.arange(0, float(dict(f['/runconfig/stimulus'])['bg_interval']), 5e-3)
-            data = [f['spikes'][cells[ii]][:] for ii in indices]
-            data = [d[d > onset] for d in data]
+            store = get_spike_store(f)
+            values, offsets, = store.take([cells[ii] for ii in indices])
+            values, offsets, = bursts.after_onset(values, offsets, onset)
+            data = raggedarray.to_arrays(values, offsets)
             print celltype
             print 'file simtime bginterval ppinterval spikecount cellcount inhibitory tcr stimulated burstlength spikesperburst'
             print os.path.basename(f.filename), schedinfo['simtime'], stiminfo['bg_interval'], stiminfo['isi'], np.mean([len(d) for d in data]), len(cells), inhibitory, cellcount['TCR'], stiminfo['bg_count'],
             totburstlength = 0.0
             totspikesperburst  = 0.0
+            burst_offsets, bstarts, blength, scounts, = bursts.burst_stats(values, offsets)
             for ii in range(len(data)):
                 # ax = fig.add_subplot(len(data), 2, 2*ii+1)
                 # n, bins, patches = ax.hist(np.diff(data[ii]), bins=bins, normed=True)            
                 # ax.set_title('%s, SS: %d, total spikes: %d' % (cells[indices[ii]], len(cells), len(data[ii])))
                 # ax = fig.add_subplot(len(data), 2, 2*ii+2)
-                bstarts, blength, scounts = c_get_burst_stat(data[ii], onset)
-                if blength:
-                    # ax.plot(bstarts, np.array(blength)*1e3, '^-.')
-                    # ax.plot(bstarts, np.array(scounts), 'o-.')
-                    totburstlength += np.mean(blength)
-                    totspikesperburst += np.mean(scounts)
+                first, last, = burst_offsets[ii], burst_offsets[ii+1]
+                if last > first:
+                    # ax.plot(bstarts[first:last], blength[first:last]*1e3, '^-.')
+                    # ax.plot(bstarts[first:last], scounts[first:last], 'o-.')
+                    totburstlength += np.mean(blength[first:last])
+                    totspikesperburst += np.mean(scounts[first:last])
                 else:
                     pass
                     # ax.plot(data[ii], np.ones(len(data[ii])), 'x')
@@ -301,85 +307,18 @@ def plot_isi_hist(filenames, celltype, count):
         except IOError:
             print 'IOError opening:', fname
 
-def c_get_burst_stat(data, onset, minspikes=4, maxinterval=10e-3):
-    """Find if there are bursts of spikes in this data. Burst is
-    defined as a sequence of at least `minspikes` spikes within
-    `maxinterval` time of each other."""
-    data = data[data > onset].copy()
-    code = """
-           int ii, inburst=0, sc = 0, length = Ndata[0];
-           py::tuple results(3);
-           py::list bstart, blen, scount;
-           double bl = 0.0, bs = 0.0, dt = 0.0;
-           for ( ii = 1; ii < length; ++ii){
-               dt = data[ii] - data[ii-1];
-               if (dt < maxinterval){
-                   bl += dt;
-                   sc += 1;
-                   if (!inburst){
-                       bs = data[ii];
-                       inburst = 1;
-                   } else if ((ii == length - 1) && (sc > minspikes - 1)){
-                       blen.append(PyFloat_FromDouble(bl));
-                       scount.append(PyInt_FromLong(sc+1));
-                       bstart.append(bs);
-                   }
-               } else if (inburst){ // this isi signifies end of a burst
-                   if (sc > minspikes - 1){
-                       blen.append(PyFloat_FromDouble(bl));
-                       scount.append(PyInt_FromLong(sc+1));
-                       bstart.append(bs);
-                   }
-                   bl = 0.0;
-                   sc = 0;
-                   inburst = 0;
-               }
-           }
-           results[0] = bstart;
-           results[1] = blen;
-           results[2] = scount;
-           return_val = results;                       
-           """
-    res = weave.inline(code, ['data', 'minspikes', 'maxinterval'])
-    return res
-    
 def get_burst_stat(data, onset, minspikes=4, maxinterval=10e-3):
-    data = data[data>onset].copy()
-    isi = np.diff(data)
-    spikes = 0
-    inburst = False
-    burstlength = 0
-    burstlengthlist = []
-    spikecountlist = []
-    burststarts = []
-    start = -1
-    for index in range(len(isi)):
-        dt = isi[index]
-        if dt < maxinterval:
-            # print '^',data[index]
-            burstlength += dt
-            if not inburst:
-                spikes = 2
-                inburst = True
-                start = data[index]
-            else:
-                spikes += 1
-                if (index == len(isi) - 1) and (spikes > minspikes):
-                    burstlengthlist.append(burstlength)
-                    spikecountlist.append(spikes)                    
-                    burststarts.append(start)
+    """Find if there are bursts of spikes in this data. Burst is
+    defined as a sequence of more than `minspikes` spikes within
+    `maxinterval` time of each other.
 
-        else:
-            if inburst:
-                inburst = False
-                # print 'v', data[index]
-                if spikes > minspikes:
-                    burstlengthlist.append(burstlength)
-                    spikecountlist.append(spikes)
-                    burststarts.append(start)
-                burstlength = 0.0
-                spikes = 0
-    return (burststarts, burstlengthlist, spikecountlist)
+    Returns lists of burst start times, burst lengths and spike counts
+    in each burst. See bursts.burst_stats for doing many cells at
+    once."""
+    data = np.asarray(data)
+    data = data[data > onset]
+    burst_offsets, starts, lengths, counts, = bursts.burst_stats(data, np.array([0, len(data)]), minspikes, maxinterval)
+    return (starts.tolist(), lengths.tolist(), counts.tolist())
 
 import numpy.testing as tst
 
@@ -390,7 +329,7 @@ def test_burst_stat():
                      2.011, 2.012, 2.013, 2.014, 2.015, 2.016,
                      2.027, 2.028])
     onset = 1.0
-    starts, lengths, counts = c_get_burst_stat(data, onset)
+    starts, lengths, counts = get_burst_stat(data, onset)
     print starts
     assert(len(starts) == 2)
     np.allclose(starts[0], 1.001) # bad
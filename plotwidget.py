@@ -36,6 +36,11 @@ import numpy
 from PyQt4 import Qt, QtCore, QtGui, QtSvg
 from PyQt4 import Qwt5 as Qwt
 import analyzer
+import curvelod
+
+# Line curves longer than this are drawn from a min/max pyramid (see
+# curvelod.py) with about two points per pixel of the canvas
+LOD_MIN_POINTS = 10000
 
 class SpectrogramData(Qwt.QwtRasterData):
     def __init__(self, datalist):
@@ -112,6 +117,7 @@ class PlotWidget(Qwt.QwtPlot):
         self._prevSelection = False
         self.path_curve_dict = defaultdict(list)
         self.curve_path_dict = {}
+        self.curve_lod = {} # curve -> MinMaxPyramid of its full data
         self.__colors = [Qt.Qt.red, Qt.Qt.green, Qt.Qt.blue, Qt.Qt.magenta, Qt.Qt.darkCyan, Qt.Qt.black]
         self.__nextColor = 0
         self.__overlay = True
@@ -160,6 +166,7 @@ class PlotWidget(Qwt.QwtPlot):
                                              Qt.Qt.ShiftModifier),
             ]
         self.zoomer.setMousePattern(pattern)
+        self.connect(self.zoomer, QtCore.SIGNAL('zoomed(const QwtDoubleRect&)'), self.zoomed)
 
     
     def updateSelectionFromLegend(self, curve, on):
@@ -179,10 +186,48 @@ class PlotWidget(Qwt.QwtPlot):
     def clearZoomStack(self):
         """Auto scale and clear the zoom stack
         """
+        self.updateLevelOfDetail()
         self.setAxisAutoScale(Qwt.QwtPlot.xBottom)
         self.setAxisAutoScale(Qwt.QwtPlot.yLeft)
         self.replot()
         self.zoomer.setZoomBase()
+
+    def zoomed(self, rect):
+        self.updateLevelOfDetail(rect.left(), rect.right())
+        self.replot()
+
+    def updateLevelOfDetail(self, xmin=None, xmax=None):
+        """Set the data of the curves with a min/max pyramid to their
+        envelope between xmin and xmax (the whole curve if None) at two
+        points per pixel of the canvas."""
+        npoints = 2 * max(1, self.canvas().width())
+        for curve, lod in self.curve_lod.items():
+            xdata, ydata, = lod.points(xmin, xmax, npoints)
+            curve.setData(xdata, ydata)
+
+    def setCurveData(self, curve, xdata, ydata):
+        """Set the data of a curve. If it is a line (not a raster)
+        longer than LOD_MIN_POINTS with x in ascending order, the
+        curve gets only the envelope of the data for the visible range
+        and the full data is kept in self.curve_lod."""
+        xdata = numpy.asarray(xdata, dtype=float)
+        ydata = numpy.asarray(ydata, dtype=float)
+        if curve.style() != curve.NoCurve and len(xdata) > LOD_MIN_POINTS and numpy.all(xdata[1:] >= xdata[:-1]):
+            lod = curvelod.MinMaxPyramid(xdata, ydata)
+            self.curve_lod[curve] = lod
+            scale = self.axisScaleDiv(Qwt.QwtPlot.xBottom)
+            xdata, ydata, = lod.points(scale.lowerBound(), scale.upperBound(), 2 * max(1, self.canvas().width()))
+        else:
+            self.curve_lod.pop(curve, None)
+        curve.setData(xdata, ydata)
+
+    def curveData(self, curve):
+        """Copies of the full x and y data of a curve as numpy
+        arrays."""
+        if curve in self.curve_lod:
+            lod = self.curve_lod[curve]
+            return (lod.x.copy(), lod.y.copy())
+        return (numpy.array(curve.data().xData()), numpy.array(curve.data().yData()))
         
     def eventFilter(self, obj, event):
         if event.type() == Qt.QEvent.MouseButtonPress:
@@ -235,6 +280,8 @@ class PlotWidget(Qwt.QwtPlot):
                 item.setSymbol(symbol)
                 item.setStyle(style)
                 item.setCurveAttribute(attribute)
+                xdata, ydata, = self.curveData(item)
+                self.setCurveData(item, xdata, ydata)
         self.replot()
         if not self._prevSelection:
             self.deselectAllCurves()
@@ -277,10 +324,9 @@ class PlotWidget(Qwt.QwtPlot):
         elif allifnone:
             curves = self.itemList()
         for item in curves:
-            xdata = numpy.array(item.data().xData())
-            ydata = numpy.array(item.data().yData())
+            xdata, ydata, = self.curveData(item)
             xdata = xdata % window
-            item.setData(xdata, ydata)
+            self.setCurveData(item, xdata, ydata)
         self.replot()
                 
     def wrapPlotsOverEdges(self):
@@ -291,8 +337,7 @@ class PlotWidget(Qwt.QwtPlot):
         wrapcurve = self.__selectedCurves[-1]
         path = self.curve_path_dict[wrapcurve]
         times = []
-        xdata = numpy.array(wrapcurve.data().xData())
-        ydata = numpy.array(wrapcurve.data().yData())
+        xdata, ydata, = self.curveData(wrapcurve)
         # It is a spike train, x values are spike times, wrap around those
         if 'spikes' in path:
             times = xdata
@@ -307,12 +352,12 @@ class PlotWidget(Qwt.QwtPlot):
         # start from the first edge, ignoring everything before it
         # and put end of simulation as the upper bound
         for curve in self.itemList():
-            ydata = numpy.array(curve.data().yData())
-            xdata = numpy.array(curve.data().xData())            
+            xdata, ydata, = self.curveData(curve)
             path = self.curve_path_dict[curve]
             path_curve_list = self.path_curve_dict[path]
             path_curve_list.pop(path_curve_list.index(curve))
             self.curve_path_dict.pop(curve)
+            self.curve_lod.pop(curve, None)
             curve.detach()
             start = 0
             end = len(xdata)
@@ -324,8 +369,8 @@ class PlotWidget(Qwt.QwtPlot):
                 xx = numpy.array(xdata[start:end] - times[ii])
                 xdata[start:end] = -1.0
                 new_curve = Qwt.QwtPlotCurve('%s #%d' % (curve.title().text(), len(times) + ii, ))
-                new_curve.setData(xx, ydata[start:end])
                 new_curve.setStyle(curve.style())
+                self.setCurveData(new_curve, xx, ydata[start:end])
                 new_curve.setPen(QtGui.QPen(curve.pen()))
                 new_curve.setSymbol(Qwt.QwtSymbol(curve.symbol()))
                 new_curve.attach(self)
@@ -352,6 +397,9 @@ class PlotWidget(Qwt.QwtPlot):
     def setLineStyleSelectedCurves(self, style=Qwt.QwtPlotCurve.NoCurve):        
         for item in self.__selectedCurves:
             item.setStyle(style)
+            # symbols need every point, lines only the envelope
+            xdata, ydata, = self.curveData(item)
+            self.setCurveData(item, xdata, ydata)
         self.replot()
         if not self._prevSelection:
             self.deselectAllCurves()
@@ -423,6 +471,8 @@ class PlotWidget(Qwt.QwtPlot):
         self.setAxisScaleEngine(self.yLeft, Qwt.QwtLog10ScaleEngine())
         if y_range is not None:
             self.setAxisScale(self.yLeft, y_range[0], y_range[1])
+        if x_range is not None:
+            self.updateLevelOfDetail(x_range[0], x_range[1])
         self.replot()
         self.zoomer.setZoomBase()
 
@@ -478,6 +528,7 @@ class PlotWidget(Qwt.QwtPlot):
             curve.setPen(pen)
             curve.setTitle(curvename)
             if mode == 'raster':
+                self.curve_lod.pop(curve, None)
                 curve.setStyle(curve.NoCurve)
                 curve.setSymbol(Qwt.QwtSymbol(Qwt.QwtSymbol.VLine, Qt.QBrush(), pen, Qt.QSize(7,7)))
                 # n-th entry in data list to be plotted at y = n+1 (counting from 0)
@@ -487,10 +538,10 @@ class PlotWidget(Qwt.QwtPlot):
                     curve.setData(data, numpy.ones(len(data)) * (1 + len(self.path_curve_dict.keys())))
             else:
                 if (isinstance(data, tuple) or isinstance(data, list)) and len(data) == 2:
-                    curve.setData(data[0][:], data[1][:]) # the [:] notation converts hdf5 dataset into numpy array
+                    self.setCurveData(curve, data[0][:], data[1][:]) # the [:] notation converts hdf5 dataset into numpy array
                 else:
                     xdata = numpy.linspace(0, simtime, len(data))
-                    curve.setData(xdata, data)
+                    self.setCurveData(curve, xdata, data[:])
         self.clearZoomStack()
 
     def getDataPathsForSelectedCurves(self):
@@ -502,9 +553,8 @@ class PlotWidget(Qwt.QwtPlot):
     
     def vShiftSelectedPlots(self, shift):
         for item in self.__selectedCurves:
-            data = item.data()
-            ydata = numpy.array(data.yData()) + shift
-            item.setData(numpy.array(data.xData()), ydata)
+            xdata, ydata, = self.curveData(item)
+            self.setCurveData(item, xdata, ydata + shift)
         self.replot()
         self.clearZoomStack()
         if not self._prevSelection:
@@ -513,9 +563,8 @@ class PlotWidget(Qwt.QwtPlot):
     def vScaleSelectedPlots(self, scale):
         # print 'vScaleSelectedPlots'
         for item in self.__selectedCurves:
-            data = item.data()
-            ydata = numpy.array(data.yData()) * scale
-            item.setData(numpy.array(data.xData()), ydata)
+            xdata, ydata, = self.curveData(item)
+            self.setCurveData(item, xdata, ydata * scale)
         self.replot()
         self.clearZoomStack()
         if not self._prevSelection:
@@ -523,7 +572,7 @@ class PlotWidget(Qwt.QwtPlot):
         
     def updatePlots(self, curve_list, data_list):
         for curve, data in zip(curve_list, data_list):
-            curve.setData(data[0], data[1])
+            self.setCurveData(curve, data[0], data[1])
         self.replot()
         self.clearZoomStack()
 
@@ -6,11 +6,7 @@
 # Maintainer: 
 # Created: Mon Mar 19 23:25:51 2012 (+0530)
 # Version: 
-<<<<<<< HEAD
 # Last-Updated: Fri Apr  6 13:08:00 2012 (+0530)
-=======
-# Last-Updated: Fri Apr  6 12:33:07 2012 (+0530)
->>>>>>> fdedd22ccb84331bf944e52e994278a24375eba4
 #           By: subha
 #     Update #: 1702
 # URL: 
@@ -42,6 +38,12 @@ from datetime import datetime
 from matplotlib import pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 
+import raggedarray
+from spikestore import get_spike_store
+from batchrun import run_batch, print_report, atomic_output
+from pairsampler import PairSampler
+from netgraph import cell_ids, csr_adjacency, hop_distances, min_distance, equivalent_distance
+
 def update_pyplot_config():
     params = {'font.size' : 10,
           'axes.labelsize' : 10,
@@ -64,6 +66,158 @@ excitatory_celltypes = [
 
 WINDOWS = [10e-3, 20e-3, 30e-3, 40e-3]
 DELAYS = [0.0, 10e-3, 20e-3, 30e-3, 40e-3]
+
+# Record type for spike following probabilities computed over a list
+# of edges. `pre` and `post` are vertex ids.
+spike_prob_dtype = np.dtype([('pre', 'i4'), ('post', 'i4'), ('prob', 'f8')])
+
+def spike_following_probability(spiketimes, offsets, sources, targets, width, delay=0.0, blocksize=10000):
+    """Calculate, for each edge (sources[i], targets[i]), the
+    fraction of spikes in the source for which the target fires at
+    least once within (delay, delay+width] interval.
+
+    spiketimes, offsets -- spike trains of all the cells as a ragged
+    array (see raggedarray.py) where row `i` is the sorted spike train
+    of vertex `i`.
+
+    sources, targets -- vertex ids of presynaptic and postsynaptic
+    cells.
+
+    blocksize -- number of edges processed together. Limits the
+    memory used for the expanded presynaptic spike times.
+
+    Returns a structured array of spike_prob_dtype with one entry per
+    edge. Sources without any spike get probability 0.0.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    ret = np.zeros(len(sources), dtype=spike_prob_dtype)
+    ret['pre'] = sources
+    ret['post'] = targets
+    for start in range(0, len(sources), blocksize):
+        pre = sources[start:start+blocksize]
+        post = targets[start:start+blocksize]
+        edge, positions = raggedarray.expand_rows(offsets, pre)
+        win_start = spiketimes[positions] + delay
+        win_end = win_start + width
+        hits = raggedarray.count_between(spiketimes, offsets, post[edge], win_start, win_end) > 0
+        hitcount = np.bincount(edge[hits], minlength=len(pre))
+        spikecount = raggedarray.row_lengths(offsets, pre)
+        valid = np.nonzero(spikecount > 0)[0]
+        ret['prob'][start + valid] = hitcount[valid] * 1.0 / spikecount[valid]
+    return ret
+
+def spike_following_probability_grid(spiketimes, offsets, sources, targets, windows, delays, blocksize=10000):
+    """Calculate spike following probabilities for every combination
+    of window width and delay in one pass over the edges.
+
+    For each delay the first target spike after (prespike + delay) is
+    looked up once. The target fires within (delay, delay+window] of
+    the prespike exactly when that spike is no later than (prespike +
+    delay + window), so all the windows come out of the same lookup.
+
+    Arguments are as in spike_following_probability except that
+    `windows` and `delays` are sequences.
+
+    Returns a float array of shape (len(sources), len(windows),
+    len(delays)) where ret[i, j, k] is the probability for edge i with
+    window windows[j] and delay delays[k].
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    windows = np.asarray(windows, dtype=np.float64).ravel()
+    delays = np.asarray(delays, dtype=np.float64).ravel()
+    ret = np.zeros((len(sources), len(windows), len(delays)))
+    for start in range(0, len(sources), blocksize):
+        pre = sources[start:start+blocksize]
+        post = targets[start:start+blocksize]
+        spikecount = raggedarray.row_lengths(offsets, pre)
+        valid = np.nonzero(spikecount > 0)[0]
+        edge, positions = raggedarray.expand_rows(offsets, pre)
+        rows = post[edge]
+        row_end = offsets[rows + 1]
+        for kk, delay in enumerate(delays):
+            win_start = spiketimes[positions] + delay
+            following = raggedarray.searchsorted(spiketimes, offsets, rows, win_start, side='right')
+            present = np.nonzero(following < row_end)[0]
+            next_spike = spiketimes[following[present]]
+            for jj, window in enumerate(windows):
+                hits = present[next_spike <= win_start[present] + window]
+                hitcount = np.bincount(edge[hits], minlength=len(pre))
+                ret[start + valid, jj, kk] = hitcount[valid] * 1.0 / spikecount[valid]
+    return ret
+
+# Record type for the stimulus linked probabilities of all cells for
+# all windows and delays. This is stored as the single dataset
+# /spiking_prob/stim_p in the stim_prob_ files, rows ordered by
+# window, delay and cell.
+stim_p_dtype = np.dtype([('window', 'f8'), ('delay', 'f8'), ('cell', '|S35'), ('prob_bg', 'f4'), ('prob_probe', 'f4'), ('spike_avg_bg', 'f4'), ('spike_avg_probe', 'f4')])
+
+def stimulus_response(spiketimes, offsets, stimtimes, windows, delays, blocksize=1000000):
+    """Count the spikes of every cell in (t+delay, t+delay+window]
+    after each stimulus time t for all windows and delays.
+
+    spiketimes, offsets -- spike trains of the cells as a ragged array.
+
+    stimtimes -- times of the stimulus presentations.
+
+    blocksize -- approximate number of window boundaries looked up
+    together. Limits the memory used.
+
+    Returns (responses, spikecounts), both of shape (number of cells,
+    len(windows), len(delays)). responses is the number of
+    presentations followed by at least one spike in the window and
+    spikecounts the total number of spikes in the window over all
+    presentations.
+    """
+    stimtimes = np.asarray(stimtimes, dtype=np.float64).ravel()
+    windows = np.asarray(windows, dtype=np.float64).ravel()
+    delays = np.asarray(delays, dtype=np.float64).ravel()
+    ncells = len(offsets) - 1
+    responses = np.zeros((ncells, len(windows), len(delays)), dtype=np.int64)
+    spikecounts = np.zeros((ncells, len(windows), len(delays)), dtype=np.int64)
+    if len(stimtimes) == 0:
+        return (responses, spikecounts)
+    # win_start[s, d] and win_end[s, w, d] as in the per cell loops
+    win_start = stimtimes[:, np.newaxis] + delays[np.newaxis, :]
+    win_end = win_start[:, np.newaxis, :] + windows[np.newaxis, :, np.newaxis]
+    per_cell = win_start.size + win_end.size
+    step = max(1, blocksize // per_cell)
+    for first in range(0, ncells, step):
+        cells = np.arange(first, min(ncells, first + step))
+        rows = np.repeat(cells, per_cell)
+        queries = np.tile(np.concatenate((win_start.ravel(), win_end.ravel())), len(cells))
+        index = raggedarray.searchsorted(spiketimes, offsets, rows, queries, side='right')
+        index = index.reshape((len(cells), per_cell))
+        start_index = index[:, :win_start.size].reshape((len(cells),) + win_start.shape)
+        end_index = index[:, win_start.size:].reshape((len(cells),) + win_end.shape)
+        counts = end_index - start_index[:, :, np.newaxis, :]
+        responses[cells] = np.sum(counts > 0, axis=1)
+        spikecounts[cells] = np.sum(counts, axis=1)
+    return (responses, spikecounts)
+
+def read_stim_p(grp):
+    """Return a list of (window, delay, data) from the /spiking_prob
+    group of a stim_prob_ file, where data is a structured array with
+    fields cell, prob_bg, prob_probe, spike_avg_bg and
+    spike_avg_probe. Reads both the single stim_p dataset and the
+    older layout with one prob_window_{i}_delta_{j} dataset per
+    window and delay."""
+    ret = []
+    if 'stim_p' in grp:
+        table = grp['stim_p'][:]
+        # the rows of each (window, delay) are contiguous
+        change = (np.diff(table['window']) != 0) | (np.diff(table['delay']) != 0)
+        boundaries = np.r_[0, np.nonzero(change)[0] + 1, len(table)]
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            if end > start:
+                ret.append((table['window'][start], table['delay'][start], table[start:end]))
+        return ret
+    for dsetname in grp:
+        dset = grp[dsetname]
+        ret.append((dset.attrs['window'], dset.attrs['delay'], dset[:]))
+    return ret
+
 class SpikeCondProb(object):
     def __init__(self, datafilepath, netfilepath=None, netfilepath_new=None):
         self.datafile = h5.File(datafilepath, 'r')
@@ -93,8 +247,6 @@ class SpikeCondProb(object):
         # A few boolean variables to keep track of what operations are possible on this set of data
         self.valid_bg_stimulus = True        
         self.valid_probe_stimulus = True     
-        self._bg_shortest_paths = None
-        self._probe_shortest_paths = None
         self.__check_validities()
         self.__load_ampa_graph()
         self.__load_spiketrains()
@@ -115,15 +267,20 @@ class SpikeCondProb(object):
         cellcount = np.sum(celltype_counts['count'])
         print 'Total cell count', cellcount
         start_index = 0
-        cell_start = {}
+        self.cell_start = {}
+        self.celltype_ranges = {}
         self.cells = []
         celltype_list = []
         for (celltype, count) in zip(celltype_counts['name'], celltype_counts['count']):
-            cell_start[celltype] = start_index
+            self.cell_start[celltype] = start_index
+            self.celltype_ranges[celltype] = slice(start_index, start_index + count)
             self.cells.extend(['%s_%d' % (celltype, ii) for ii in range(count)])
             celltype_list.extend([celltype] * count)
             start_index += count
         assert(len(self.cells) == start_index)
+        # Vertex ids are in the order of self.cells
+        self.cell_index = dict(zip(self.cells, range(start_index)))
+        self.cell_names = np.array(self.cells, dtype=str)
         graph = ig.Graph(0, directed=True)
         graph.add_vertices(start_index)
         graph.vs['name'] = self.cells
@@ -136,10 +293,36 @@ class SpikeCondProb(object):
         graph.add_edges(edges)
         self.ampa_graph = graph
 
+    def vertex_id(self, cell):
+        """Vertex id of the cell named `cell` in the AMPA graph."""
+        return self.cell_index[cell]
+
+    def vertex_ids(self, cells):
+        """Vertex ids of the cells named in `cells`. The cells of each
+        type are contiguous, so the id is computed from the celltype
+        and the index in the name.
+
+        Raises KeyError for a cell not in the network."""
+        if len(cells) == 0:
+            return np.zeros(0, dtype=np.int64)
+        ids = cell_ids(cells, self.cell_start)
+        bad = np.nonzero((ids < 0) | (ids >= len(self.cells)))[0]
+        if len(bad) == 0:
+            bad = np.nonzero(self.cell_names[ids] != np.asarray(cells, dtype=str))[0]
+        if len(bad) > 0:
+            raise KeyError(cells[bad[0]])
+        return ids
+
+    def celltype_vertices(self, celltype):
+        """Vertex ids of the cells of type `celltype`."""
+        vertices = self.celltype_ranges.get(celltype, slice(0, 0))
+        return np.arange(vertices.start, vertices.stop, dtype=np.int64)
+
     def __load_spiketrains(self):
-        self.spikes = {}
-        for cellname in self.datafile['/spikes']:
-            self.spikes[cellname] = np.asarray(self.datafile['/spikes'][cellname])
+        store = get_spike_store(self.datafile)
+        self.spikes = dict([(cellname, store[cellname]) for cellname in store])
+        # Spike trains in vertex order for the batch computations
+        self.spiketimes, self.spikeoffsets, = store.take(self.cells)
 
     def __load_stimuli(self):
         if not self.valid_bg_stimulus or not self.valid_probe_stimulus:
@@ -197,68 +380,115 @@ class SpikeCondProb(object):
                 count += 1
         return count * 1.0 / len(self.spikes[precell])
 
+    def calc_spike_prob_batch(self, sources, targets, width, delay=0.0):
+        """Same as calc_spike_prob for all (sources[i], targets[i])
+        pairs of vertex ids at once.
+
+        Returns a structured array with fields `pre`, `post` and
+        `prob`."""
+        return spike_following_probability(self.spiketimes, self.spikeoffsets, sources, targets, width, delay)
+
+    def calc_spike_prob_grid(self, sources, targets, windows, delays):
+        """Same as calc_spike_prob_batch for all combinations of
+        `windows` and `delays`.
+
+        Returns an array of shape (len(sources), len(windows),
+        len(delays))."""
+        return spike_following_probability_grid(self.spiketimes, self.spikeoffsets, sources, targets, windows, delays)
+
+    def get_edge_array(self, graph=None):
+        """Return the edges of `graph` (default: the AMPA graph) as an
+        array of (source, target) vertex ids in the AMPA graph."""
+        if graph is None:
+            graph = self.ampa_graph
+        edges = np.array(graph.get_edgelist(), dtype=np.int64).reshape((-1, 2))
+        if graph is not self.ampa_graph:
+            # The subgraph renumbers the vertices preserving the order
+            edges = self.excitatory_vertices[edges]
+        return edges
+
+    def spike_prob_to_dict(self, spike_prob, reverse=False):
+        """Convert the structured array from calc_spike_prob_batch
+        into a dict keyed by 'precell-postcell'. If reverse is True,
+        the key is 'postcell-precell'."""
+        if reverse:
+            keys = zip(spike_prob['post'], spike_prob['pre'])
+        else:
+            keys = zip(spike_prob['pre'], spike_prob['post'])
+        return dict([('%s-%s' % (self.cells[pre], self.cells[post]), prob) for ((pre, post), prob) in zip(keys, spike_prob['prob'])])
+
     def calc_spike_prob_all_connected(self, width, delay=0.0):
         """Calculate, for each pair of connected cells, the fraction
         of times the post synaptic cell fires within an interval
         (delay, width+delay] period"""        
-        spike_prob_connected = {}
-        for edge in self.ampa_graph.es:
-            precell = self.ampa_graph.vs[edge.source]['name']
-            postcell = self.ampa_graph.vs[edge.target]['name']
-            spike_prob_connected['%s-%s' % (precell, postcell)] = self.calc_spike_prob(precell, postcell, width, delay)
-        return spike_prob_connected
-
-    def calc_spike_prob_all_unconnected(self, width, delay=0.0):
+        edges = self.get_edge_array()
+        spike_prob = self.calc_spike_prob_batch(edges[:, 0], edges[:, 1], width, delay)
+        return self.spike_prob_to_dict(spike_prob)
+
+    def get_pair_sampler(self):
+        """PairSampler over the AMPA graph for picking unconnected
+        control pairs."""
+        if not hasattr(self, 'pair_sampler'):
+            edges = self.get_edge_array()
+            self.pair_sampler = PairSampler(len(self.cells), edges[:, 0], edges[:, 1], self.ampa_graph.vs['type'])
+        return self.pair_sampler
+
+    def pick_unconnected_pairs(self, seed=0):
+        """For each edge in the AMPA graph, pick a random target of
+        the same type as the postsynaptic cell that is not connected
+        to the presynaptic cell.
+
+        Returns an array of (source, control target) vertex ids."""
+        edges = self.get_edge_array()
+        return self.get_pair_sampler().sample_targets(edges[:, 0], edges[:, 1], seed=seed)
+
+    def calc_spike_prob_all_unconnected(self, width, delay=0.0, seed=0):
         """Calculate the spikeing probability of, for each source, an
         unconnected taget."""
-        spike_prob_unconnected = {}
-        for edge in self.ampa_graph.es:
-            pre_vertex = self.ampa_graph.vs[edge.source]
-            forbidden = set([edge.source])
-            for nn in self.ampa_graph.neighbors(edge.source, ig.OUT):
-                forbidden.add(nn)
-            post_type = self.ampa_graph.vs[edge.target]['type']
-            post_vs = self.ampa_graph.vs.select(type_eq=post_type)
-            indices = range(len(post_vs))
-            index = np.random.randint(len(post_vs))
-            while post_vs[index].index in forbidden or '%s-%s' % (pre_vertex['name'], post_vs[index]['name']) in spike_prob_unconnected:
-                index = np.random.randint(len(post_vs))
-            precell = pre_vertex['name']
-            postcell = post_vs[index]['name']
-            print 'Selected unconnected cell pair:', precell, postcell
-            spike_prob_unconnected['%s-%s' % (precell, postcell)] = self.calc_spike_prob(precell, postcell, width, delay)
-        return spike_prob_unconnected
+        pairs = self.pick_unconnected_pairs(seed)
+        spike_prob = self.calc_spike_prob_batch(pairs[:, 0], pairs[:, 1], width, delay)
+        return self.spike_prob_to_dict(spike_prob)
 
     def get_excitatory_subgraph(self):
         if not hasattr(self, 'excitatory_subgraph'):
-            self.excitatory_subgraph = self.ampa_graph.subgraph(self.ampa_graph.vs.select(lambda v: v['type'] in excitatory_celltypes))
+            vertices = [self.celltype_vertices(celltype) for celltype in excitatory_celltypes]
+            # Vertex i of the subgraph is vertex excitatory_vertices[i]
+            # of the AMPA graph.
+            self.excitatory_vertices = np.sort(np.concatenate(vertices))
+            self.excitatory_subgraph = self.ampa_graph.subgraph(self.excitatory_vertices.tolist())
         return self.excitatory_subgraph
         
     def calc_spike_prob_excitatory_connected(self, width, delay=0.0):
-        spike_prob = {}
-        for edge in self.get_excitatory_subgraph().es:
-            precell = self.get_excitatory_subgraph().vs[edge.source]['name']
-            postcell = self.get_excitatory_subgraph().vs[edge.target]['name']
-            spike_prob['%s-%s' % (precell, postcell)] = self.calc_spike_prob(precell, postcell, width, delay)
-            # print '$', precell, postcell
-        return spike_prob
-
-    def calc_spike_prob_excitatory_unconnected(self, width, delay):
-        spike_prob = {}
-        for edge in self.get_excitatory_subgraph().es:
-            pre = self.get_excitatory_subgraph().vs[edge.source]
-            post = self.get_excitatory_subgraph().vs[edge.target]
-            forbidden = set(self.get_excitatory_subgraph().neighbors(edge.source, ig.OUT))
-            post_vs = self.get_excitatory_subgraph().vs.select(type_eq=post['type'])
-            indices = range(len(post_vs))
-            index = np.random.randint(len(post_vs))
-            while post_vs[index].index in forbidden or '%s-%s' % (pre['name'], post_vs[index]['name']) in spike_prob:
-                index = np.random.randint(len(post_vs))
-            precell = pre['name']
-            postcell = post_vs[index]['name']
-            spike_prob['%s-%s' % (precell, postcell)] = self.calc_spike_prob(precell, postcell, width, delay)
-            # print '#', precell, post['name'], postcell
-        return spike_prob
+        edges = self.get_edge_array(self.get_excitatory_subgraph())
+        spike_prob = self.calc_spike_prob_batch(edges[:, 0], edges[:, 1], width, delay)
+        return self.spike_prob_to_dict(spike_prob)
+
+    def pick_unconnected_excitatory_pairs(self, mode='post', seed=0):
+        """For each edge in the excitatory subgraph pick a random
+        control pair of cells that are not connected.
+
+        mode='post' keeps the presynaptic cell and replaces the
+        postsynaptic cell by one of the same type that does not
+        receive input from the presynaptic cell.
+
+        mode='pre' keeps the postsynaptic cell and replaces the
+        presynaptic cell by one of the same type that does not
+        project to the postsynaptic cell.
+
+        Returns an array of (source, target) vertex ids in the AMPA
+        graph."""
+        edges = self.get_edge_array(self.get_excitatory_subgraph())
+        # The replacement has the type of an excitatory cell, so
+        # connections in the AMPA graph are the same as in the
+        # excitatory subgraph.
+        if mode == 'pre':
+            return self.get_pair_sampler().sample_sources(edges[:, 1], edges[:, 0], seed=seed)
+        return self.get_pair_sampler().sample_targets(edges[:, 0], edges[:, 1], seed=seed)
+
+    def calc_spike_prob_excitatory_unconnected(self, width, delay, seed=0):
+        pairs = self.pick_unconnected_excitatory_pairs(seed=seed)
+        spike_prob = self.calc_spike_prob_batch(pairs[:, 0], pairs[:, 1], width, delay)
+        return self.spike_prob_to_dict(spike_prob)
 
     def calc_prespike_prob_excitatory_connected(self, width, delay):
         """Calculate the probability of a presyanptic spike for each
@@ -267,31 +497,17 @@ class SpikeCondProb(object):
         width {width} at {delay} time ahead of the post synaptic
         spike.
         """
-        spike_prob = {}
-        for edge in self.get_excitatory_subgraph().es:
-            precell = self.get_excitatory_subgraph().vs[edge.source]['name']
-            postcell = self.get_excitatory_subgraph().vs[edge.target]['name']
-            spike_prob['%s-%s' % (precell, postcell)] = self.calc_spike_prob(postcell, precell, width, -delay)
-        return spike_prob
+        edges = self.get_edge_array(self.get_excitatory_subgraph())
+        spike_prob = self.calc_spike_prob_batch(edges[:, 1], edges[:, 0], width, -delay)
+        return self.spike_prob_to_dict(spike_prob, reverse=True)
             
-    def calc_prespike_prob_excitatory_unconnected(self, width, delay):
+    def calc_prespike_prob_excitatory_unconnected(self, width, delay, seed=0):
         """Calculate the probability of a random unconnected cell
         spiking within a window of width {width} {delay} period before
         spiking in a cell."""
-        spike_prob = {}
-        for edge in self.get_excitatory_subgraph().es:
-            pre = self.get_excitatory_subgraph().vs[edge.source]
-            post = self.get_excitatory_subgraph().vs[edge.target]
-            forbidden = set(self.get_excitatory_subgraph().neighbors(edge.target, ig.IN))
-            pre_vs = self.get_excitatory_subgraph().vs.select(type_eq=pre['type'])
-            indices = range(len(pre_vs))
-            index = np.random.randint(len(pre_vs))
-            while pre_vs[index].index in forbidden or '%s-%s' % (pre_vs[index]['name'], post['name']) in spike_prob:
-                index = np.random.randint(len(pre_vs))
-            precell = pre_vs[index]['name']
-            postcell = post['name']
-            spike_prob['%s-%s' % (precell, postcell)] = self.calc_spike_prob(postcell, precell, width, -delay)
-        return spike_prob
+        pairs = self.pick_unconnected_excitatory_pairs(mode='pre', seed=seed)
+        spike_prob = self.calc_spike_prob_batch(pairs[:, 1], pairs[:, 0], width, -delay)
+        return self.spike_prob_to_dict(spike_prob, reverse=True)
 
     def calc_spike_prob_after_bgstim(self, cell, width, delay):
         """Calculate the probability of spike following a background
@@ -366,38 +582,69 @@ class SpikeCondProb(object):
                                       (self.spikes[cell] <= (self.probe_times[ii] + delay + width)))[0])
         return spike_count / len(self.probe_times)
 
+    def calc_stim_p_table(self, windowlist, delaylist):
+        """Calculate the probability of spiking and the average spike
+        count after background only and after background + probe
+        stimulus for all cells, windows and delays together.
+
+        Same as the calc_spike_prob_after_* and
+        calc_spikecount_avg_after_* functions, with -1 where these
+        cannot be computed.
+
+        Returns a structured array of stim_p_dtype."""
+        windows = np.asarray(windowlist, dtype=np.float64).ravel()
+        delays = np.asarray(delaylist, dtype=np.float64).ravel()
+        shape = (len(windows), len(delays), len(self.cells))
+        table = np.zeros(shape, dtype=stim_p_dtype)
+        table['window'] = windows[:, np.newaxis, np.newaxis]
+        table['delay'] = delays[np.newaxis, :, np.newaxis]
+        table['cell'] = np.array(self.cells, dtype='|S35')[np.newaxis, np.newaxis, :]
+        for field in ['prob_bg', 'prob_probe', 'spike_avg_bg', 'spike_avg_probe']:
+            table[field] = -1.0
+        if self.valid_bg_stimulus and hasattr(self, 'bg_times'):
+            only_bg_count = len(self.bg_times) - len(self.probe_times)
+            if only_bg_count > 0:
+                # Probe stimulus comes with every other bg stimulus
+                responses, spikecounts, = stimulus_response(self.spiketimes, self.spikeoffsets, self.bg_times[::2], windows, delays)
+                table['prob_bg'] = np.transpose(responses, (1, 2, 0)) * 1.0 / only_bg_count
+                table['spike_avg_bg'] = np.transpose(spikecounts, (1, 2, 0)) * 1.0 / only_bg_count
+        if self.valid_probe_stimulus and hasattr(self, 'probe_times') and len(self.probe_times) > 0:
+            responses, spikecounts, = stimulus_response(self.spiketimes, self.spikeoffsets, self.probe_times, windows, delays)
+            table['prob_probe'] = np.transpose(responses, (1, 2, 0)) * 1.0 / len(self.probe_times)
+            table['spike_avg_probe'] = np.transpose(spikecounts, (1, 2, 0)) * 1.0 / len(self.probe_times)
+        return table.ravel()
+
+    def write_stim_p(self, stimprobfile, windowlist, delaylist):
+        """Compute the stimulus linked probabilities and save them in
+        the open HDF5 file `stimprobfile`. Returns the table."""
+        table = self.calc_stim_p_table(windowlist, delaylist)
+        grp = stimprobfile.create_group('/spiking_prob')
+        grp.attrs['NOTE'] = 'prob_bg is probability of spiking after \
+only background stimulus. prob_probe is that after background + probe stimulus. \
+spike_avg_bg is the average spike count after background only stimulus. \
+spike_avg_probe is teh average spike count after background + probe. \
+stim_p has one row for each window, delay and cell in that order.'
+        dset = grp.create_dataset('stim_p', data=table)
+        dset.attrs['windows'] = np.asarray(windowlist, dtype=np.float64)
+        dset.attrs['delays'] = np.asarray(delaylist, dtype=np.float64)
+        return table
+
     def dump_stim_p(self, windowlist, delaylist, overwrite=False):
         outfilepath = self.datafile.filename.replace('/data_', '/stim_prob_')
         if not os.path.exists(outfilepath) or overwrite:
             if hasattr(self, 'stimprobfile'):
                 self.stimprobfile.close()
-            self.stimprobfile = h5.File(outfilepath, 'w')
-            grp = self.stimprobfile.create_group('/spiking_prob')
-            grp.attrs['NOTE'] = 'prob_bg is probability of spiking after \
-only background stimulus. prob_probe is that after background + probe stimulus. \
-spike_avg_bg is the average spike count after background only stimulus. \
-spike_avg_probe is teh average spike count after background + probe.'            
-            ii = 0
-            for window in windowlist:
-                jj = 0
-                for delay in delaylist:
-                    bg_p = [self.calc_spike_prob_after_bgstim(cell, window, delay) for cell in self.cells]
-                    probe_p = [self.calc_spike_prob_after_probestim(cell, window, delay) for cell in self.cells]
-                    bg_spikeavg = [self.calc_spikecount_avg_after_bgstim(cell, window, delay) for cell in self.cells]
-                    probe_spikeavg = [self.calc_spikecount_avg_after_probestim(cell, window, delay) for cell in self.cells]
-                    data = zip(self.cells, bg_p, probe_p, bg_spikeavg, probe_spikeavg)
-                    dtype = np.dtype([('cell', '|S35'), ('prob_bg', 'f4'), ('prob_probe', 'f4'), ('spike_avg_bg', 'f4'), ('spike_avg_probe', 'f4')])
-                    data = np.asarray(data, dtype=dtype)
-                    dset = grp.create_dataset('prob_window_%d_delta_%d' % (ii, jj), data=data)
-                    dset.attrs['delay'] = delay
-                    dset.attrs['window'] = window
-                    jj += 1
-                ii += 1
-            self.stimprobfile.close()
+                del self.stimprobfile
+            with atomic_output(outfilepath) as tmppath:
+                stimprobfile = h5.File(tmppath, 'w')
+                try:
+                    self.write_stim_p(stimprobfile, windowlist, delaylist)
+                finally:
+                    stimprobfile.close()
             self.stimprobfile = h5.File(outfilepath, 'r')
         if not hasattr(self, 'stimprobfile'):
             self.stimprobfile = h5.File(outfilepath, 'r')
-        
+
     def get_stim_p(self, celltype='', windows=WINDOWS, delays=DELAYS, overwrite=False):
         """Calculate the stimulus linked probability increase due to
         probe stimulus from background for each window sizes at all
@@ -409,10 +656,7 @@ spike_avg_probe is teh average spike count after background + probe.'
         grp = self.stimprobfile['spiking_prob']
         cells = None
         cellindices = None
-        for dsetname in grp:
-            dset = grp[dsetname]
-            delay = dset.attrs['delay']
-            window = dset.attrs['window']
+        for window, delay, stim_p in read_stim_p(grp):
             # print 'Original dataset:', delay, window
             delay_in = False
             for entry in delays:
@@ -425,7 +669,7 @@ spike_avg_probe is teh average spike count after background + probe.'
                     window_in = True
                     break
             if  (len(delays) == 0) or (len(windows) == 0) or (window_in and delay_in):
-                data = dset[:]
+                data = stim_p
             else:
                 continue
             if cells is None:
@@ -473,6 +717,35 @@ spike_avg_probe is teh average spike count after background + probe.'
             ret.append((data[WINDOW], data[DELAY], data[PROBEP] - data[BGP]))
         return (cells, ret)
 
+    def get_stim_distances(self, stim='probe'):
+        """Shortest path lengths in the AMPA graph from the cells
+        receiving stimulus `stim` ('probe' or 'bg').
+
+        Returns (vertices, distances) where vertices are the indices
+        of the stimulated cells and distances[i, j] is the length of
+        the shortest path from vertices[i] to vertex j (-1 if there is
+        none)."""
+        if not hasattr(self, '_stim_distances'):
+            self._stim_distances = {}
+        if stim not in self._stim_distances:
+            if stim == 'probe':
+                targets = self.probe_targets
+            else:
+                targets = self.bg_targets
+            vertices = np.unique(self.vertex_ids([cell for cell in targets if cell in self.cell_index]))
+            edges = self.get_edge_array()
+            offsets, neighbours, = csr_adjacency(len(self.cells), edges[:, 0], edges[:, 1])
+            self._stim_distances[stim] = (vertices, hop_distances(offsets, neighbours, vertices))
+        return self._stim_distances[stim]
+
+    def __path_length_dict(self, stim):
+        vertices, distances, = self.get_stim_distances(stim)
+        ret = defaultdict(dict)
+        for vertex, row in zip(vertices, distances):
+            reached = np.nonzero(row >= 0)[0]
+            ret[int(vertex)] = dict(zip(reached.tolist(), row[reached].tolist()))
+        return ret
+
     def get_bg_shortest_path_lengths(self):
         """Returns a dictionary of dictionaries mapping
         backgroun-stimulust-target to each cell to the length of the
@@ -482,18 +755,8 @@ spike_avg_probe is teh average spike count after background + probe.'
         vertex with index x to vertex with index y, where x the vertex
         index of a cell stimulated by the background stimulus.
         """
-        if hasattr(self, 'bg_path_lengths') and self.bg_path_lengths is not None:
-            return self.bg_path_lengths
-        self.bg_vertices = self.ampa_graph.vs.select(name_in=self.bg_targets)
-        self.bg_path_lengths = defaultdict(dict)
-        if self._bg_shortest_paths is None:
-            self._bg_shortest_paths = {}
-            for vv in self.bg_vertices:
-                paths = self.ampa_graph.get_all_shortest_paths(vv.index, mode=ig.OUT)
-                self._bg_shortest_paths[vv['name']] = paths
-                for path in paths:
-                    self.bg_path_lengths[vv.index][path[-1]] = len(path) - 1
-
+        if not hasattr(self, 'bg_path_lengths'):
+            self.bg_path_lengths = self.__path_length_dict('bg')
         return self.bg_path_lengths
         
     def get_probe_shortest_path_lengths(self):
@@ -503,17 +766,8 @@ spike_avg_probe is teh average spike count after background + probe.'
         Return a dictionary of dictionaries. self.bg_path[v1][v2] ==
         pathlength from vertex with index v1 to that with index v2.
         """
-        if hasattr(self, 'probe_path_lengths'):
-            return self.probe_path_lengths
-        self.probe_vertices = self.ampa_graph.vs.select(name_in=self.probe_targets)
-        self.probe_path_lengths = defaultdict(dict)
-        if self._probe_shortest_paths is None:
-            self._probe_shortest_paths = {}
-            for vv in self.probe_vertices:
-                paths = self.ampa_graph.get_all_shortest_paths(vv.index, mode=ig.OUT)
-                self._probe_shortest_paths[vv['name']] = paths
-                for path in paths:
-                    self.probe_path_lengths[vv.index][path[-1]] =  len(path) - 1
+        if not hasattr(self, 'probe_path_lengths'):
+            self.probe_path_lengths = self.__path_length_dict('probe')
         return self.probe_path_lengths
 
     def calc_stim_shortest_distance_del_p_correlation(self, celltype='', windows=WINDOWS, delays=DELAYS, overwrite=False):
@@ -521,25 +775,14 @@ spike_avg_probe is teh average spike count after background + probe.'
         stimulated set. This does not (yet) take synaptic strength
         into account."""
         ret = []
-        probepathlenmap = self.get_probe_shortest_path_lengths()        
         cells, del_p_list, = self.get_stim_del_p(celltype, windows, delays, overwrite)
-        vseq = [self.ampa_graph.vs.select(name_eq=cell)[0] for cell in cells]
-        probeshortest = []
         # Collect the shortest of the distances to cells in the
         # probe-stimulated set in the same order as in del_p list
-        ii = 0
-        probeshortest = np.ones(len(cells)) * np.inf
-        for vtarget in vseq:            
-            for vprobe in self.probe_vertices:                
-                try:
-                    new_val = probepathlenmap[vprobe.index][vtarget.index]
-                    if new_val < probeshortest[ii]:
-                        probeshortest[ii] = new_val
-                except KeyError:
-                    print "Cell pair not connected:", vprobe['name'], vtarget['name']
-                    # print 'Vertex connectivity:', self.ampa_graph.vertex_connectivity(vprobe.index, vtarget.index)            
-            ii += 1
+        vertices, distances, = self.get_stim_distances('probe')
+        probeshortest = min_distance(distances)[self.vertex_ids(cells)]
         mask = np.nonzero(probeshortest < np.inf)[0]
+        if len(mask) < len(cells):
+            print 'Cells not connected to probe stimulated cells:', len(cells) - len(mask)
         for (window, delay, del_p) in del_p_list:
             if max(del_p) == 0.0:
                 print 'Warning:', self.datafile.filename, ', window:', window, ', delay:', delay, ': del_p is all zero'
@@ -562,34 +805,20 @@ spike_avg_probe is teh average spike count after background + probe.'
 
         The situation is intuitively similar to parallel resistors
         where each different path gives an additional route for signal
-        to reach the target."""
-        probepathlenmap = defaultdict(float)
-        if stim == 'probe':
-            pldicts = self.get_probe_shortest_path_lengths().values()
-        else:
-            pldicts = self.get_bg_shortest_path_lengths().values()
-
-        for pathlendict in pldicts:
-            for target_index, pathlength in pathlendict.items():
-                if pathlength != 0.0:
-                    probepathlenmap[target_index] += 1.0/pathlength
-                else:
-                    probepathlenmap[target_index] = np.inf
-        for key, value in probepathlenmap.items():
-            if value != 0.0:
-                probepathlenmap[key] = 1.0/value
-            else:
-                probepathlenmap[key] = np.inf
-        return probepathlenmap
+        to reach the target.
+
+        Returns an array with the equivalent distance of every vertex,
+        0 for the stimulated cells and inf for cells not reachable
+        from any of them."""
+        vertices, distances, = self.get_stim_distances(stim)
+        return equivalent_distance(distances)
 
     def calc_stim_eqv_distance_del_p_correlation(self, celltype='', windows=WINDOWS, delays=DELAYS, overwrite=False):
         """Correlate the distance to the probe stimulated cells to
         del_p. """
         ret = []
-        probepathlenmap = self.get_stim_eqv_distance()
         cells, del_p_list, = self.get_stim_del_p(celltype, windows, delays, overwrite)
-        vseq = [self.ampa_graph.vs.select(name_eq=cell)[0] for cell in cells]
-        pathlengths = np.array([probepathlenmap[vv.index] for vv in vseq], dtype=float)
+        pathlengths = self.get_stim_eqv_distance()[self.vertex_ids(cells)]
         mask = np.nonzero(pathlengths < np.inf)[0]
         for (window, delay, del_p) in del_p_list:
             if max(del_p) == 0.0:
@@ -613,12 +842,12 @@ def check_valid_files(filenames, celltype):
     invalid = []
     for name in filenames:
         df = h5.File(name, 'r')
-        data = [np.asarray(df['spiking_prob'][dset]) for dset in df['spiking_prob']]
-        ss_bg_prob = dict([(row[0], row[1]) for row in data[0] if row[0].startswith(celltype)])
+        window, delay, data, = read_stim_p(df['spiking_prob'])[0]
+        bg_prob = data['prob_bg'][np.char.startswith(data['cell'], celltype)]
         orig_data_file_name = name.replace('stim_prob_', 'data_')
         odf = h5.File(orig_data_file_name, 'r')
         stim = odf['/stimulus/stim_bg'][:]
-        if max(ss_bg_prob.values()) == -1.0:
+        if len(bg_prob) == 0 or max(bg_prob) == -1.0:
             invalid.append(odf.filename)
             if len(np.nonzero(np.diff(stim)<0)[0]) > 0:
                 print 'Warning:', odf.filename, 'has stimulus but no related spike'
@@ -643,24 +872,15 @@ def display_probability_plots(filelistfile, celltype):
     valid_files, invalid_files, = check_valid_files(probability_files, celltype)
     for filename in valid_files:
         dataf = h5.File(filename, 'r')
-        num_datasets = len(dataf['spiking_prob'])
-        rowcount = int(num_datasets / 2.0 + 0.5)        
+        stim_p_list = read_stim_p(dataf['spiking_prob'])
+        rowcount = int(len(stim_p_list) / 2.0 + 0.5)        
         plotindex = 1
         plt.figure(figsize=(8,11))
         plt.clf()
-        for dataset_name in dataf['spiking_prob']:
-            dataset = dataf['spiking_prob'][dataset_name]
-            delay = dataset.attrs['delay']
-            window = dataset.attrs['window']
-            data = dataset[:]
-            cell_indices = np.nonzero(np.char.startswith(data['cell'], celltype))[0]
-            bgp = data['prob_bg'][cell_indices]     
-            bg_indices = np.nonzero(bgp >=0)[0]
-            probep = data['prob_probe'][cell_indices][bg_indices]
-            probe_indices = np.nonzero(probep >=0)[0]
-            bgp = bgp[probe_indices]
-            probep = probep[probe_indices]
-            deltap = probep - bgp
+        for window, delay, data, in stim_p_list:
+            data = data[np.char.startswith(data['cell'], celltype)]
+            data = data[(data['prob_bg'] >= 0) & (data['prob_probe'] >= 0)]
+            deltap = data['prob_probe'] - data['prob_bg']
             plt.subplot(rowcount, 2, plotindex)
             plotindex += 1
             plt.bar(np.arange(0,len(deltap), 1.0), deltap)
@@ -688,25 +908,16 @@ def display_delp_with_distance(filelistfile, celltype):
         probe_indices = np.char.equal(stimdata['f0'], '/stim/stim_probe')
         probe_targets = [token[2] for token in np.char.split(stimdata['f1'][probe_indices], '/')]
         probf = h5.File(filename, 'r')
-        num_datasets = len(dataf['spiking_prob'])
-        rowcount = int(num_datasets / 2.0 + 0.5)        
+        stim_p_list = read_stim_p(probf['spiking_prob'])
+        rowcount = int(len(stim_p_list) / 2.0 + 0.5)        
         plotindex = 1
         plt.figure(figsize=(8,11))
         plt.clf()
-        for dataset_name in probf['spiking_prob']:
-            dataset = dataf['spiking_prob'][dataset_name]
-            delay = dataset.attrs['delay']
-            window = dataset.attrs['window']
-            data = dataset[:]
-            cell_indices = np.nonzero(np.char.startswith(data['cell'], celltype))[0]
-            bgp = data['prob_bg'][cell_indices]     
-            bg_indices = np.nonzero(bgp >=0)[0]
-            probep = data['prob_probe'][cell_indices][bg_indices]
-            probe_indices = np.nonzero(probep >=0)[0]
-            bgp = bgp[bg_indices][probe_indices]
-            probep = probep[probe_indices]
-            deltap = probep - bgp
-            cells = data['cell'][cell_indices][bg_indices][probe_indices]
+        for window, delay, data, in stim_p_list:
+            data = data[np.char.startswith(data['cell'], celltype)]
+            data = data[(data['prob_bg'] >= 0) & (data['prob_probe'] >= 0)]
+            deltap = data['prob_probe'] - data['prob_bg']
+            cells = data['cell']
             plt.subplot(rowcount, 2, plotindex)
             plotindex += 1
             plt.bar(np.arange(0,len(deltap), 1.0), deltap)
@@ -716,7 +927,8 @@ def display_delp_with_distance(filelistfile, celltype):
         figfile = '%s' % (filename.replace('.h5', '.png').replace('stim_prob_', 'stim_delprob_%s' % (celltype)))
         plt.savefig(figfile)
         print 'Figure saved in:', figfile        
-        dataf.close()
+        probf.close()
+        netf.close()
         plt.show()
     
 
@@ -740,7 +952,90 @@ def test_main():
     pylab.show()
 
 
-def run_on_files(filelist, windowlist, delaylist, mode):
+def run_on_file(datafilepath, windowlist, delaylist, mode):
+    """Dump the probability histograms for one data file. See
+    run_on_files. Returns the paths of the data and plot files."""
+    file_prefix = 'exc'
+    unconn_mode = 'post'
+    reverse = False
+    delays = np.asarray(delaylist, dtype=float)
+    if mode == 'pre':
+        file_prefix = 'exc_pre'
+        unconn_mode = 'pre'
+        reverse = True
+        # Probability of the presynaptic cell firing within the window
+        # ahead of a postsynaptic spike.
+        delays = -delays
+    start = datetime.now()
+    netfilepath = datafilepath.replace('/data_', '/network_')
+    print 'Netfile path', netfilepath
+    outfilepath = datafilepath.replace('/data_', '/%s_hist_' % (file_prefix)).replace('.h5', '.pdf')
+    dataoutpath = datafilepath.replace('/data_', '/%s_prob_' % (file_prefix))
+    with atomic_output(dataoutpath) as tmpdatapath, atomic_output(outfilepath) as tmpplotpath:
+        dataout = h5.File(tmpdatapath, 'w')
+        outfile = PdfPages(tmpplotpath)
+        try:
+            grp = dataout.create_group('/spiking_prob')
+            prob_counter = SpikeCondProb(datafilepath, netfilepath)
+            conn_edges = prob_counter.get_edge_array(prob_counter.get_excitatory_subgraph())
+            unconn_edges = prob_counter.pick_unconnected_excitatory_pairs(mode=unconn_mode)
+            if reverse:
+                conn_edges = conn_edges[:, ::-1]
+                unconn_edges = unconn_edges[:, ::-1]
+            conn_grid = prob_counter.calc_spike_prob_grid(conn_edges[:, 0], conn_edges[:, 1], windowlist, delays)
+            unconn_grid = prob_counter.calc_spike_prob_grid(unconn_edges[:, 0], unconn_edges[:, 1], windowlist, delays)
+            conn_prob = np.zeros(len(conn_edges), dtype=spike_prob_dtype)
+            conn_prob['pre'] = conn_edges[:, 0]
+            conn_prob['post'] = conn_edges[:, 1]
+            unconn_prob = np.zeros(len(unconn_edges), dtype=spike_prob_dtype)
+            unconn_prob['pre'] = unconn_edges[:, 0]
+            unconn_prob['post'] = unconn_edges[:, 1]
+            jj = 0
+            for window in windowlist:
+                rows = len(delaylist)
+                cols = 2
+                if rows * cols < len(delaylist):
+                    rows += 1
+                figure = plt.figure()
+                ii = 0
+                for kk, delay in enumerate(delaylist):
+                    conn_prob['prob'] = conn_grid[:, jj, kk]
+                    connected_prob = prob_counter.spike_prob_to_dict(conn_prob, reverse=reverse)
+                    dset = grp.create_dataset('conn_window_%d_delta_%d' % (jj, ii/2), data=np.asarray(connected_prob.items(), dtype=('|S35,f')))
+                    dset.attrs['delay'] = delay
+                    dset.attrs['window'] = window
+                    unconn_prob['prob'] = unconn_grid[:, jj, kk]
+                    unconnected_prob = prob_counter.spike_prob_to_dict(unconn_prob, reverse=reverse)
+                    dset = grp.create_dataset('unconn_window_%d_delta_%d' % (jj, ii/2), data=np.asarray(unconnected_prob.items(), dtype=('|S35,f')))            
+                    dset.attrs['delay'] = delay
+                    dset.attrs['window'] = window
+                    data = [np.asarray(connected_prob.values()), np.asarray(unconnected_prob.values())]
+                    labels = ['conn w:%g,d:%g' % (window, delay), 'unconn w:%g,d:%g' % (window, delay)]
+                    axes = plt.subplot(rows, cols, ii+1)
+                    plt.hist(data, bins=np.arange(0, 1.1, 0.1), normed=True, histtype='bar', label=labels)
+                    plt.legend(prop={'size':'xx-small'})
+                    plt.ylim([0, 10.0])
+                    plt.xlim([0, 1.1])
+                    axes = plt.subplot(rows, cols, ii+2)
+                    plt.hist(data, bins=np.arange(0, 1.1, 0.1), normed=True, histtype='step', cumulative=True, label=labels)
+                    plt.legend(prop={'size':'xx-small'})
+                    plt.ylim([0, 10.0])
+                    plt.xlim([0, 1.1])
+                    ii += 2
+                    print 'finished delay:', delay
+                jj += 1
+                print 'finished window', window
+                outfile.savefig(figure)
+                figure.clf()
+        finally:
+            dataout.close()
+            outfile.close()
+    end = datetime.now()
+    delta = end - start        
+    print 'Finished:', netfilepath, 'in', (delta.seconds + 1e-6 * delta.microseconds)
+    return (dataoutpath, outfilepath)
+
+def run_on_files(filelist, windowlist, delaylist, mode, workers=None):
     """Go through specified datafiles and dump the probability
     historgrams.
 
@@ -761,93 +1056,32 @@ def run_on_files(filelist, windowlist, delaylist, mode):
     specified in windowlist. Same calculation is done for a randomly
     chosen unconnected cells. The data is dumped in files named
     'exc_hist_{ID}.pdf' as plot and 'exc_prob_{ID}.h5' as table.
+
+    The files are processed in parallel by `workers` processes (all
+    CPUs if None). Returns the list of batchrun.BatchResult for the
+    files.
     """
-    unconn_fun = SpikeCondProb.calc_spike_prob_excitatory_unconnected
-    conn_fun = SpikeCondProb.calc_spike_prob_excitatory_connected
-    file_prefix = 'exc'
-    if mode == 'pre':
-        unconn_fun = SpikeCondProb.calc_prespike_prob_excitatory_unconnected
-        conn_fun = SpikeCondProb.calc_prespike_prob_excitatory_connected
-        file_prefix = 'exc_pre'
-    
-    for datafilepath in filelist:
-        start = datetime.now()
-        netfilepath = datafilepath.replace('/data_', '/network_')
-        print 'Netfile path', netfilepath
-        outfilepath = datafilepath.replace('/data_', '/%s_hist_' % (file_prefix)).replace('.h5', '.pdf')
-        dataoutpath = datafilepath.replace('/data_', '/%s_prob_' % (file_prefix))
-        dataout = h5.File(dataoutpath, 'w')
-        grp = dataout.create_group('/spiking_prob')
-        outfile = PdfPages(outfilepath)
-        prob_counter = SpikeCondProb(datafilepath, netfilepath)
-        jj = 0
-        for window in windowlist:
-            rows = len(delaylist)
-            cols = 2
-            if rows * cols < len(delaylist):
-                rows += 1
-            figure = plt.figure()
-            ii = 0
-            for delay in delaylist:
-                connected_prob = conn_fun(prob_counter, window, delay)
-                dset = grp.create_dataset('conn_window_%d_delta_%d' % (jj, ii/2), data=np.asarray(connected_prob.items(), dtype=('|S35,f')))
-                dset.attrs['delay'] = delay
-                dset.attrs['window'] = window
-                unconnected_prob = unconn_fun(prob_counter, window, delay)
-                dset = grp.create_dataset('unconn_window_%d_delta_%d' % (jj, ii/2), data=np.asarray(unconnected_prob.items(), dtype=('|S35,f')))            
-                dset.attrs['delay'] = delay
-                dset.attrs['window'] = window
-                data = [np.asarray(connected_prob.values()), np.asarray(unconnected_prob.values())]
-                labels = ['conn w:%g,d:%g' % (window, delay), 'unconn w:%g,d:%g' % (window, delay)]
-                axes = plt.subplot(rows, cols, ii+1)
-                plt.hist(data, bins=np.arange(0, 1.1, 0.1), normed=True, histtype='bar', label=labels)
-                plt.legend(prop={'size':'xx-small'})
-                plt.ylim([0, 10.0])
-                plt.xlim([0, 1.1])
-                axes = plt.subplot(rows, cols, ii+2)
-                plt.hist(data, bins=np.arange(0, 1.1, 0.1), normed=True, histtype='step', cumulative=True, label=labels)
-                plt.legend(prop={'size':'xx-small'})
-                plt.ylim([0, 10.0])
-                plt.xlim([0, 1.1])
-                ii += 2
-                print 'finished delay:', delay
-            jj += 1
-            print 'finished window', window
-            outfile.savefig(figure)
-            figure.clf()
-        dataout.close()
-        outfile.close()
-        end = datetime.now()
-        delta = end - start        
-        print 'Finished:', netfilepath, 'in', (delta.seconds + 1e-6 * delta.microseconds)
-                
-def dump_stimulus_linked_probabilities(datafilelist, windowlist, delaylist):
-    netfilelist = [line.strip().replace('/data_', '/network_') for line in datafilelist]
-    for datafilepath, netfilepath in zip(datafilelist, netfilelist):
-        outfilepath = datafilepath.replace('/data_', '/stim_prob_')
-        print 'Outfilepath:', outfilepath
-        plotfilepath = datafilepath.replace('/data_', '/stim_hist_').replace('.h5', '.pdf')
-        print 'Plotfile path:', plotfilepath
-        dataout = h5.File(outfilepath, 'w')
-        grp = dataout.create_group('/spiking_prob')
-        grp.attrs['NOTE'] = 'Probability of spiking after a stimulus within a specified time window.'
-        plotfile = PdfPages(plotfilepath)
-        prob_counter = SpikeCondProb(datafilepath, netfilepath)
-        ii = 0        
-        for window in windowlist:
-            jj = 0
-            for delay in delaylist:
-                prob_post_bg = [prob_counter.calc_spike_prob_after_bgstim(cell, window, delay) for cell in prob_counter.cells]
-                prob_post_probe = [prob_counter.calc_spike_prob_after_probestim(cell, window, delay) for cell in prob_counter.cells]
-                spike_avg_post_bg = [prob_counter.calc_spikecount_avg_after_bgstim(cell, window, delay) for cell in prob_counter.cells]
-                spike_avg_post_probe = [prob_counter.calc_spikecount_avg_after_probestim(cell, window, delay) for cell in prob_counter.cells]
-                # Save data into hdf5 file
-                data = zip(prob_counter.cells, prob_post_bg, prob_post_probe, spike_avg_post_bg, spike_avg_post_probe)
-                dtype=np.dtype([('cell', '|S35'), ('prob_bg', 'f4'), ('prob_probe', 'f4'), ('spike_avg_bg', 'f4'), ('spike_avg_probe', 'f4')])
-                array_data = np.asarray(data, dtype=dtype)
-                dataset = grp.create_dataset('prob_window_%d_delta_%d' % (ii, jj), data=array_data)
-                dataset.attrs['delay'] = delay
-                dataset.attrs['window'] = window
+    results = run_batch(run_on_file, filelist, args=(windowlist, delaylist, mode), workers=workers)
+    print_report(results)
+    return results
+
+def dump_stimulus_linked_probability(datafilepath, windowlist, delaylist):
+    """Dump the probabilities of spiking after stimulus for one data
+    file. See dump_stimulus_linked_probabilities."""
+    netfilepath = datafilepath.strip().replace('/data_', '/network_')
+    outfilepath = datafilepath.replace('/data_', '/stim_prob_')
+    print 'Outfilepath:', outfilepath
+    plotfilepath = datafilepath.replace('/data_', '/stim_hist_').replace('.h5', '.pdf')
+    print 'Plotfile path:', plotfilepath
+    with atomic_output(outfilepath) as tmpoutpath, atomic_output(plotfilepath) as tmpplotpath:
+        dataout = h5.File(tmpoutpath, 'w')
+        plotfile = PdfPages(tmpplotpath)
+        try:
+            prob_counter = SpikeCondProb(datafilepath, netfilepath)
+            prob_counter.write_stim_p(dataout, windowlist, delaylist)
+            for window, delay, data, in read_stim_p(dataout['/spiking_prob']):
+                prob_post_bg = data['prob_bg']
+                prob_post_probe = data['prob_probe']
                 if len(prob_post_probe) == 0 or min(prob_post_probe) == max(prob_post_probe):
                     continue
                 # Now plot the data
@@ -858,37 +1092,54 @@ def dump_stimulus_linked_probabilities(datafilelist, windowlist, delaylist):
                 plt.xlim([0.0, 1.1])
                 plt.legend(prop={'size':'xx-small'})
                 # plt.show()
-                print 'finished delay:', delay
+                print 'finished window:', window, 'delay:', delay
                 plotfile.savefig(figure)
                 figure.clf()
-                jj += 1
-            ii += 1
-            print 'finished window:', window
-        print 'Finished', netfilepath, datafilepath
-        plotfile.close()
-        dataout.close()
+        finally:
+            plotfile.close()
+            dataout.close()
+    print 'Finished', netfilepath, datafilepath
+    return (outfilepath, plotfilepath)
+
+def dump_stimulus_linked_probabilities(datafilelist, windowlist, delaylist, workers=None):
+    """Dump the probabilities of spiking after background and probe
+    stimuli for every file in datafilelist, processing `workers` files
+    in parallel (all CPUs if None)."""
+    datafilelist = [line.strip() for line in datafilelist]
+    results = run_batch(dump_stimulus_linked_probability, datafilelist, args=(windowlist, delaylist), workers=workers)
+    print_report(results)
+    return results
 
 def do_run_dump_stimulus_linked_probabilities(filelistfile):
     files = [line.strip() for line in open(filelistfile, 'r')]
     windows = np.arange(0, 0.05, 10e-3)
     dump_stimulus_linked_probabilities(files, windows, [0.0])
 
-def do_dump_stim_shortest_distance_delp_corr(filelist, celltype='', overwrite=False):
+def stim_shortest_distance_delp_corr(datafilename, celltype='', overwrite=False):
+    sp = SpikeCondProb(datafilename)
+    return sp.calc_stim_shortest_distance_del_p_correlation(celltype, windows=WINDOWS, delays=DELAYS, overwrite=overwrite)
+
+def stim_eqv_distance_delp_corr(datafilename, celltype='', overwrite=False):
+    sp = SpikeCondProb(datafilename)
+    return sp.calc_stim_eqv_distance_del_p_correlation(celltype, windows=WINDOWS, delays=DELAYS, overwrite=overwrite)
+
+def do_dump_stim_shortest_distance_delp_corr(filelist, celltype='', overwrite=False, workers=None):
     ret = {}
     filenames = []
     if isinstance(filelist, str):
         filenames = [line.strip() for line in open(filelist, 'r')]
     elif isinstance(filelist, list):
         filenames = filelist
-    for datafilename in filenames:
-        sp = SpikeCondProb(datafilename)
-        xx = sp.calc_stim_shortest_distance_del_p_correlation(celltype, windows=WINDOWS, delays=DELAYS, overwrite=overwrite)
-        ret[datafilename] = xx
-        # for (window, delay, corrcoef) in xx[1]:
-        #     print 'filename:', datafilename, 'window:', window, 'delay:', delay, 'corrcoef:', corrcoef
+    results = run_batch(stim_shortest_distance_delp_corr, filenames, args=(celltype, overwrite), workers=workers)
+    print_report(results)
+    for result in results:
+        if result.ok:
+            ret[result.item] = result.value
+        # for (window, delay, corrcoef) in result.value[1]:
+        #     print 'filename:', result.item, 'window:', window, 'delay:', delay, 'corrcoef:', corrcoef
     return ret
 
-def do_dump_stim_eqv_distance_delp_corr(filelist, celltype='', overwrite=False):
+def do_dump_stim_eqv_distance_delp_corr(filelist, celltype='', overwrite=False, workers=None):
     """Calculate and print the correlation between equivalent distance
     to probe stimulus set and del_p."""
     ret = {}
@@ -897,12 +1148,13 @@ def do_dump_stim_eqv_distance_delp_corr(filelist, celltype='', overwrite=False):
         filenames = [line.strip() for line in open(filelist, 'r')]
     elif isinstance(filelist, list):
         filenames = filelist
-    for datafilename in filenames:
-        sp = SpikeCondProb(datafilename)
-        xx = sp.calc_stim_eqv_distance_del_p_correlation(celltype, windows=WINDOWS, delays=DELAYS, overwrite=overwrite)
-        ret[datafilename] = xx
-        # for (window, delay, corrcoef) in xx[1]:
-        #     print 'filename:', datafilename, 'window:', window, 'delay:', delay, 'corrcoef:', corrcoef
+    results = run_batch(stim_eqv_distance_delp_corr, filenames, args=(celltype, overwrite), workers=workers)
+    print_report(results)
+    for result in results:
+        if result.ok:
+            ret[result.item] = result.value
+        # for (window, delay, corrcoef) in result.value[1]:
+        #     print 'filename:', result.item, 'window:', window, 'delay:', delay, 'corrcoef:', corrcoef
     return ret
 
 import sys
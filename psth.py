@@ -0,0 +1,230 @@
+# psth.py ---
+#
+# Filename: psth.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 15:31:08 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 15:31:08 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Peri-stimulus time histograms for many groups of cells at once.
+#
+# All the spikes of a data file are aligned to the stimulus epochs
+# in one go (see epochs.py), each spike gets the index of its group
+# (usually the celltype of the cell) and its bin, and a single
+# np.bincount over (group, bin) gives the count matrix for all the
+# groups. The cost is linear in the total number of spikes.
+#
+# The bins follow np.histogram: edges[i] <= t < edges[i+1], with the
+# last bin closed on the right.
+#
+# A cell belongs to every celltype that occurs in its name (as in
+# analyzer.chunks_from_multiple_datafile), so with overlapping names
+# like 'SupPyr' and 'SupPyrRS' its spikes count for both. Ectopic
+# spike sources belong to none. celltype_membership() is this rule
+# for both the counts and the chunks.
+#
+# aligned_chunks() keeps the aligned spikes instead of counting them:
+# for each celltype an array of spike times relative to the epoch
+# start and an array of chunk ids, a chunk being the spikes of one
+# cell in one epoch. This is what the binsize search needs, and it is
+# small enough to pass from worker processes (see batchrun.py) and
+# merge with merge_chunks().
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+import raggedarray
+import epochs
+
+def bin_index(times, edges):
+    """Index of the histogram bin for each entry in times, -1 for
+    times outside [edges[0], edges[-1]]."""
+    times = np.asarray(times, dtype=np.float64)
+    nbins = len(edges) - 1
+    index = np.searchsorted(edges, times, side='right') - 1
+    # np.histogram includes the right edge in the last bin
+    index[times == edges[-1]] = nbins - 1
+    index[(index < 0) | (index >= nbins)] = -1
+    return index
+
+def count_matrix(groups, times, ngroups, edges):
+    """Histogram `times` separately for each group.
+
+    groups -- group index of each entry in times. Entries with a
+    negative group are ignored.
+
+    Returns an array of shape (ngroups, len(edges)-1) with the counts
+    in each bin for each group."""
+    groups = np.asarray(groups, dtype=np.int64)
+    nbins = len(edges) - 1
+    bins = bin_index(times, edges)
+    valid = np.nonzero((groups >= 0) & (bins >= 0))[0]
+    counts = np.bincount(groups[valid] * nbins + bins[valid], minlength=ngroups * nbins)
+    return counts.reshape((ngroups, nbins))
+
+def normalize(counts, trials, binsize):
+    """Convert counts into firing rate: divide the row for each group
+    by the number of trials (stimulus presentations x cells) in that
+    group and by the binsize. Groups without any trial get 0."""
+    trials = np.asarray(trials, dtype=np.float64)
+    ret = np.zeros(counts.shape)
+    valid = np.nonzero(trials > 0)[0]
+    ret[valid] = counts[valid] / (trials[valid, np.newaxis] * binsize)
+    return ret
+
+def celltype_membership(cellnames, celltypes):
+    """Boolean array of shape (len(cellnames), len(celltypes)), True
+    where the celltype occurs in the cell name. Rows of ectopic spike
+    sources are all False."""
+    cellnames = np.asarray(cellnames, dtype=str)
+    ret = np.zeros((len(cellnames), len(celltypes)), dtype=bool)
+    if len(cellnames) == 0:
+        return ret
+    not_ectopic = ~np.char.startswith(cellnames, 'ectopic')
+    for jj, celltype in enumerate(celltypes):
+        ret[:, jj] = not_ectopic & (np.char.find(cellnames, celltype) >= 0)
+    return ret
+
+def stim_aligned_counts(store, celltypes, stimstart, stimwidth, edges, stop=None, inclusive_start=False):
+    """PSTH counts of all the celltypes in a SpikeStore.
+
+    The epochs are back to back windows of stimwidth starting at
+    stimstart and ending before `stop` (default: last spike in the
+    store).
+
+    Returns (counts, trials) where counts has shape (len(celltypes),
+    len(edges)-1) and trials[i] is the number of cells of celltypes[i]
+    times the number of epochs. A spike counts for every celltype of
+    its cell (see celltype_membership)."""
+    members = celltype_membership(store.names, celltypes)
+    if stop is None:
+        stop = np.max(store.values) if len(store.values) > 0 else stimstart
+    starts = epochs.periodic_starts(stimstart, stimwidth, stop)
+    epoch_ids, reltimes, = epochs.align_spikes(store.values, starts, stimwidth, inclusive_start=inclusive_start)
+    # ragged array of the celltypes of each cell, one entry per
+    # (spike, celltype of its cell) pair
+    member_cells, member_types, = np.nonzero(members)
+    member_offsets = np.zeros(len(members) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(member_cells, minlength=len(members)), out=member_offsets[1:])
+    valid = np.nonzero(epoch_ids >= 0)[0]
+    owner, positions, = raggedarray.expand_rows(member_offsets, raggedarray.row_ids(store.offsets)[valid])
+    counts = count_matrix(member_types[positions], reltimes[valid][owner], len(celltypes), edges)
+    return (counts, members.sum(axis=0) * len(starts))
+
+def aligned_chunks(store, celltypes, stimstart, stimwidth, inclusive_start=False):
+    """Spikes of each celltype in a SpikeStore cut into chunks of
+    stimwidth starting at stimstart, as in analyzer.extract_chunks.
+
+    A cell belongs to every celltype occurring in its name, ectopic
+    spike sources are left out (see celltype_membership).
+
+    Returns a list with an entry (reltimes, chunk_ids, nchunks, ncells)
+    for each celltype, where reltimes are the spike times relative to
+    the start of the chunk, chunk_ids number the non-empty chunks from
+    0 to nchunks-1 in the order of cell and epoch, and ncells is the
+    number of cells of the celltype."""
+    stop = np.max(store.values) if len(store.values) > 0 else stimstart
+    starts = epochs.periodic_starts(stimstart, stimwidth, stop)
+    epoch_ids, reltimes, = epochs.align_spikes(store.values, starts, stimwidth, inclusive_start=inclusive_start)
+    cells = raggedarray.row_ids(store.offsets)
+    membership = celltype_membership(store.names, celltypes)
+    ret = []
+    for jj in range(len(celltypes)):
+        members = membership[:, jj]
+        index = np.nonzero(members[cells] & (epoch_ids >= 0))[0]
+        # spikes are sorted by cell and then time, so by (cell, epoch)
+        keys = cells[index] * len(starts) + epoch_ids[index]
+        if len(index) > 0:
+            chunk_ids = np.cumsum(np.r_[0, np.diff(keys) != 0])
+            nchunks = chunk_ids[-1] + 1
+        else:
+            chunk_ids = np.zeros(0, dtype=np.int64)
+            nchunks = 0
+        ret.append((reltimes[index], chunk_ids, nchunks, np.count_nonzero(members)))
+    return ret
+
+def merge_chunks(parts):
+    """Combine (reltimes, chunk_ids, nchunks, ...) tuples from
+    several files into one, renumbering the chunk ids so that they
+    stay distinct. Returns (reltimes, chunk_ids, nchunks)."""
+    if len(parts) == 0:
+        return (np.zeros(0), np.zeros(0, dtype=np.int64), 0)
+    counts = np.array([part[2] for part in parts], dtype=np.int64)
+    shift = np.r_[0, np.cumsum(counts)[:-1]]
+    reltimes = np.concatenate([part[0] for part in parts])
+    chunk_ids = np.concatenate([np.asarray(part[1], dtype=np.int64) + offset for part, offset in zip(parts, shift)])
+    return (reltimes, chunk_ids, int(np.sum(counts)))
+
+def binsize_costs(spiketimes, timewindow, binsizes, ntrains, blocksize=1000000):
+    """Shimazaki-Shinomoto cost (2 * mean - variance) / (ntrains *
+    binsize)**2 of the PSTH of spiketimes for every entry in binsizes.
+
+    For each binsize the histogram is the same as np.histogram(spikes,
+    np.arange(0, timewindow, binsize)). The spikes are sorted once and
+    the counts of all the bins of all the candidates come out of a
+    single searchsorted into the sorted spikes. `blocksize` limits the
+    number of bin edges handled together.
+
+    Returns an array of costs, inf for binsizes that do not give at
+    least one bin."""
+    spikes = np.sort(np.asarray(spiketimes, dtype=np.float64).ravel())
+    binsizes = np.asarray(binsizes, dtype=np.float64).ravel()
+    # same number of edges as np.arange(0, timewindow, binsize)
+    nedges = np.ceil(timewindow / binsizes)
+    nedges = np.where(nedges > 0, nedges, 0).astype(np.int64)
+    costs = np.ones(len(binsizes)) * np.inf
+    valid = np.nonzero(nedges >= 2)[0]
+    start = 0
+    while start < len(valid):
+        stop = start + max(1, np.searchsorted(np.cumsum(nedges[valid[start:]]), blocksize, side='right'))
+        block = valid[start:stop]
+        offsets = np.zeros(len(block) + 1, dtype=np.int64)
+        np.cumsum(nedges[block], out=offsets[1:])
+        rows = raggedarray.row_ids(offsets)
+        edges = (np.arange(offsets[-1], dtype=np.int64) - offsets[rows]) * binsizes[block][rows]
+        # number of spikes before each edge, the last edge of each
+        # candidate is inclusive as in np.histogram
+        cumcount = np.searchsorted(spikes, edges, side='left')
+        last = offsets[1:] - 1
+        cumcount[last] = np.searchsorted(spikes, edges[last], side='right')
+        same_row = np.nonzero(rows[1:] == rows[:-1])[0]
+        counts = (cumcount[1:] - cumcount[:-1])[same_row].astype(np.float64)
+        binrows = rows[1:][same_row]
+        nbins = nedges[block] - 1.0
+        total = np.bincount(binrows, counts, minlength=len(block))
+        mean = total / nbins
+        variance = (np.bincount(binrows, counts * counts, minlength=len(block)) - total * mean) / nbins
+        costs[block] = (2 * mean - variance) / (ntrains * binsizes[block]) ** 2
+        start = stop
+    return costs
+
+def optimal_binsize(spiketimes, timewindow, binsizes, ntrains):
+    """Return (binsize, cost, costs) where binsize is the entry in
+    binsizes with the lowest cost and costs is the whole cost
+    curve. See binsize_costs."""
+    costs = binsize_costs(spiketimes, timewindow, binsizes, ntrains)
+    best = np.argmin(costs)
+    return (np.asarray(binsizes).ravel()[best], costs[best], costs)
+
+
+#
+# psth.py ends here
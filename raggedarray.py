@@ -0,0 +1,151 @@
+# raggedarray.py ---
+#
+# Filename: raggedarray.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 10:12:05 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 10:12:05 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Utilities for ragged arrays stored in CSR form: all the rows are
+# concatenated into one `values` array and row `i` occupies
+# values[offsets[i]:offsets[i+1]].
+#
+# This is how we keep the spike trains of all the cells in a
+# network: one row per cell, each row sorted in time. The functions
+# here let us do lookups into many rows at once without a Python
+# loop over the cells.
+#
+
+# Change log:
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+def from_arrays(arrays, dtype=np.float64):
+    """Concatenate a sequence of 1D arrays into (values, offsets)."""
+    lengths = np.array([len(arr) for arr in arrays], dtype=np.int64)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if len(arrays) > 0:
+        values = np.concatenate([np.asarray(arr, dtype=dtype) for arr in arrays])
+    else:
+        values = np.zeros(0, dtype=dtype)
+    return (values, offsets)
+
+def to_arrays(values, offsets):
+    """Split a ragged array back into a list of arrays (views into
+    values)."""
+    return [values[offsets[ii]:offsets[ii+1]] for ii in range(len(offsets) - 1)]
+
+def row_lengths(offsets, rows=None):
+    """Number of entries in each row (or in each of `rows`)."""
+    lengths = np.diff(offsets)
+    if rows is None:
+        return lengths
+    return lengths[rows]
+
+def row_ids(offsets):
+    """Return an array of the same length as values with the row index
+    of each entry."""
+    lengths = np.diff(offsets)
+    return np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+
+def expand_rows(offsets, rows):
+    """Enumerate the entries of the given rows.
+
+    rows -- row indices, possibly repeated.
+
+    Returns (owner, positions) where positions are the indices into
+    `values` of all the entries in rows[0], rows[1], ... in that order
+    and owner[k] is the index into `rows` that positions[k] came
+    from.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    lengths = offsets[rows + 1] - offsets[rows]
+    owner = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+    # start of each expanded row in the output
+    out_start = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=out_start[1:])
+    positions = np.arange(len(owner), dtype=np.int64) - out_start[owner] + offsets[rows][owner]
+    return (owner, positions)
+
+def searchsorted(values, offsets, rows, queries, side='right'):
+    """Vectorized np.searchsorted over the rows of a ragged array.
+
+    For each k, find the insertion point of queries[k] in the sorted
+    row rows[k]. Every row of `values` must be sorted in ascending
+    order.
+
+    All the rows are searched together by shifting row `i` by `i *
+    span` so that the concatenated values form one sorted key
+    array. Rounding in the shifted keys can put an insertion point
+    off by an entry or two, so the result is then corrected by
+    comparing the original values.
+
+    Returns the insertion points as absolute indices into `values`,
+    i.e. offsets[rows[k]] <= ret[k] <= offsets[rows[k]+1]. Subtract
+    offsets[rows] to get the index within the row.
+    """
+    if side not in ('left', 'right'):
+        raise ValueError('side must be "left" or "right", got: %s' % (side))
+    rows = np.asarray(rows, dtype=np.int64)
+    queries = np.asarray(queries, dtype=np.float64)
+    lower = offsets[rows]
+    upper = offsets[rows + 1]
+    if len(values) == 0 or len(queries) == 0:
+        return lower.copy()
+    base = np.min(values)
+    span = np.max(values) - base + 1.0
+    keys = row_ids(offsets) * span + (values - base)
+    # Clip the queries so that they do not spill over into the
+    # neighbouring rows.
+    shifted = np.clip(queries - base, -0.5, span - 0.5)
+    index = np.searchsorted(keys, rows * span + shifted, side=side)
+    index = np.clip(index, lower, upper)
+    if side == 'right':
+        after = lambda x, q: x > q
+    else:
+        after = lambda x, q: x >= q
+    # move left while the previous entry should come after the query
+    while True:
+        candidates = np.nonzero(index > lower)[0]
+        moves = candidates[after(values[index[candidates] - 1], queries[candidates])]
+        if len(moves) == 0:
+            break
+        index[moves] -= 1
+    # move right while the current entry should come before the query
+    while True:
+        candidates = np.nonzero(index < upper)[0]
+        moves = candidates[~after(values[index[candidates]], queries[candidates])]
+        if len(moves) == 0:
+            break
+        index[moves] += 1
+    return index
+
+def count_between(values, offsets, rows, lower, upper):
+    """Count the entries x of row rows[k] with lower[k] < x <= upper[k]."""
+    nqueries = len(lower)
+    index = searchsorted(values, offsets,
+                         np.concatenate((rows, rows)),
+                         np.concatenate((lower, upper)),
+                         side='right')
+    return index[nqueries:] - index[:nqueries]
+
+
+#
+# raggedarray.py ends here
@@ -0,0 +1,322 @@
+# runcatalog.py ---
+#
+# Filename: runcatalog.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 02:11:48 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 02:11:48 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# SQLite catalog of simulation runs.
+#
+# Picking the data files for an analysis (by date, simtime, stimulus
+# or network) used to mean opening every data file and its network
+# file. RunCatalog keeps one row per data file in an SQLite database
+# with what these selections need:
+#
+# runs -- path of the data file and its network file, their size and
+# modification time, the date in the file name, simtime, plotdt, the
+# rng seed used for generating the network, a hash of
+# /runconfig/cellcount, a hash of /stimulus/connection in the network
+# file, the number of background and probe pulses and the error
+# message if the files could not be read.
+#
+# stimulus -- the (name, value) rows of /runconfig/stimulus of each
+# data file.
+#
+# scan(directory) indexes the data files under a directory, reading
+# only those that are new or whose data or network file changed since
+# the last scan. Then the selections are SQL queries:
+#
+# catalog = RunCatalog('runcatalog.db')
+# catalog.scan('/data/subha/cortical_data')
+# files = catalog.select('date >= ? AND simtime >= ?', ('2012-01-01', 5.0))
+#
+# The hashes are hex SHA1 digests so that they are the same in every
+# process and can be compared across catalogs.
+#
+# RunCatalog() without a path uses the per-user database
+# $XDG_CACHE_HOME/dataviz/runcatalog.db (~/.cache/dataviz/runcatalog.db
+# if XDG_CACHE_HOME is not set), never the current directory or the
+# data directories.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import os
+import hashlib
+import fnmatch
+import sqlite3
+import datetime
+from collections import defaultdict
+import h5py as h5
+
+import analyzer
+from runconfig import RunConfig, parse_value
+
+DB_NAME = 'runcatalog.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    datafile TEXT PRIMARY KEY,
+    netfile TEXT,
+    size INTEGER,
+    mtime REAL,
+    net_size INTEGER,
+    net_mtime REAL,
+    date TEXT,
+    simtime REAL,
+    plotdt REAL,
+    rngseed TEXT,
+    cellcount_hash TEXT,
+    stim_hash TEXT,
+    bg_pulses INTEGER,
+    probe_pulses INTEGER,
+    error TEXT);
+CREATE INDEX IF NOT EXISTS runs_network ON runs (rngseed, cellcount_hash, stim_hash);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (date, simtime);
+CREATE TABLE IF NOT EXISTS stimulus (
+    datafile TEXT,
+    name TEXT,
+    value TEXT,
+    PRIMARY KEY (datafile, name));
+CREATE INDEX IF NOT EXISTS stimulus_param ON stimulus (name, value);
+'''
+
+def default_dbpath():
+    """Path of the catalog database used when none is given, in the
+    user's cache directory."""
+    cachedir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cachedir, 'dataviz', DB_NAME)
+
+def network_filename(datafile):
+    """Path of the network file for a data file data_{ID}.h5, None if
+    it does not exist. network_{ID}.h5.new is preferred over
+    network_{ID}.h5."""
+    directory, filename, = os.path.split(datafile)
+    if not filename.startswith('data_'):
+        return None
+    netfilename = filename.replace('data_', 'network_', 1)
+    for candidate in [netfilename.replace('.h5', '.h5.new'), netfilename]:
+        path = os.path.join(directory, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+def file_date(path):
+    """Date in a file name of the form prefix_YYYYMMDD_HHMMSS_PID.h5
+    as YYYY-MM-DD, None if there is none."""
+    token = os.path.basename(path).split('_')
+    if len(token) < 3:
+        return None
+    try:
+        return datetime.datetime.strptime(token[-3], '%Y%m%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+def table_hash(rows):
+    """Hex SHA1 digest of a table of (key, value, ...) rows, independent
+    of the order of the rows."""
+    lines = sorted([','.join([str(item) for item in row]) for row in rows])
+    return hashlib.sha1('\n'.join(lines)).hexdigest()
+
+def stat(path):
+    """(size, mtime) of path, (None, None) if path is None."""
+    if path is None:
+        return (None, None)
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime)
+
+def read_run(datafile):
+    """Catalog row and stimulus parameters of one data file.
+
+    Returns (row, stimulus) where row is a dict with the columns of
+    the runs table and stimulus is a list of (name, value). If the
+    files cannot be read, row has the error message and whatever was
+    read before."""
+    netfile = network_filename(datafile)
+    size, mtime, = stat(datafile)
+    net_size, net_mtime, = stat(netfile)
+    row = {'datafile': datafile, 'netfile': netfile,
+           'size': size, 'mtime': mtime,
+           'net_size': net_size, 'net_mtime': net_mtime,
+           'date': file_date(datafile),
+           'simtime': None, 'plotdt': None, 'rngseed': None,
+           'cellcount_hash': None, 'stim_hash': None,
+           'bg_pulses': None, 'probe_pulses': None, 'error': None}
+    stimulus = []
+    try:
+        fhandle = h5.File(datafile, 'r')
+        try:
+            config = RunConfig(fhandle)
+            row['simtime'] = config.simtime
+            row['plotdt'] = config.plotdt
+            if 'rngseed' in config.numeric:
+                row['rngseed'] = str(config.numeric['rngseed'])
+            elif 'numpy_rngseed' in config.numeric:
+                row['rngseed'] = str(config.numeric['numpy_rngseed'])
+            if len(config.cellcount) > 0:
+                row['cellcount_hash'] = table_hash(config.cellcount.items())
+            stimulus = [(name, str(value)) for name, value in config.stimulus.items()]
+            if '/stimulus/stim_bg' in fhandle:
+                row['bg_pulses'] = len(analyzer.get_bgtimes(fhandle))
+            if '/stimulus/stim_probe' in fhandle:
+                row['probe_pulses'] = len(analyzer.get_probetimes(fhandle))
+        finally:
+            fhandle.close()
+        if netfile is not None:
+            fhandle = h5.File(netfile, 'r')
+            try:
+                if '/stimulus/connection' in fhandle:
+                    row['stim_hash'] = table_hash(fhandle['/stimulus/connection'][:].tolist())
+            finally:
+                fhandle.close()
+    except Exception, e:
+        row['error'] = '%s: %s' % (e.__class__.__name__, e)
+    return (row, stimulus)
+
+class RunCatalog(object):
+    """SQLite catalog of the data files of simulation runs, kept in
+    the database at dbpath (default_dbpath() if None)."""
+    def __init__(self, dbpath=None):
+        if dbpath is None:
+            dbpath = default_dbpath()
+            if not os.path.isdir(os.path.dirname(dbpath)):
+                os.makedirs(os.path.dirname(dbpath))
+        self.dbpath = dbpath
+        self.connection = sqlite3.connect(dbpath)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def __contains__(self, datafile):
+        return self.connection.execute('SELECT 1 FROM runs WHERE datafile = ?', (datafile,)).fetchone() is not None
+
+    def is_current(self, datafile):
+        """True if datafile is in the catalog and neither it nor its
+        network file changed since it was indexed."""
+        entry = self.connection.execute('SELECT netfile, size, mtime, net_size, net_mtime FROM runs WHERE datafile = ?', (datafile,)).fetchone()
+        if entry is None:
+            return False
+        netfile = network_filename(datafile)
+        return tuple(entry) == (netfile,) + stat(datafile) + stat(netfile)
+
+    def update(self, datafiles):
+        """Index the files in datafiles that are not in the catalog or
+        changed since they were indexed. Returns the list of files
+        (re)indexed."""
+        changed = [datafile for datafile in datafiles if not self.is_current(datafile)]
+        for datafile in changed:
+            row, stimulus, = read_run(datafile)
+            if row['error'] is not None:
+                print 'Could not index', datafile, '-', row['error']
+            columns = sorted(row.keys())
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO runs (%s) VALUES (%s)' % (', '.join(columns), ', '.join(['?'] * len(columns))),
+                                        [row[column] for column in columns])
+                self.connection.execute('DELETE FROM stimulus WHERE datafile = ?', (datafile,))
+                self.connection.executemany('INSERT INTO stimulus VALUES (?, ?, ?)', [(datafile, name, value) for name, value in stimulus])
+        return changed
+
+    def remove(self, datafiles):
+        with self.connection:
+            for datafile in datafiles:
+                self.connection.execute('DELETE FROM runs WHERE datafile = ?', (datafile,))
+                self.connection.execute('DELETE FROM stimulus WHERE datafile = ?', (datafile,))
+
+    def scan(self, directory, pattern='data*.h5', minsize=1 << 20):
+        """Index the files matching `pattern` of at least minsize bytes
+        under directory (files smaller than 1 MB have no useful data)
+        and drop the entries of files under directory that are gone.
+
+        Returns the list of files (re)indexed."""
+        found = []
+        for dirpath, dirnames, filenames, in os.walk(directory):
+            for filename in fnmatch.filter(filenames, pattern):
+                path = os.path.join(dirpath, filename)
+                if os.path.getsize(path) >= minsize:
+                    found.append(path)
+        prefix = os.path.join(directory, '')
+        known = [entry[0] for entry in self.connection.execute('SELECT datafile FROM runs WHERE substr(datafile, 1, ?) = ?', (len(prefix), prefix))]
+        self.remove(set(known) - set(found))
+        return self.update(found)
+
+    def select(self, where='1', params=(), stimulus=None):
+        """Data files whose runs row satisfies the SQL condition
+        `where` (with ? placeholders filled from params), sorted by
+        name. Files that could not be read are left out.
+
+        stimulus -- dict of stimulus parameter: value that the files
+        must have. Values are compared as numbers if possible."""
+        query = 'SELECT datafile FROM runs WHERE error IS NULL AND (%s)' % (where)
+        params = list(params)
+        if stimulus is not None:
+            for name, value in stimulus.items():
+                if isinstance(value, (int, long, float)):
+                    query += ' AND datafile IN (SELECT datafile FROM stimulus WHERE name = ? AND CAST(value AS REAL) = ?)'
+                else:
+                    query += ' AND datafile IN (SELECT datafile FROM stimulus WHERE name = ? AND value = ?)'
+                params.extend([name, value])
+        query += ' ORDER BY datafile'
+        return [entry[0] for entry in self.connection.execute(query, params)]
+
+    def with_stimulus(self, where='1', params=()):
+        """Data files that have both background and probe pulses. See
+        select."""
+        return self.select('bg_pulses > 0 AND probe_pulses > 0 AND (%s)' % (where), params)
+
+    def stimulus(self, datafile):
+        """Dict of the stimulus parameters of datafile, with the values
+        converted as in runconfig."""
+        return dict([(name, parse_value(value)) for name, value, in self.connection.execute('SELECT name, value FROM stimulus WHERE datafile = ?', (datafile,))])
+
+    def run(self, datafile):
+        """The runs row of datafile as a dict, None if it is not in the
+        catalog."""
+        cursor = self.connection.execute('SELECT * FROM runs WHERE datafile = ?', (datafile,))
+        entry = cursor.fetchone()
+        if entry is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], entry))
+
+    def categorise(self, datafiles=None):
+        """Group data files by network: the rng seed and then the hash
+        of the cellcount and stimulus connection tables.
+
+        Returns a dict of seed: {network hash: [data files]}. Files
+        without a seed, cellcount or stimulus connection are left
+        out."""
+        query = 'SELECT datafile, rngseed, cellcount_hash, stim_hash FROM runs WHERE error IS NULL AND rngseed IS NOT NULL AND cellcount_hash IS NOT NULL AND stim_hash IS NOT NULL ORDER BY datafile'
+        wanted = None
+        if datafiles is not None:
+            wanted = set(datafiles)
+        ret = defaultdict(lambda: defaultdict(list))
+        for datafile, seed, cellcount_hash, stim_hash, in self.connection.execute(query):
+            if wanted is None or datafile in wanted:
+                ret[seed]['%s.%s' % (cellcount_hash, stim_hash)].append(datafile)
+        return dict([(seed, dict(groups)) for seed, groups in ret.items()])
+
+
+#
+# runcatalog.py ends here
@@ -0,0 +1,106 @@
+# runconfig.py ---
+#
+# Filename: runconfig.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 23:58:20 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 23:58:20 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Simulation settings saved under /runconfig in the data files.
+#
+# The scheduling, stimulus and numeric tables have rows of (name,
+# value) with the value saved as a string, and cellcount has rows of
+# (celltype, count). RunConfig reads all of them once and converts the
+# values, so that looking up simtime or the stimulus interval does not
+# walk the tables again. Older files without /runconfig/scheduling
+# keep simtime and plotdt as attributes of the file.
+#
+# Use get_runconfig(filehandle) to get the RunConfig of an open file,
+# which reads /runconfig only the first time a file is seen among the
+# recent ones.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import sidecar
+
+def parse_value(text):
+    """Convert text into int or float if possible, otherwise return
+    it as it is."""
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+class RunConfig(object):
+    """Contents of /runconfig of a data file.
+
+    scheduling, stimulus, numeric -- dicts of name: value with the
+    values converted by parse_value. Empty if the table is missing.
+
+    celltypes -- celltypes in the order of /runconfig/cellcount.
+
+    cellcount -- dict of celltype: number of cells.
+
+    simtime, simdt, plotdt -- float, or None if not available.
+    """
+    def __init__(self, filehandle):
+        self.filename = filehandle.filename
+        self.scheduling = self.__read_table(filehandle, 'scheduling')
+        self.stimulus = self.__read_table(filehandle, 'stimulus')
+        self.numeric = self.__read_table(filehandle, 'numeric')
+        self.celltypes = []
+        self.cellcount = {}
+        if '/runconfig/cellcount' in filehandle:
+            for row in filehandle['/runconfig/cellcount'][:]:
+                self.celltypes.append(row[0])
+                self.cellcount[row[0]] = int(row[1])
+        self.simtime = self.__get_float(filehandle, 'simtime')
+        self.simdt = self.__get_float(filehandle, 'simdt')
+        self.plotdt = self.__get_float(filehandle, 'plotdt')
+
+    def __read_table(self, filehandle, name):
+        path = '/runconfig/%s' % (name)
+        if path not in filehandle:
+            return {}
+        return dict([(row[0], parse_value(row[1])) for row in filehandle[path][:]])
+
+    def __get_float(self, filehandle, name):
+        if '/runconfig/scheduling' in filehandle:
+            value = self.scheduling.get(name)
+        else:
+            value = filehandle.attrs.get(name)
+        if value is None:
+            return None
+        return float(value)
+
+
+_configs = sidecar.FileMemo()
+
+def get_runconfig(filehandle):
+    """Return the RunConfig for an open data file."""
+    return _configs.get(filehandle.filename, lambda: RunConfig(filehandle))
+
+
+#
+# runconfig.py ends here
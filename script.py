@@ -38,6 +38,8 @@ import pylab
 from numpy import fft
 import igraph as ig
 
+from netgraph import read_cellnetwork
+
 class XcorrPlotter:
     def __init__(self, filename='../py/data/data_20101201_102647_8854.h5'):
         self.fd = h5py.File(filename, 'r')
@@ -82,39 +84,22 @@ class NetAnalyzer:
                 self.cellindex[cellname] = start + ii
             start += cell[0] # 0-th column is count for the celltype
         print 'Finished reading cell list'
-        cellnet = self.fd['/network/cellnetwork']
-        t_start = datetime.now()
-        ampa = cellnet['gampa']
-        self.ampanet = ig.Graph(0, directed=True)
-        self.ampanet.add_vertices(len(self.celllist))
-        self.ampanet.vs['name'] = self.celllist
-        ampa_edges = [(int(entry[0]), int(entry[1])) for entry in ampa]
-        self.ampanet.add_edges(ampa_edges)
-        self.ampanet.es['weight'] = [entry[2] for entry in ampa]
-        t_end = datetime.now()
-        t_delta = t_end - t_start
-        print 'Finished creating AMPA net in %g s' % (t_delta.days * 86400.0 + t_delta.seconds + 1e-6 * t_delta.microseconds)
-        t_start = datetime.now()
-        nmda = cellnet['gnmda']
-        self.nmdanet = ig.Graph(0, directed=True)
-        self.nmdanet.add_vertices(len(self.celllist))
-        nmda_edges = [(int(entry[0]), int(entry[1])) for entry in nmda]
-        self.nmdanet.add_edges(nmda_edges)
-        self.nmdanet.es['weight'] = [entry[2] for entry in nmda]
-        t_end = datetime.now()
-        t_delta = t_end - t_start
-        print 'Finished creating GABA net in %g s' % (t_delta.days * 86400.0 + t_delta.seconds + 1e-6 * t_delta.microseconds)
+        self.ampanet = self.__load_net('ampa')
+        self.nmdanet = self.__load_net('nmda')
+        self.gabanet = self.__load_net('gaba')
+
+    def __load_net(self, syntype):
         t_start = datetime.now()
-        gaba = cellnet['ggaba']
-        self.gabanet = ig.Graph(0, directed=True)
-        self.gabanet.add_vertices(len(self.celllist))
-        gaba_edges = [(int(entry[0]), int(entry[1])) for entry in gaba]
-        self.gabanet.add_edges(gaba_edges)
-        self.gabanet.es['weight'] = [entry[2] for entry in gaba]
+        edges, weights, = read_cellnetwork(self.fd, syntype)
+        graph = ig.Graph(0, directed=True)
+        graph.add_vertices(len(self.celllist))
+        graph.vs['name'] = self.celllist
+        graph.add_edges(edges.tolist())
+        graph.es['weight'] = weights.tolist()
         t_end = datetime.now()
         t_delta = t_end - t_start
-        print 'Finished creating GABA net in %g s' % (t_delta.days * 86400.0 + t_delta.seconds + 1e-6 * t_delta.microseconds)
-
+        print 'Finished creating %s net in %g s' % (syntype.upper(), t_delta.days * 86400.0 + t_delta.seconds + 1e-6 * t_delta.microseconds)
+        return graph
 
     def connected(self, cell1, cell2, mode=ig.ALL):
         if ig.__version__ < '0.6':
@@ -122,7 +107,7 @@ class NetAnalyzer:
             print 'returning edge disjoint paths'
         v1 = self.cellindex[cell1]
         v2 = self.cellindex[cell2]
-        return (self.ampanet.shortest_paths(source=[v1], target=[v2], weights=None, mode=mode,
+        return (self.ampanet.shortest_paths(source=[v1], target=[v2], weights=None, mode=mode),
                 self.nmdanet.shortest_paths(source=[v1], target=[v2], weights=None, mode=mode),
                 self.gabanet.shortest_paths(source=[v1], target=[v2], weights=None, mode=mode))
 
@@ -0,0 +1,136 @@
+# sidecar.py ---
+#
+# Filename: sidecar.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 11:40:12 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 11:40:12 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Cache of derived arrays next to the HDF5 file they were computed
+# from. A sidecar for `data_xyz.h5` is a directory
+# `data_xyz.h5.{suffix}` holding one .npy file per array (so that they
+# can be memory mapped) and a stamp of the size and modification time
+# of the source file. A sidecar whose stamp does not match the source
+# file is considered stale and ignored.
+#
+# FileMemo keeps what was loaded from the last few files (say the
+# SpikeStore of a data file) so that repeated lookups in one process
+# do not go back to the disk. It holds a fixed number of files: every
+# memory mapped array keeps a file descriptor open, and a loop over
+# hundreds of data files would otherwise run out of them.
+#
+
+# Change log:
+#
+#
+#
+
+# Code:
+
+import os
+import shutil
+from collections import OrderedDict
+import numpy as np
+
+STAMP = '_stamp'
+MEMO_SIZE = 8
+
+def file_stamp(path):
+    """Return (size, modification time in microseconds) of `path` as
+    an int64 array."""
+    st = os.stat(path)
+    return np.array([st.st_size, int(st.st_mtime * 1e6)], dtype=np.int64)
+
+def sidecar_path(path, suffix):
+    return '%s.%s' % (path, suffix)
+
+def load_arrays(source, suffix, names, mmap_mode='r'):
+    """Load arrays `names` from the sidecar of file `source`.
+
+    Returns a dict of name: array or None if the sidecar does not
+    exist, is incomplete or is older than the source file."""
+    cachedir = sidecar_path(source, suffix)
+    try:
+        stamp = np.load(os.path.join(cachedir, STAMP + '.npy'))
+        if not np.array_equal(stamp, file_stamp(source)):
+            return None
+        ret = {}
+        for name in names:
+            ret[name] = np.load(os.path.join(cachedir, name + '.npy'), mmap_mode=mmap_mode)
+        return ret
+    except (IOError, OSError, ValueError):
+        return None
+
+def save_arrays(source, suffix, arrays):
+    """Save the dict `arrays` as the sidecar of file `source`.
+
+    The arrays are first written into a temporary directory which is
+    then renamed, so a reader never sees a half written sidecar. If
+    the directory is not writable, just print a warning and return
+    False."""
+    cachedir = sidecar_path(source, suffix)
+    tmpdir = '%s.tmp%d' % (cachedir, os.getpid())
+    try:
+        if os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir)
+        os.mkdir(tmpdir)
+        for name, data in arrays.items():
+            np.save(os.path.join(tmpdir, name + '.npy'), data)
+        np.save(os.path.join(tmpdir, STAMP + '.npy'), file_stamp(source))
+        if os.path.exists(cachedir):
+            shutil.rmtree(cachedir)
+        os.rename(tmpdir, cachedir)
+    except (IOError, OSError), e:
+        print 'Warning: could not save cache', cachedir, ':', e
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        return False
+    return True
+
+class FileMemo(object):
+    """Objects loaded from files, for the `size` most recently used
+    files.
+
+    An entry is reused while the size and modification time of its
+    file stay the same. When a new file would make more than `size`
+    entries, the least recently used one is dropped, which closes its
+    memory mapped arrays unless they are still referenced elsewhere.
+    """
+    def __init__(self, size=MEMO_SIZE):
+        self.size = size
+        self.entries = OrderedDict() # filename -> (object, stamp)
+
+    def get(self, filename, load):
+        """Return the object for filename, calling load() to create
+        it if there is none or the file changed since."""
+        stamp = tuple(file_stamp(filename))
+        entry = self.entries.pop(filename, None)
+        if entry is None or entry[1] != stamp:
+            entry = (load(), stamp)
+        self.entries[filename] = entry
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry[0]
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, filename):
+        return filename in self.entries
+
+
+#
+# sidecar.py ends here
@@ -0,0 +1,140 @@
+# spikestore.py ---
+#
+# Filename: spikestore.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 11:52:30 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 11:52:30 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# The data files keep the spike train of each cell as a separate
+# dataset under /spikes. Reading them one by one means thousands of
+# small reads per file. SpikeStore reads the whole group once into a
+# ragged array (see raggedarray.py): one float64 array of all spike
+# times, an int64 array of row offsets and the cell names. This is
+# saved as a sidecar (see sidecar.py) next to the data file and later
+# opens just memory map the sidecar.
+#
+# Use get_spike_store(filehandle) to get the store for an open data
+# file. The stores of the last few files are kept in a
+# sidecar.FileMemo.
+#
+
+# Change log:
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+import raggedarray
+import sidecar
+
+SUFFIX = 'spikes'
+
+class SpikeStore(object):
+    """Spike trains of all the cells in a data file.
+
+    values -- spike times of all cells concatenated. The spike train
+    of each cell is sorted.
+
+    offsets -- spike train of cell names[i] is
+    values[offsets[i]:offsets[i+1]].
+
+    names -- cell names in the same order as in /spikes.
+
+    index -- dict mapping cell name to row number.
+    """
+    def __init__(self, filehandle, cache=True):
+        self.filename = filehandle.filename
+        data = None
+        if cache:
+            data = sidecar.load_arrays(self.filename, SUFFIX, ['values', 'offsets', 'names'])
+        if data is None:
+            data = self.__read(filehandle)
+            if cache:
+                sidecar.save_arrays(self.filename, SUFFIX, data)
+        self.values = data['values']
+        self.offsets = data['offsets']
+        self.names = data['names']
+        self.index = dict(zip(self.names.tolist(), range(len(self.names))))
+
+    def __read(self, filehandle):
+        spikes = filehandle['/spikes']
+        names = []
+        trains = []
+        for name in spikes:
+            names.append(str(name))
+            trains.append(np.sort(np.asarray(spikes[name], dtype=np.float64).ravel()))
+        values, offsets, = raggedarray.from_arrays(trains)
+        return {'values': values, 'offsets': offsets, 'names': np.array(names, dtype=str)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names.tolist())
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        row = self.index[name]
+        return self.values[self.offsets[row]:self.offsets[row+1]]
+
+    def row_lengths(self):
+        return np.diff(self.offsets)
+
+    def rows(self, prefix='', exclude=None):
+        """Return the row numbers of cells whose names start with
+        `prefix` and not with `exclude`."""
+        mask = np.char.startswith(self.names, prefix)
+        if exclude is not None:
+            mask &= ~np.char.startswith(self.names, exclude)
+        return np.nonzero(mask)[0]
+
+    def last_spikes(self, rows=None, default=-np.inf):
+        """Time of the last spike of each cell in `rows` (all cells if
+        None). Cells without any spike get `default`."""
+        if rows is None:
+            rows = np.arange(len(self.names))
+        lengths = self.row_lengths()[rows]
+        ret = np.ones(len(rows)) * default
+        nonempty = np.nonzero(lengths > 0)[0]
+        ret[nonempty] = self.values[self.offsets[rows[nonempty] + 1] - 1]
+        return ret
+
+    def take(self, names):
+        """Return (values, offsets) with the spike trains of `names`
+        in that order. Cells missing in the data file get empty
+        rows."""
+        rows = np.array([self.index.get(name, -1) for name in names], dtype=np.int64)
+        present = np.nonzero(rows >= 0)[0]
+        lengths = np.zeros(len(rows), dtype=np.int64)
+        lengths[present] = self.row_lengths()[rows[present]]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        owner, positions, = raggedarray.expand_rows(self.offsets, rows[present])
+        return (self.values[positions], offsets)
+
+
+_stores = sidecar.FileMemo()
+
+def get_spike_store(filehandle):
+    """Return the SpikeStore for an open data file."""
+    return _stores.get(filehandle.filename, lambda: SpikeStore(filehandle))
+
+#
+# spikestore.py ends here
@@ -31,6 +31,8 @@ from matplotlib import pyplot as plt
 import igraph as ig
 import subprocess
 
+from syntable import get_synapse_table
+
 celltype_color_dict = {
     'SupPyrRS': 'black',
     'SupPyrFRB': 'gray',
@@ -67,7 +69,7 @@ class SynAnalyzer(object):
                 self.plotdt = float(row[1])
             elif row[0] == 'simtime':
                 self.simtime = float(row[1])
-        self.syntab = self.netfile['/network/synapse']
+        self.syntable = get_synapse_table(netfilepath)
         self.istart = 0
         self.iend = -1
 
@@ -78,10 +80,8 @@ class SynAnalyzer(object):
     def select_syninfo(self, cellname, srctype, syntype):
         """Return a view containing the presynaptic cells of `cellname` of
         type `srctype` with synapses of `syntype`"""
-        idx = np.char.startswith(self.syntab['dest'], cellname+'/') & \
-            np.char.startswith(self.syntab['source'], srctype) & \
-            np.char.startswith(self.syntab['type'], syntype)
-        return self.syntab[idx]
+        rows = self.syntable.select(dst=cellname, srcprefix=srctype, syntype=syntype)
+        return self.syntable.records(rows)
 
     def get_normalized_gk_slice(self, postcell, pretype, syntype):
         gkpath = 'gk_%s_%s_from_%s' % (postcell, syntype, pretype)
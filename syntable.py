@@ -0,0 +1,320 @@
+# syntable.py ---
+#
+# Filename: syntable.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Sun Oct 18 22:52:44 2026 (+0530)
+# Version:
+# Last-Updated: Sun Oct 18 22:52:44 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Integer encoded copy of the /network/synapse table.
+#
+# The synapse table has rows of (source compartment, dest compartment,
+# type, Gbar, tau1, tau2, Ek) where the compartments are paths of the
+# form cell/compartment. Selecting the synapses onto a cell with
+# np.char.startswith scans all the strings every time. SynapseTable
+# splits the paths once and replaces the strings by indices into
+# sorted dictionaries of the cell names, compartment names and synapse
+# types, so that selections are integer comparisons. The columns are
+# saved as a sidecar (see sidecar.py) next to the network file.
+#
+# SynapseIndex keeps the rows sorted by source and by dest cell with
+# offset arrays (like a ragged array, see raggedarray.py), so the
+# synapses onto or from one cell are found without scanning the
+# table.
+#
+# count_pairs() counts the synapses between each distinct (source,
+# dest) pair from integer keys with np.unique, which gives the number
+# of synapses per pair of cells or of compartments without building
+# string keys for every row.
+#
+# Use get_synapse_table(filename) to get the table of a network file
+# and get_synapse_index(filename) for its index. Tables of the most
+# recently used network files are reused, at most sidecar.MEMO_SIZE of
+# them, as each pins a dozen memory mapped columns.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+import h5py as h5
+
+import sidecar
+
+SUFFIX = 'synapses'
+
+def split_paths(paths):
+    """Split compartment paths cell/compartment into (cells,
+    compartments)."""
+    parts = np.char.partition(np.asarray(paths, dtype=str), '/')
+    if len(parts) == 0:
+        return (np.zeros(0, dtype=str), np.zeros(0, dtype=str))
+    return (parts[:, 0], parts[:, 2])
+
+def count_pairs(sources, dests):
+    """Count the occurrences of each distinct (sources[i], dests[i])
+    pair of non-negative integer codes.
+
+    Returns (first, counts) where first is the index of the first
+    occurrence of each pair, in the order of (source, dest), and
+    counts the number of occurrences."""
+    sources = np.asarray(sources, dtype=np.int64)
+    dests = np.asarray(dests, dtype=np.int64)
+    if len(sources) == 0:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    keys = sources * (dests.max() + 1) + dests
+    keys, first, counts, = np.unique(keys, return_index=True, return_counts=True)
+    return (first, counts)
+
+def multiplicity_histogram(counts):
+    """Number of pairs with 0, 1, 2, ... synapses given the counts
+    from count_pairs."""
+    return np.bincount(np.asarray(counts, dtype=np.int64))
+
+class SynapseTable(object):
+    """Columns of /network/synapse with the strings replaced by
+    integer codes.
+
+    cells, comps, syntypes -- sorted dictionaries of the cell names,
+    compartment names and synapse types.
+
+    src_cell, src_comp, dst_cell, dst_comp, type -- index into the
+    dictionaries for each synapse.
+
+    columns -- dict of the remaining columns of the table (Gbar,
+    tau1, ...) by field name.
+
+    dtype -- record type of /network/synapse.
+
+    The rows are in the same order as in the HDF5 table.
+    """
+    def __init__(self, filename, cache=True):
+        self.filename = filename
+        data = None
+        if cache:
+            data = sidecar.load_arrays(filename, SUFFIX, ['fields'])
+            if data is not None:
+                names = self.__array_names(data['fields'].tolist())
+                data = sidecar.load_arrays(filename, SUFFIX, names)
+        if data is None:
+            data = self.__read(filename)
+            if cache:
+                sidecar.save_arrays(filename, SUFFIX, data)
+        fields = data['fields'].tolist()
+        self.dtype = np.dtype(zip(fields, data['formats'].tolist()))
+        for name in ['cells', 'comps', 'syntypes', 'src_cell', 'src_comp', 'dst_cell', 'dst_comp', 'type']:
+            setattr(self, name, data[name])
+        self.columns = dict([(field, data['column_%s' % (field)]) for field in fields[3:]])
+
+    def __array_names(self, fields):
+        return ['fields', 'formats', 'cells', 'comps', 'syntypes', 'src_cell', 'src_comp', 'dst_cell', 'dst_comp', 'type'] + ['column_%s' % (field) for field in fields[3:]]
+
+    def __read(self, filename):
+        filehandle = h5.File(filename, 'r')
+        try:
+            syntab = np.asarray(filehandle['/network/synapse'])
+        finally:
+            filehandle.close()
+        fields = syntab.dtype.names
+        src_cells, src_comps, = split_paths(syntab[fields[0]])
+        dst_cells, dst_comps, = split_paths(syntab[fields[1]])
+        count = len(syntab)
+        cells, cell_codes, = np.unique(np.concatenate((src_cells, dst_cells)), return_inverse=True)
+        comps, comp_codes, = np.unique(np.concatenate((src_comps, dst_comps)), return_inverse=True)
+        syntypes, type_codes, = np.unique(np.asarray(syntab[fields[2]], dtype=str), return_inverse=True)
+        data = {'fields': np.array(fields, dtype=str),
+                'formats': np.array([syntab.dtype[field].str for field in fields], dtype=str),
+                'cells': cells,
+                'comps': comps,
+                'syntypes': syntypes,
+                'src_cell': cell_codes[:count].astype(np.int32),
+                'dst_cell': cell_codes[count:].astype(np.int32),
+                'src_comp': comp_codes[:count].astype(np.int32),
+                'dst_comp': comp_codes[count:].astype(np.int32),
+                'type': type_codes.astype(np.int32)}
+        for field in fields[3:]:
+            data['column_%s' % (field)] = np.ascontiguousarray(syntab[field])
+        return data
+
+    def __len__(self):
+        return len(self.type)
+
+    def cell_id(self, name):
+        """Index of cell `name` in cells, -1 if it has no synapse."""
+        index = np.searchsorted(self.cells, name)
+        if index < len(self.cells) and self.cells[index] == name:
+            return index
+        return -1
+
+    def __codes(self, dictionary, prefix):
+        return np.nonzero(np.char.startswith(dictionary, prefix))[0]
+
+    def index(self):
+        """SynapseIndex of this table, built on first use."""
+        if not hasattr(self, '_index'):
+            self._index = SynapseIndex(self)
+        return self._index
+
+    def select(self, src=None, dst=None, srcprefix='', dstprefix='', syntype=''):
+        """Row indices (ascending) of the synapses from cell `src` to
+        cell `dst` (any cell if None) where the source and dest cell
+        names start with srcprefix and dstprefix and the synapse type
+        starts with syntype."""
+        # Start from the synapses of the given cells, if any
+        if src is not None and dst is not None:
+            rows = self.index().synapses_between(src, dst)
+        elif src is not None:
+            rows = self.index().outgoing(src)
+        elif dst is not None:
+            rows = self.index().incoming(dst)
+        else:
+            rows = np.arange(len(self))
+        mask = np.ones(len(rows), dtype=bool)
+        # The prefixes are matched against the short dictionaries
+        if srcprefix:
+            mask &= np.in1d(self.src_cell[rows], self.__codes(self.cells, srcprefix))
+        if dstprefix:
+            mask &= np.in1d(self.dst_cell[rows], self.__codes(self.cells, dstprefix))
+        if syntype:
+            mask &= np.in1d(self.type[rows], self.__codes(self.syntypes, syntype))
+        return np.sort(rows[mask])
+
+    def presynaptic_cells(self, cellname, srcprefix='', syntype=''):
+        """Names of the distinct cells with synapses onto cellname."""
+        rows = self.select(dst=cellname, srcprefix=srcprefix, syntype=syntype)
+        return self.cells[np.unique(self.src_cell[rows])].tolist()
+
+    def postsynaptic_cells(self, cellname, dstprefix='', syntype=''):
+        """Names of the distinct cells receiving synapses from
+        cellname."""
+        rows = self.select(src=cellname, dstprefix=dstprefix, syntype=syntype)
+        return self.cells[np.unique(self.dst_cell[rows])].tolist()
+
+    def cell_pair_counts(self):
+        """Number of synapses between each connected pair of cells.
+
+        Returns (rows, counts) where rows has the first synapse of
+        each pair (see count_pairs)."""
+        return count_pairs(self.src_cell, self.dst_cell)
+
+    def compartment_pair_counts(self):
+        """Number of synapses between each connected pair of
+        compartments. Returns (rows, counts) as cell_pair_counts."""
+        ncomps = len(self.comps)
+        src = self.src_cell.astype(np.int64) * ncomps + self.src_comp
+        dst = self.dst_cell.astype(np.int64) * ncomps + self.dst_comp
+        return count_pairs(src, dst)
+
+    def pair_labels(self, rows, compartments=False):
+        """Labels source-dest of the synapses in rows, with cell
+        names or (if compartments is True) compartment paths."""
+        if compartments:
+            records = self.records(rows)
+            fields = self.dtype.names
+            return np.char.add(np.char.add(records[fields[0]], '-'), records[fields[1]])
+        return np.char.add(np.char.add(self.cells[self.src_cell[rows]], '-'), self.cells[self.dst_cell[rows]])
+
+    def records(self, rows=None):
+        """Rows of the original table (all if None) as a structured
+        array with the same dtype as /network/synapse."""
+        if rows is None:
+            rows = np.arange(len(self))
+        fields = self.dtype.names
+        ret = np.zeros(len(rows), dtype=self.dtype)
+        ret[fields[0]] = np.char.add(np.char.add(self.cells[self.src_cell[rows]], '/'), self.comps[self.src_comp[rows]])
+        ret[fields[1]] = np.char.add(np.char.add(self.cells[self.dst_cell[rows]], '/'), self.comps[self.dst_comp[rows]])
+        ret[fields[2]] = self.syntypes[self.type[rows]]
+        for field in fields[3:]:
+            ret[field] = self.columns[field][rows]
+        return ret
+
+
+class SynapseIndex(object):
+    """Synapses of a SynapseTable grouped by source and by dest cell.
+
+    by_source -- row indices sorted by source cell and then dest
+    cell. The synapses from cell i (id in table.cells) are
+    by_source[source_offsets[i]:source_offsets[i+1]].
+
+    by_dest -- row indices sorted by dest cell and then source cell,
+    with dest_offsets.
+
+    The lookups take time proportional to the number of synapses of
+    the cell instead of the size of the table.
+    """
+    def __init__(self, table):
+        self.table = table
+        ncells = len(table.cells)
+        self.by_source = np.lexsort((table.dst_cell, table.src_cell))
+        self.source_offsets = np.zeros(ncells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(table.src_cell, minlength=ncells), out=self.source_offsets[1:])
+        self.by_dest = np.lexsort((table.src_cell, table.dst_cell))
+        self.dest_offsets = np.zeros(ncells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(table.dst_cell, minlength=ncells), out=self.dest_offsets[1:])
+
+    def outgoing(self, cell):
+        """Rows of the synapses from `cell`, sorted by dest cell."""
+        cell_id = self.table.cell_id(cell)
+        if cell_id < 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.by_source[self.source_offsets[cell_id]:self.source_offsets[cell_id+1]]
+
+    def incoming(self, cell):
+        """Rows of the synapses onto `cell`, sorted by source cell."""
+        cell_id = self.table.cell_id(cell)
+        if cell_id < 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.by_dest[self.dest_offsets[cell_id]:self.dest_offsets[cell_id+1]]
+
+    def synapses_between(self, source, dest):
+        """Rows of the synapses from cell `source` onto cell `dest`."""
+        rows = self.outgoing(source)
+        dest_id = self.table.cell_id(dest)
+        if dest_id < 0:
+            return rows[:0]
+        start, end, = np.searchsorted(self.table.dst_cell[rows], [dest_id, dest_id + 1])
+        return rows[start:end]
+
+    def presynaptic(self, cell):
+        """Names of the distinct cells with synapses onto `cell`."""
+        sources = self.table.src_cell[self.incoming(cell)]
+        return self.table.cells[np.unique(sources)].tolist()
+
+    def postsynaptic(self, cell):
+        """Names of the distinct cells receiving synapses from
+        `cell`."""
+        dests = self.table.dst_cell[self.outgoing(cell)]
+        return self.table.cells[np.unique(dests)].tolist()
+
+
+_tables = sidecar.FileMemo()
+
+def get_synapse_table(filename):
+    """Return the SynapseTable for a network file, from its sidecar
+    if up to date."""
+    return _tables.get(filename, lambda: SynapseTable(filename))
+
+def get_synapse_index(filename):
+    """Return the SynapseIndex for a network file. See
+    get_synapse_table."""
+    return get_synapse_table(filename).index()
+
+
+#
+# syntable.py ends here
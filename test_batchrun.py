@@ -0,0 +1,85 @@
+# test_batchrun.py --- 
+# 
+# Filename: test_batchrun.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 19:40:03 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 19:40:03 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import batchrun
+
+def write_square(path, fail_on):
+    if os.path.basename(path) == fail_on:
+        raise ValueError('bad file: %s' % (path))
+    value = int(os.path.basename(path).split('_')[1])
+    with batchrun.atomic_output(path) as tmppath:
+        out = open(tmppath, 'w')
+        out.write('%d\n' % (value * value))
+        out.close()
+    return value * value
+
+class TestBatchRun(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.tmpdir, 'out_%d' % (ii)) for ii in range(6)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_run_batch(self):
+        for workers in [1, 3]:
+            results = batchrun.run_batch(write_square, self.paths, args=('out_4',), workers=workers)
+            self.assertEqual([result.item for result in results], self.paths)
+            for ii, result in enumerate(results):
+                if ii == 4:
+                    self.assertFalse(result.ok)
+                    self.assertTrue('bad file' in result.error)
+                else:
+                    self.assertTrue(result.ok)
+                    self.assertEqual(result.value, ii * ii)
+                    self.assertEqual(open(self.paths[ii]).read(), '%d\n' % (ii * ii))
+            self.assertEqual(sorted(os.listdir(self.tmpdir)), sorted(['out_%d' % (ii) for ii in [0, 1, 2, 3, 5]]))
+
+    def test_atomic_output(self):
+        path = self.paths[0]
+        try:
+            with batchrun.atomic_output(path) as tmppath:
+                open(tmppath, 'w').write('partial')
+                raise IOError('interrupted')
+        except IOError:
+            pass
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_batchrun.py ends here
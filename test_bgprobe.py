@@ -46,6 +46,19 @@ class TestBgProbe(unittest.TestCase):
         print probed_cells
         self.assertEqual(len(probed_cells), 38)
 
+class TestMaxSpikeCount(unittest.TestCase):
+    def testMaxSpikeCount(self):
+        spike_time_list = [np.array([0.001, 0.004, 0.0045, 0.02, 0.021, 0.0215, 0.022]),
+                           np.array([]),
+                           np.array([0.05, 0.01, 0.012])]
+        ret = get_max_spike_count(spike_time_list, window=5e-3)
+        self.assertEqual(ret.shape, (3, 2))
+        self.assertAlmostEqual(ret[0, 0], 0.022 - 2.5e-3)
+        self.assertAlmostEqual(ret[0, 1], 4 / 5e-3)
+        np.testing.assert_array_equal(ret[1], [0, 0])
+        self.assertAlmostEqual(ret[2, 0], 0.012 - 2.5e-3)
+        self.assertAlmostEqual(ret[2, 1], 2 / 5e-3)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,62 @@
+# test_bursts.py --- 
+# 
+# Filename: test_bursts.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 17:42:19 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 17:42:19 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import unittest
+import numpy as np
+import raggedarray
+import bursts
+
+class TestBursts(unittest.TestCase):
+    def test_burst_stats(self):
+        trains = [np.array([0.001, 0.002, 0.003, 0.004, 0.005, 0.5]),
+                  np.array([]),
+                  np.array([1.0]),
+                  # the burst at the end of the previous row must not
+                  # run into this one
+                  np.array([0.006, 0.007, 0.2, 0.201, 0.202, 0.203, 0.204, 0.205, 0.206])]
+        values, offsets, = raggedarray.from_arrays(trains)
+        burst_offsets, starts, lengths, counts, = bursts.burst_stats(values, offsets, minspikes=4, maxinterval=10e-3)
+        np.testing.assert_array_equal(burst_offsets, [0, 1, 1, 1, 2])
+        np.testing.assert_array_equal(starts, [0.001, 0.2])
+        np.testing.assert_allclose(lengths, [0.004, 0.006])
+        np.testing.assert_array_equal(counts, [5, 7])
+
+    def test_after_onset(self):
+        values, offsets, = raggedarray.from_arrays([np.array([0.5, 1.5]), np.array([0.2]), np.array([1.1, 2.0])])
+        values, offsets, = bursts.after_onset(values, offsets, 1.0)
+        np.testing.assert_array_equal(values, [1.5, 1.1, 2.0])
+        np.testing.assert_array_equal(offsets, [0, 1, 1, 3])
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_bursts.py ends here
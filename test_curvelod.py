@@ -0,0 +1,95 @@
+# test_curvelod.py ---
+#
+# Filename: test_curvelod.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 04:12:07 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 04:12:07 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+#
+#
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import unittest
+import numpy as np
+
+from curvelod import MinMaxPyramid
+
+class TestMinMaxPyramid(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(3)
+        self.x = np.arange(100001) * 1e-4
+        self.y = np.random.normal(-65.0, 1.0, size=len(self.x))
+        self.spikes = np.array([1234, 40000, 40001, 77777, 99990])
+        self.y[self.spikes] = 40.0
+        self.y[55555] = -120.0
+        self.pyramid = MinMaxPyramid(self.x, self.y)
+
+    def test_full_range(self):
+        x, y, = self.pyramid.points(npoints=2000)
+        self.assertTrue(len(x) <= 2002)
+        self.assertTrue(np.all(np.diff(x) >= 0))
+        # every spike peak is drawn (one of 40000, 40001 which share a
+        # bin), and the trough
+        for index in [1234, 40000, 77777, 99990]:
+            self.assertTrue(self.x[index] in x or self.x[index+1] in x)
+        self.assertEqual(np.sum(y == 40.0), 4)
+        self.assertEqual(y.max(), 40.0)
+        self.assertEqual(y.min(), -120.0)
+        self.assertEqual(x[0], self.x[0])
+        self.assertEqual(x[-1], self.x[-1])
+
+    def test_zoomed(self):
+        x, y, = self.pyramid.points(3.0, 6.0, npoints=1000)
+        self.assertTrue(len(x) <= 1002)
+        self.assertTrue(x[0] <= 3.0 and x[-1] >= 6.0)
+        self.assertEqual(y.max(), 40.0)
+        self.assertTrue(self.x[40000] in x)
+        self.assertTrue(self.x[55555] in x)
+        self.assertFalse(self.x[77777] in x)
+
+    def test_ascending(self):
+        # bins at the edges of the range start before and end after it
+        pyramid = MinMaxPyramid(np.arange(1e5), np.random.normal(size=100000))
+        index = pyramid.indices(5003.5, 80000.2, 1000)
+        self.assertTrue(len(index) <= 1002)
+        self.assertTrue(np.all(np.diff(index) > 0))
+        self.assertEqual(index[0], 5003)
+        self.assertEqual(index[-1], 80001)
+        for xmin, xmax, in [(None, None), (3.0, 6.0), (0.05, 9.995)]:
+            x, y, = self.pyramid.points(xmin, xmax, 1000)
+            self.assertTrue(np.all(np.diff(x) > 0))
+
+    def test_raw(self):
+        # few enough points in range: the data as is
+        x, y, = self.pyramid.points(1.0, 1.05, npoints=1000)
+        np.testing.assert_array_equal(x, self.x[9999:10502])
+        np.testing.assert_array_equal(y, self.y[9999:10502])
+        x, y, = MinMaxPyramid([0.0], [1.0]).points()
+        self.assertEqual(list(y), [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+#
+# test_curvelod.py ends here
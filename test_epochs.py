@@ -0,0 +1,79 @@
+# test_epochs.py --- 
+# 
+# Filename: test_epochs.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 14:52:10 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 14:52:10 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import unittest
+import numpy as np
+import epochs
+from analyzer import extract_chunks
+
+class TestEpochs(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(2)
+        self.spikes = np.sort(np.random.uniform(0, 10.0, size=200))
+
+    def test_align_spikes(self):
+        starts = np.array([0.5, 2.0, 2.5, 7.0])
+        widths = np.array([1.0, 0.5, 3.0, 0.25])
+        epoch_ids, reltimes, = epochs.align_spikes(self.spikes, starts, widths)
+        for spike, epoch, rel in zip(self.spikes, epoch_ids, reltimes):
+            inside = np.nonzero((spike >= starts) & (spike < starts + widths))[0]
+            if len(inside) == 0:
+                self.assertEqual(epoch, -1)
+            else:
+                self.assertEqual(epoch, inside[0])
+                self.assertEqual(rel, spike - starts[epoch])
+        chunks = epochs.split_by_epoch(epoch_ids, self.spikes, len(starts))
+        self.assertEqual(len(chunks), len(starts))
+        for start, width, chunk in zip(starts, widths, chunks):
+            np.testing.assert_array_equal(chunk, self.spikes[(self.spikes >= start) & (self.spikes < start + width)])
+
+    def test_extract_chunks(self):
+        stimstart, stimwidth = 0.75, 0.4
+        expected = []
+        spiketrain = self.spikes - stimstart
+        indices = np.nonzero(spiketrain > 0)[0]
+        while len(indices) > 0:
+            spiketrain = spiketrain[indices]
+            indices = np.nonzero(spiketrain < stimwidth)[0]
+            if len(indices) > 0:
+                expected.append(spiketrain[indices])
+            spiketrain = spiketrain - stimwidth
+            indices = np.nonzero(spiketrain > 0)[0]
+        chunks = extract_chunks(self.spikes, stimstart, stimwidth)
+        self.assertEqual(len(chunks), len(expected))
+        for chunk, old in zip(chunks, expected):
+            np.testing.assert_allclose(chunk, old, atol=1e-12)
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_epochs.py ends here
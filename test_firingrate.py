@@ -0,0 +1,82 @@
+# test_firingrate.py --- 
+# 
+# Filename: test_firingrate.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 18:34:51 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 18:34:51 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import unittest
+import numpy as np
+import raggedarray
+import firingrate as fr
+
+class TestFiringRate(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(4)
+        self.trains = [np.sort(np.random.uniform(0, 1.0, size=n)) for n in [30, 0, 12, 55]]
+        self.values, self.offsets, = raggedarray.from_arrays(self.trains)
+
+    def test_compute_firing_rate(self):
+        spikes = np.array([0.1, 0.2, 0.25, 0.5, 0.7, 0.95, 1.3])
+        counts = fr.compute_firing_rate(spikes, 1.0, binsize=0.2)
+        # windows of 0.2 centred at 0, 0.1, 0.2, ... 0.8
+        self.assertEqual(len(counts), 9)
+        for ii, count in enumerate(counts):
+            centre = ii * 0.1
+            expected = len(np.nonzero((spikes > centre - 0.1) & (spikes < centre + 0.1) & (spikes <= 1.0))[0])
+            self.assertEqual(count, expected)
+
+    def test_kernels(self):
+        dt = 1e-3
+        counts = fr.bin_counts(self.values, self.offsets, np.arange(4), 4, 0.0, 1.0, dt)
+        np.testing.assert_array_equal(counts.sum(axis=1), [30, 0, 12, 55])
+        for kernel, width in [('boxcar', 20e-3), ('gaussian', 30e-3), ('exponential', 15e-3)]:
+            lags, weights, = fr.make_kernel(kernel, width, dt)
+            self.assertAlmostEqual(np.sum(weights), 1.0)
+            direct = fr.convolve_rows(counts, lags, weights, method='direct')
+            fft = fr.convolve_rows(counts, lags, weights, method='fft')
+            np.testing.assert_allclose(direct, fft, atol=1e-9)
+            expected = np.zeros(counts.shape)
+            for lag, weight in zip(lags, weights):
+                expected += weight * np.roll(np.hstack((counts, np.zeros((4, len(lags))))), lag, axis=1)[:, :counts.shape[1]]
+            np.testing.assert_allclose(direct, expected, atol=1e-12)
+
+    def test_groups(self):
+        groups, labels, = fr.group_cells(['SpinyStellate_0', 'TCR_1', 'ectopic_SpinyStellate_0', 'SpinyStellate_3'], mode='layer')
+        self.assertEqual(labels, ['4', '7'])
+        np.testing.assert_array_equal(groups, [0, 1, 0, 0])
+        groups = np.array([0, 1, 1, -1])
+        times, rates, = fr.firing_rate(self.values, self.offsets, 0.0, 1.0, 10e-3, groups=groups, ngroups=2)
+        times, cellrates, = fr.firing_rate(self.values, self.offsets, 0.0, 1.0, 10e-3)
+        np.testing.assert_allclose(rates[0], cellrates[0])
+        np.testing.assert_allclose(rates[1], (cellrates[1] + cellrates[2]) / 2.0)
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_firingrate.py ends here
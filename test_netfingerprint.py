@@ -0,0 +1,115 @@
+# test_netfingerprint.py ---
+#
+# Filename: test_netfingerprint.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 03:31:26 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 03:31:26 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+#
+#
+#
+
+# Change log:
+#
+#
+#
+
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+import sidecar
+import netfingerprint
+from netfingerprint import fingerprint, diff, diff_rows, SUFFIX
+
+SYNAPSE = [('source', '|S35'), ('dest', '|S35'), ('type', '|S4'), ('Gbar', 'f8')]
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(5)
+        self.tmpdir = tempfile.mkdtemp()
+        self.synapses = np.zeros(1000, dtype=SYNAPSE)
+        self.synapses['source'] = ['TCR_%d/comp_1' % (ii % 17) for ii in range(1000)]
+        self.synapses['dest'] = ['nRT_%d/comp_2' % (ii % 13) for ii in range(1000)]
+        self.synapses['type'] = 'ampa'
+        self.synapses['Gbar'] = np.random.uniform(size=1000)
+        self.left = self.make_network('network_left.h5', self.synapses)
+        changed = self.synapses.copy()
+        changed['Gbar'][[3, 517]] = -1.0
+        changed['dest'][999] = 'nRT_0/comp_3'
+        self.right = self.make_network('network_right.h5', changed)
+        self.same = self.make_network('network_same.h5', self.synapses)
+
+    def make_network(self, name, synapses):
+        path = os.path.join(self.tmpdir, name)
+        netfile = h5.File(path, 'w')
+        netfile.create_dataset('/network/synapse', data=synapses)
+        netfile.create_dataset('/network/celltype', data=np.array([('TCR', 17), ('nRT', 13)], dtype=[('name', '|S35'), ('count', 'i4')]))
+        netfile.create_dataset('/stimulus/connection', data=np.array([('/stim/stim_bg', '/model/net/TCR_0/comp_1')], dtype=[('f0', '|S35'), ('f1', '|S35')]))
+        netfile.close()
+        return path
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_same(self):
+        left = fingerprint(self.left, chunkrows=100, cache=False)
+        same = fingerprint(self.same, chunkrows=100, cache=False)
+        right = fingerprint(self.right, chunkrows=100, cache=False)
+        self.assertTrue(left.same_as(same))
+        self.assertFalse(left.same_as(right))
+        self.assertTrue(left.same_as(right, 'network/celltype'))
+        self.assertTrue(left.same_as(right, '/stimulus'))
+        self.assertEqual(left.children(), ['network', 'stimulus'])
+        self.assertEqual(len(left.chunks('network/synapse')), 10)
+
+    def test_diff(self):
+        left = fingerprint(self.left, chunkrows=100, cache=False)
+        right = fingerprint(self.right, chunkrows=100, cache=False)
+        self.assertEqual([entry[:2] for entry in diff(left, right)], [('network/synapse', 'content')])
+        lfile = h5.File(self.left, 'r')
+        rfile = h5.File(self.right, 'r')
+        try:
+            rows = diff_rows(lfile['/network/synapse'], rfile['/network/synapse'], left, right, 'network/synapse')
+            np.testing.assert_array_equal(rows, [3, 517, 999])
+            # without fingerprints every row is compared
+            rows = diff_rows(lfile['/network/synapse'], rfile['/network/synapse'])
+            np.testing.assert_array_equal(rows, [3, 517, 999])
+            # rows only in the longer table differ
+            rows = diff_rows(lfile['/network/synapse'], self.synapses[:990])
+            np.testing.assert_array_equal(rows, np.arange(990, 1000))
+        finally:
+            lfile.close()
+            rfile.close()
+
+    def test_sidecar(self):
+        value = netfingerprint.get_fingerprint(self.left)
+        self.assertTrue(os.path.isdir(sidecar.sidecar_path(self.left, SUFFIX)))
+        cached = fingerprint(self.left)
+        self.assertEqual(cached.digest(), value.digest())
+        self.assertTrue(netfingerprint.same_network(self.left, self.same))
+        self.assertFalse(netfingerprint.same_network(self.left, self.right))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+#
+# test_netfingerprint.py ends here
@@ -0,0 +1,129 @@
+# test_netgraph.py --- 
+# 
+# Filename: test_netgraph.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 22:31:16 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 22:31:16 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+import sidecar
+from netgraph import NetworkGraph, SUFFIX, cell_ids
+from netgraph import csr_adjacency, hop_distances, min_distance, equivalent_distance
+
+class TestNetworkGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'network_test.h5.new')
+        netfile = h5.File(self.filename, 'w')
+        cellcount = np.array([('SupPyrRS', 3), ('TCR', 2), ('nRT', 1)], dtype=[('name', '|S35'), ('count', 'i4')])
+        netfile.create_dataset('/runconfig/cellcount', data=cellcount)
+        syntab = np.array([('TCR_1/comp_1', 'SupPyrRS_2/comp_5', 'ampa', 1.0),
+                           ('SupPyrRS_0/comp_1', 'nRT_0/comp_2', 'ampa', 2.0),
+                           ('nRT_0/comp_1', 'TCR_0/comp_3', 'gaba', 3.0),
+                           ('TCR_1/comp_1', 'SupPyrRS_2/comp_7', 'nmda', 4.0),
+                           ('TCR_1/comp_1', 'SupPyrRS_2/comp_6', 'ampa', 5.0)],
+                          dtype=[('source', '|S35'), ('dest', '|S35'), ('type', '|S4'), ('Gbar', 'f8')])
+        netfile.create_dataset('/network/synapse', data=syntab)
+        netfile.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cell_ids(self):
+        starts = {'SupPyrRS': 0, 'TCR': 3, 'nRT': 5}
+        ids = cell_ids(['nRT_0/comp_1', 'SupPyrRS_2/comp_3', 'TCR_1/a/b'], starts)
+        np.testing.assert_array_equal(ids, [5, 2, 4])
+        self.assertRaises(KeyError, cell_ids, ['DeepBasket_0/comp_1'], starts)
+
+    def test_read(self):
+        graph = NetworkGraph(self.filename, cache=False)
+        self.assertEqual(graph.names.tolist(), ['SupPyrRS_0', 'SupPyrRS_1', 'SupPyrRS_2', 'TCR_0', 'TCR_1', 'nRT_0'])
+        self.assertEqual(graph.celltypes.tolist(), ['SupPyrRS'] * 3 + ['TCR'] * 2 + ['nRT'])
+        np.testing.assert_array_equal(graph.offsets, [0, 1, 1, 1, 1, 4, 5])
+        np.testing.assert_array_equal(graph.sources(), [0, 4, 4, 4, 5])
+        np.testing.assert_array_equal(graph.targets, [5, 2, 2, 2, 3])
+        self.assertEqual(graph.syntypes[graph.types].tolist(), ['ampa', 'ampa', 'nmda', 'ampa', 'gaba'])
+        np.testing.assert_array_equal(graph.gbar, [2.0, 1.0, 4.0, 5.0, 3.0])
+        np.testing.assert_array_equal(graph.edges('ampa'), [[0, 5], [4, 2]])
+        np.testing.assert_array_equal(graph.edges('ampa', unique=False), [[0, 5], [4, 2], [4, 2]])
+        np.testing.assert_array_equal(graph.edges('gaba'), [[5, 3]])
+        self.assertEqual(graph.edges('gapjunction').shape, (0, 2))
+
+    def test_sidecar(self):
+        graph = NetworkGraph(self.filename)
+        self.assertTrue(os.path.isdir(sidecar.sidecar_path(self.filename, SUFFIX)))
+        cached = NetworkGraph(self.filename)
+        self.assertTrue(isinstance(cached.targets, np.memmap))
+        for field in ['names', 'celltypes', 'offsets', 'targets', 'syntypes', 'types', 'gbar']:
+            np.testing.assert_array_equal(getattr(cached, field), getattr(graph, field))
+
+
+class TestDistances(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(5)
+        self.nvertices = 40
+        edges = np.random.randint(0, self.nvertices, size=(70, 2))
+        self.sources = edges[:, 0]
+        self.targets = edges[:, 1]
+
+    def bfs(self, start):
+        dist = {start: 0}
+        frontier = [start]
+        while frontier:
+            following = []
+            for vertex in frontier:
+                for target in self.targets[self.sources == vertex]:
+                    if target not in dist:
+                        dist[target] = dist[vertex] + 1
+                        following.append(target)
+            frontier = following
+        return [dist.get(vertex, -1) for vertex in range(self.nvertices)]
+
+    def test_hop_distances(self):
+        offsets, neighbours, = csr_adjacency(self.nvertices, self.sources, self.targets)
+        starts = [3, 17, 0, 3]
+        distances = hop_distances(offsets, neighbours, starts)
+        self.assertEqual(distances.dtype, np.int16)
+        for ii, start in enumerate(starts):
+            np.testing.assert_array_equal(distances[ii], self.bfs(start))
+
+    def test_reductions(self):
+        distances = np.array([[0, 1, 2, -1, 4],
+                              [2, 0, 1, -1, -1]], dtype=np.int16)
+        np.testing.assert_array_equal(min_distance(distances), [0, 0, 1, np.inf, 4])
+        np.testing.assert_allclose(equivalent_distance(distances), [0, 0, 1 / 1.5, np.inf, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_netgraph.py ends here
@@ -0,0 +1,89 @@
+# test_pairsampler.py --- 
+# 
+# Filename: test_pairsampler.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 21:48:03 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 21:48:03 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import unittest
+import numpy as np
+from pairsampler import PairSampler
+
+class TestPairSampler(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(3)
+        self.nvertices = 60
+        self.types = np.array(['A'] * 20 + ['B'] * 25 + ['C'] * 15)
+        edges = np.random.randint(0, self.nvertices, size=(400, 2))
+        self.sources = edges[:, 0]
+        self.targets = edges[:, 1]
+        self.edgeset = set(zip(self.sources.tolist(), self.targets.tolist()))
+        self.sampler = PairSampler(self.nvertices, self.sources, self.targets, self.types)
+
+    def test_connected(self):
+        fixed = np.repeat(np.arange(self.nvertices), self.nvertices)
+        others = np.tile(np.arange(self.nvertices), self.nvertices)
+        connected = self.sampler.connected(fixed, others)
+        expected = [(src, dst) in self.edgeset for (src, dst) in zip(fixed, others)]
+        np.testing.assert_array_equal(connected, expected)
+        connected = self.sampler.connected(fixed, others, reverse=True)
+        expected = [(dst, src) in self.edgeset for (src, dst) in zip(fixed, others)]
+        np.testing.assert_array_equal(connected, expected)
+
+    def test_sample_targets(self):
+        pairs = self.sampler.sample_targets(self.sources, self.targets, seed=7)
+        self.assertEqual(pairs.shape, (len(self.sources), 2))
+        np.testing.assert_array_equal(pairs[:, 0], self.sources)
+        np.testing.assert_array_equal(self.types[pairs[:, 1]], self.types[self.targets])
+        for src, dst in pairs:
+            self.assertNotEqual(src, dst)
+            self.assertFalse((src, dst) in self.edgeset)
+        self.assertEqual(len(set(zip(pairs[:, 0], pairs[:, 1]))), len(pairs))
+        again = self.sampler.sample_targets(self.sources, self.targets, seed=7)
+        np.testing.assert_array_equal(pairs, again)
+
+    def test_sample_sources(self):
+        pairs = self.sampler.sample_sources(self.targets, self.sources, seed=7)
+        np.testing.assert_array_equal(pairs[:, 1], self.targets)
+        np.testing.assert_array_equal(self.types[pairs[:, 0]], self.types[self.sources])
+        for src, dst in pairs:
+            self.assertNotEqual(src, dst)
+            self.assertFalse((src, dst) in self.edgeset)
+
+    def test_infeasible(self):
+        # vertex 0 projects to all the other vertices of type A
+        sampler = PairSampler(4, [0, 0], [1, 2], ['A', 'A', 'A', 'B'])
+        self.assertRaises(ValueError, sampler.sample_targets, [0], [1])
+        pairs = sampler.sample_targets([1, 1], [0, 0], unique=False)
+        self.assertTrue(set(pairs[:, 1]) <= set([0, 2]))
+        self.assertRaises(ValueError, sampler.sample_targets, [1, 1, 1], [0, 0, 0])
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_pairsampler.py ends here
@@ -45,8 +45,15 @@
 
 # Code:
 
+import os
+import shutil
+import tempfile
 import unittest
-from probabilities import SpikeCondProb, dump_stimulus_linked_probabilities
+import numpy as np
+import h5py as h5
+
+import raggedarray
+from probabilities import SpikeCondProb, dump_stimulus_linked_probabilities, check_valid_files, read_stim_p
 
 class TestSpikeCondProb(unittest.TestCase):
     def setUp(self):
@@ -59,6 +66,15 @@ class TestSpikeCondProb(unittest.TestCase):
         spike_prob = self.test_object.calc_spike_prob('TCR_0', 'SupPyrRS_1', 10e-3, 10e-3)
         self.assertAlmostEqual(spike_prob, 0.5)
 
+    def test_calc_spike_prob_batch(self):
+        pre = self.test_object.cells.index('TCR_0')
+        post = self.test_object.cells.index('SupPyrRS_1')
+        spike_prob = self.test_object.calc_spike_prob_batch([pre, post], [post, pre], 10e-3, 10e-3)
+        self.assertEqual(spike_prob['pre'][0], pre)
+        self.assertEqual(spike_prob['post'][0], post)
+        self.assertAlmostEqual(spike_prob['prob'][0], 0.5)
+        self.assertAlmostEqual(spike_prob['prob'][1], self.test_object.calc_spike_prob('SupPyrRS_1', 'TCR_0', 10e-3, 10e-3))
+
     def test_calc_spike_prob_all_connected(self):
         spike_prob = self.test_object.calc_spike_prob_all_connected(10e-3, 10e-3)
         self.assertAlmostEqual(spike_prob['TCR_0-SupPyrRS_1'], 0.5)
@@ -125,6 +141,46 @@ class TestSpikeCondProb(unittest.TestCase):
         self.assertEqual(len(lengths[lengths.keys()[0]]), 2)
         
 
+class TestStimProbFile(unittest.TestCase):
+    """check_valid_files on the stim_prob_ files written by
+    SpikeCondProb.write_stim_p."""
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        # only what calc_stim_p_table needs
+        self.prob = SpikeCondProb.__new__(SpikeCondProb)
+        self.prob.cells = ['TCR_0', 'TCR_1', 'nRT_0']
+        self.prob.spiketimes, self.prob.spikeoffsets, = raggedarray.from_arrays([[1.01, 3.02], [3.01], [1.005]])
+        self.prob.bg_times = np.array([1.0, 3.0])
+        self.prob.probe_times = np.array([3.0])
+        self.prob.valid_bg_stimulus = True
+        self.prob.valid_probe_stimulus = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_files(self, runid, stim):
+        datafile = h5.File(os.path.join(self.tmpdir, 'data_%s.h5' % (runid)), 'w')
+        datafile.create_dataset('/stimulus/stim_bg', data=stim)
+        datafile.close()
+        path = os.path.join(self.tmpdir, 'stim_prob_%s.h5' % (runid))
+        probfile = h5.File(path, 'w')
+        self.prob.write_stim_p(probfile, [0.01, 0.05], [0.0, 0.005])
+        probfile.close()
+        return path
+
+    def test_check_valid_files(self):
+        valid = self.write_files('valid', np.array([0.0, 1.0, 0.0, 1.0, 0.0]))
+        self.prob.valid_bg_stimulus = False
+        invalid = self.write_files('invalid', np.zeros(5))
+        probfile = h5.File(valid, 'r')
+        window, delay, data, = read_stim_p(probfile['spiking_prob'])[0]
+        probfile.close()
+        self.assertEqual(list(data['cell']), self.prob.cells)
+        self.assertEqual(list(data['prob_bg']), [1.0, 0.0, 1.0])
+        self.assertEqual(check_valid_files([valid, invalid], 'TCR'),
+                         ([valid], [invalid.replace('stim_prob_', 'data_')]))
+        
+
 if __name__ == '__main__':
     unittest.main()
 
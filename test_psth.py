@@ -0,0 +1,141 @@
+# test_psth.py --- 
+# 
+# Filename: test_psth.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 16:05:22 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 16:05:22 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+import psth
+import epochs
+from analyzer import extract_chunks, cost_psth
+from spikestore import SpikeStore
+
+class TestPSTH(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(3)
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data_test.h5')
+        self.trains = {'SpinyStellate_0': np.sort(np.random.uniform(0, 5.0, size=60)),
+                       'SpinyStellate_1': np.array([]),
+                       'TCR_0': np.sort(np.random.uniform(0, 5.0, size=30)),
+                       'TCR_1': np.sort(np.random.uniform(0, 5.0, size=45)),
+                       'ectopic_TCR_0': np.array([0.3, 1.7])}
+        datafile = h5.File(self.filename, 'w')
+        grp = datafile.create_group('spikes')
+        for name, train in self.trains.items():
+            grp.create_dataset(name, data=train)
+        datafile.close()
+        self.datafile = h5.File(self.filename, 'r')
+
+    def tearDown(self):
+        self.datafile.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_count_matrix(self):
+        times = np.random.uniform(-0.1, 1.1, size=500)
+        times[:3] = [0.0, 0.25, 1.0]
+        groups = np.random.randint(-1, 3, size=len(times))
+        edges = np.arange(0, 1.01, 0.25)
+        counts = psth.count_matrix(groups, times, 3, edges)
+        for group in range(3):
+            np.testing.assert_array_equal(counts[group], np.histogram(times[groups == group], edges)[0])
+        rates = psth.normalize(counts, [10, 0, 4], 0.25)
+        np.testing.assert_allclose(rates[0], counts[0] / 2.5)
+        np.testing.assert_array_equal(rates[1], 0.0)
+
+    def test_stim_aligned_counts(self):
+        store = SpikeStore(self.datafile, cache=False)
+        celltypes = ['SpinyStellate', 'TCR']
+        stimstart, stimwidth, binsize = 0.2, 0.45, 0.05
+        edges = np.arange(0, stimwidth, binsize)
+        counts, trials, = psth.stim_aligned_counts(store, celltypes, stimstart, stimwidth, edges, stop=5.0)
+        for ii, celltype in enumerate(celltypes):
+            chunks = []
+            for name, train in self.trains.items():
+                if name.startswith(celltype):
+                    chunks += extract_chunks(train, stimstart, stimwidth)
+            np.testing.assert_array_equal(counts[ii], np.histogram(np.concatenate(chunks), edges)[0])
+        np.testing.assert_array_equal(trials, [2 * 11, 2 * 11])
+
+    def test_aligned_chunks(self):
+        store = SpikeStore(self.datafile, cache=False)
+        celltypes = ['SpinyStellate', 'TCR']
+        stimstart, stimwidth = 0.2, 0.45
+        parts = psth.aligned_chunks(store, celltypes, stimstart, stimwidth)
+        for celltype, (reltimes, chunk_ids, nchunks, ncells) in zip(celltypes, parts):
+            chunks = []
+            for name in store:
+                if name.startswith(celltype):
+                    chunks += extract_chunks(self.trains[name], stimstart, stimwidth)
+            self.assertEqual(nchunks, len(chunks))
+            self.assertEqual(ncells, 2)
+            for chunk, expected in zip(epochs.split_by_epoch(chunk_ids, reltimes, nchunks), chunks):
+                np.testing.assert_allclose(chunk, expected)
+        reltimes, chunk_ids, nchunks, = psth.merge_chunks(parts)
+        self.assertEqual(nchunks, parts[0][2] + parts[1][2])
+        np.testing.assert_array_equal(np.unique(chunk_ids), np.arange(nchunks))
+
+    def test_overlapping_celltypes(self):
+        # TCR_1 is both a 'TCR' and a 'TCR_1': it counts for both in
+        # the counts and in the chunks
+        store = SpikeStore(self.datafile, cache=False)
+        celltypes = ['TCR', 'TCR_1', 'SpinyStellate']
+        np.testing.assert_array_equal(psth.celltype_membership(store.names, celltypes).sum(axis=0), [2, 1, 2])
+        stimstart, stimwidth, binsize = 0.2, 0.45, 0.05
+        edges = np.arange(0, stimwidth, binsize)
+        stop = np.max(store.values)
+        counts, trials, = psth.stim_aligned_counts(store, celltypes, stimstart, stimwidth, edges, stop=stop)
+        parts = psth.aligned_chunks(store, celltypes, stimstart, stimwidth)
+        nepochs = len(epochs.periodic_starts(stimstart, stimwidth, stop))
+        for ii, (reltimes, chunk_ids, nchunks, ncells) in enumerate(parts):
+            np.testing.assert_array_equal(counts[ii], np.histogram(reltimes, edges)[0])
+            self.assertEqual(trials[ii], ncells * nepochs)
+        np.testing.assert_array_equal(counts[0], np.histogram(np.concatenate(extract_chunks(self.trains['TCR_0'], stimstart, stimwidth) + extract_chunks(self.trains['TCR_1'], stimstart, stimwidth)), edges)[0])
+        np.testing.assert_array_equal(counts[1], np.histogram(np.concatenate(extract_chunks(self.trains['TCR_1'], stimstart, stimwidth)), edges)[0])
+
+    def test_binsize_costs(self):
+        trains = [np.random.uniform(0, 1.2, size=np.random.randint(5, 30)) for ii in range(40)]
+        binsizes = np.linspace(0.01, 1.0, 300)
+        costs = psth.binsize_costs(np.concatenate(trains), 1.0, binsizes, len(trains), blocksize=500)
+        for binsize, cost in zip(binsizes, costs):
+            if len(np.arange(0, 1.0, binsize)) < 2:
+                self.assertEqual(cost, np.inf)
+            else:
+                self.assertAlmostEqual(cost, cost_psth(binsize, 1.0, trains), places=9)
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_psth.py ends here
@@ -0,0 +1,111 @@
+# test_raggedarray.py --- 
+# 
+# Filename: test_raggedarray.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 11:02:47 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 11:02:47 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import unittest
+import numpy as np
+import raggedarray
+from probabilities import spike_following_probability, spike_following_probability_grid, stimulus_response
+
+class TestRaggedArray(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1)
+        self.trains = [np.sort(np.random.uniform(0, 1.0, size=n)) for n in [5, 0, 17, 3, 40]]
+        self.values, self.offsets, = raggedarray.from_arrays(self.trains)
+
+    def test_from_arrays(self):
+        self.assertEqual(len(self.offsets), len(self.trains) + 1)
+        for train, row in zip(self.trains, raggedarray.to_arrays(self.values, self.offsets)):
+            np.testing.assert_array_equal(train, row)
+
+    def test_expand_rows(self):
+        rows = [4, 1, 0, 4]
+        owner, positions, = raggedarray.expand_rows(self.offsets, rows)
+        expected = np.concatenate([self.trains[row] for row in rows])
+        np.testing.assert_array_equal(self.values[positions], expected)
+        np.testing.assert_array_equal(np.bincount(owner, minlength=len(rows)), [40, 0, 5, 40])
+
+    def test_searchsorted(self):
+        rows = np.random.randint(len(self.trains), size=200)
+        queries = np.random.uniform(-0.1, 1.1, size=200)
+        # include exact hits to check ties
+        queries[:5] = self.trains[4][:5]
+        rows[:5] = 4
+        for side in ['left', 'right']:
+            index = raggedarray.searchsorted(self.values, self.offsets, rows, queries, side=side)
+            expected = [np.searchsorted(self.trains[row], query, side=side) for row, query in zip(rows, queries)]
+            np.testing.assert_array_equal(index - self.offsets[rows], expected)
+
+    def test_spike_following_probability(self):
+        sources = np.array([0, 2, 4, 1, 4, 3])
+        targets = np.array([4, 4, 2, 0, 4, 1])
+        width, delay = 0.05, 0.01
+        result = spike_following_probability(self.values, self.offsets, sources, targets, width, delay, blocksize=4)
+        for pre, post, prob in zip(sources, targets, result['prob']):
+            pretrain = self.trains[pre]
+            posttrain = self.trains[post]
+            count = 0
+            for prespike in pretrain:
+                if len(np.nonzero((posttrain > prespike + delay) & (posttrain <= prespike + delay + width))[0]) > 0:
+                    count += 1
+            expected = count * 1.0 / len(pretrain) if len(pretrain) > 0 else 0.0
+            self.assertEqual(prob, expected)
+
+    def test_spike_following_probability_grid(self):
+        sources = np.array([0, 2, 4, 1, 4, 3])
+        targets = np.array([4, 4, 2, 0, 4, 1])
+        windows = [0.01, 0.05, 0.2]
+        delays = [-0.05, 0.0, 0.01, 0.1]
+        result = spike_following_probability_grid(self.values, self.offsets, sources, targets, windows, delays, blocksize=4)
+        self.assertEqual(result.shape, (len(sources), len(windows), len(delays)))
+        for jj, width in enumerate(windows):
+            for kk, delay in enumerate(delays):
+                expected = spike_following_probability(self.values, self.offsets, sources, targets, width, delay)
+                np.testing.assert_array_equal(result[:, jj, kk], expected['prob'])
+
+    def test_stimulus_response(self):
+        stimtimes = np.array([0.0, 0.1, 0.25, 0.3, 0.7])
+        windows = [0.01, 0.05, 0.2]
+        delays = [0.0, 0.02, 0.1]
+        responses, spikecounts, = stimulus_response(self.values, self.offsets, stimtimes, windows, delays, blocksize=50)
+        self.assertEqual(responses.shape, (len(self.offsets) - 1, len(windows), len(delays)))
+        for ii in range(len(self.offsets) - 1):
+            train = self.values[self.offsets[ii]:self.offsets[ii+1]]
+            for jj, width in enumerate(windows):
+                for kk, delay in enumerate(delays):
+                    counts = [len(np.nonzero((train > t + delay) & (train <= t + delay + width))[0]) for t in stimtimes]
+                    self.assertEqual(responses[ii, jj, kk], np.count_nonzero(counts))
+                    self.assertEqual(spikecounts[ii, jj, kk], sum(counts))
+        
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_raggedarray.py ends here
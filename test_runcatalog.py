@@ -0,0 +1,128 @@
+# test_runcatalog.py ---
+#
+# Filename: test_runcatalog.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 02:40:15 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 02:40:15 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+#
+#
+#
+
+# Change log:
+#
+#
+#
+
+# Code:
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+from runcatalog import RunCatalog
+
+TABLE = [('name', '|S35'), ('value', '|S35')]
+
+class TestRunCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.datafiles = []
+        for ii, (date, simtime, seed, isi) in enumerate([('20111230', '10.0', '1', '0.0'),
+                                                         ('20120105', '10.0', '1', '0.0'),
+                                                         ('20120106', '2.0', '1', '0.125'),
+                                                         ('20120107', '10.0', '2', '0.0')]):
+            self.datafiles.append(self.make_run('%s_1200%02d_%d' % (date, ii, ii), simtime, seed, isi))
+        self.catalog = RunCatalog(os.path.join(self.tmpdir, 'catalog.db'))
+
+    def make_run(self, runid, simtime, seed, isi):
+        datafilename = os.path.join(self.tmpdir, 'data_%s.h5' % (runid))
+        datafile = h5.File(datafilename, 'w')
+        datafile.create_dataset('/runconfig/scheduling', data=np.array([('simtime', simtime), ('plotdt', '1e-3')], dtype=TABLE))
+        datafile.create_dataset('/runconfig/stimulus', data=np.array([('bg_interval', '0.5'), ('isi', isi)], dtype=TABLE))
+        datafile.create_dataset('/runconfig/numeric', data=np.array([('numpy_rngseed', seed)], dtype=TABLE))
+        datafile.create_dataset('/runconfig/cellcount', data=np.array([('TCR', '10'), ('nRT', '5')], dtype=TABLE))
+        datafile.create_dataset('/stimulus/stim_bg', data=np.tile([0.0, 1.0], 5))
+        datafile.create_dataset('/stimulus/stim_probe', data=np.tile([0.0, 0.0, 0.0, 1.0], 3))
+        datafile.close()
+        netfile = h5.File(os.path.join(self.tmpdir, 'network_%s.h5.new' % (runid)), 'w')
+        netfile.create_dataset('/stimulus/connection', data=np.array([('/stim/stim_bg', '/model/net/TCR_0/comp_1')], dtype=TABLE))
+        netfile.close()
+        return datafilename
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_scan(self):
+        self.assertEqual(sorted(self.catalog.scan(self.tmpdir, minsize=0)), sorted(self.datafiles))
+        self.assertEqual(len(self.catalog), 4)
+        # nothing changed, nothing to read
+        self.assertEqual(self.catalog.scan(self.tmpdir, minsize=0), [])
+        time.sleep(0.01)
+        datafile = h5.File(self.datafiles[0], 'a')
+        datafile.attrs['note'] = 'modified'
+        datafile.close()
+        self.assertEqual(self.catalog.scan(self.tmpdir, minsize=0), [self.datafiles[0]])
+        os.remove(self.datafiles[3])
+        self.catalog.scan(self.tmpdir, minsize=0)
+        self.assertFalse(self.datafiles[3] in self.catalog)
+
+    def test_select(self):
+        self.catalog.update(self.datafiles)
+        run = self.catalog.run(self.datafiles[1])
+        self.assertEqual(run['date'], '2012-01-05')
+        self.assertEqual(run['simtime'], 10.0)
+        self.assertEqual(run['rngseed'], '1')
+        self.assertEqual(run['bg_pulses'], 5)
+        self.assertEqual(run['probe_pulses'], 3)
+        self.assertEqual(self.catalog.with_stimulus('date >= ? AND simtime >= ?', ('2012-01-01', 5.0)),
+                         [self.datafiles[1], self.datafiles[3]])
+        self.assertEqual(self.catalog.select(stimulus={'isi': 0.125}), [self.datafiles[2]])
+        self.assertEqual(self.catalog.stimulus(self.datafiles[2]), {'bg_interval': 0.5, 'isi': 0.125})
+
+    def test_default_dbpath(self):
+        cachedir = os.path.join(self.tmpdir, 'cache')
+        old = os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME'] = cachedir
+        try:
+            catalog = RunCatalog()
+            catalog.close()
+        finally:
+            if old is None:
+                del os.environ['XDG_CACHE_HOME']
+            else:
+                os.environ['XDG_CACHE_HOME'] = old
+        self.assertEqual(catalog.dbpath, os.path.join(cachedir, 'dataviz', 'runcatalog.db'))
+        self.assertTrue(os.path.isfile(catalog.dbpath))
+
+    def test_categorise(self):
+        self.catalog.update(self.datafiles)
+        groups = self.catalog.categorise()
+        self.assertEqual(sorted(groups.keys()), ['1', '2'])
+        self.assertEqual(len(groups['1']), 1)
+        self.assertEqual(groups['1'].values()[0], self.datafiles[:3])
+        self.assertEqual(groups['2'].values()[0], self.datafiles[3:])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+#
+# test_runcatalog.py ends here
@@ -0,0 +1,90 @@
+# test_runconfig.py --- 
+# 
+# Filename: test_runconfig.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Mon Oct 19 00:12:40 2026 (+0530)
+# Version: 
+# Last-Updated: Mon Oct 19 00:12:40 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+from runconfig import RunConfig, get_runconfig
+
+class TestRunConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data_test.h5')
+        datafile = h5.File(self.filename, 'w')
+        table = [('name', '|S35'), ('value', '|S35')]
+        datafile.create_dataset('/runconfig/scheduling', data=np.array([('simtime', '10.0'), ('simdt', '2.5e-5'), ('plotdt', '1e-4')], dtype=table))
+        datafile.create_dataset('/runconfig/stimulus', data=np.array([('onset', '1.0'), ('bg_count', '3'), ('level', 'high')], dtype=table))
+        datafile.create_dataset('/runconfig/cellcount', data=np.array([('TCR', '10'), ('nRT', '5')], dtype=table))
+        datafile.close()
+        self.oldfilename = os.path.join(self.tmpdir, 'data_old.h5')
+        datafile = h5.File(self.oldfilename, 'w')
+        datafile.attrs['simtime'] = 2.0
+        datafile.attrs['plotdt'] = 1e-3
+        datafile.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read(self):
+        datafile = h5.File(self.filename, 'r')
+        config = RunConfig(datafile)
+        datafile.close()
+        self.assertEqual(config.simtime, 10.0)
+        self.assertEqual(config.simdt, 2.5e-5)
+        self.assertEqual(config.plotdt, 1e-4)
+        self.assertEqual(config.stimulus, {'onset': 1.0, 'bg_count': 3, 'level': 'high'})
+        self.assertEqual(config.celltypes, ['TCR', 'nRT'])
+        self.assertEqual(config.cellcount, {'TCR': 10, 'nRT': 5})
+        self.assertEqual(config.numeric, {})
+
+    def test_attributes(self):
+        datafile = h5.File(self.oldfilename, 'r')
+        config = RunConfig(datafile)
+        datafile.close()
+        self.assertEqual(config.simtime, 2.0)
+        self.assertEqual(config.plotdt, 1e-3)
+        self.assertEqual(config.simdt, None)
+
+    def test_memoize(self):
+        datafile = h5.File(self.filename, 'r')
+        try:
+            self.assertTrue(get_runconfig(datafile) is get_runconfig(datafile))
+        finally:
+            datafile.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_runconfig.py ends here
@@ -0,0 +1,116 @@
+# test_spikestore.py --- 
+# 
+# Filename: test_spikestore.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 12:30:18 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 12:30:18 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+import sidecar
+import spikestore
+from spikestore import SpikeStore, SUFFIX
+
+class TestSpikeStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data_test.h5')
+        self.trains = {'SpinyStellate_0': np.array([0.1, 0.5, 1.2]),
+                       'SpinyStellate_1': np.array([]),
+                       'TCR_0': np.array([0.01, 2.0]),
+                       'ectopic_TCR_0': np.array([0.3])}
+        datafile = h5.File(self.filename, 'w')
+        grp = datafile.create_group('spikes')
+        for name, train in self.trains.items():
+            grp.create_dataset(name, data=train)
+        datafile.close()
+        self.datafile = h5.File(self.filename, 'r')
+
+    def tearDown(self):
+        self.datafile.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_read(self):
+        store = SpikeStore(self.datafile)
+        self.assertEqual(sorted(store), sorted(self.trains.keys()))
+        for name, train in self.trains.items():
+            np.testing.assert_array_equal(store[name], train)
+        np.testing.assert_array_equal(store.names[store.rows('SpinyStellate')], ['SpinyStellate_0', 'SpinyStellate_1'])
+        np.testing.assert_array_equal(store.last_spikes(store.rows('SpinyStellate'), default=-1.0), [1.2, -1.0])
+
+    def test_sidecar(self):
+        store = SpikeStore(self.datafile)
+        self.assertTrue(os.path.isdir(sidecar.sidecar_path(self.filename, SUFFIX)))
+        cached = SpikeStore(self.datafile)
+        self.assertTrue(isinstance(cached.values, np.memmap))
+        np.testing.assert_array_equal(cached.values, store.values)
+        np.testing.assert_array_equal(cached.offsets, store.offsets)
+        self.assertEqual(cached.index, store.index)
+
+    def test_take(self):
+        store = SpikeStore(self.datafile, cache=False)
+        values, offsets, = store.take(['TCR_0', 'nRT_0', 'SpinyStellate_0'])
+        np.testing.assert_array_equal(offsets, [0, 2, 2, 5])
+        np.testing.assert_array_equal(values, [0.01, 2.0, 0.1, 0.5, 1.2])
+
+    def test_memo(self):
+        memo = sidecar.FileMemo(size=2)
+        loads = []
+        def loader(name):
+            return lambda: loads.append(name) or len(loads)
+        paths = []
+        for name in ['a', 'b', 'c']:
+            paths.append(os.path.join(self.tmpdir, name))
+            open(paths[-1], 'w').write(name)
+        self.assertEqual(memo.get(paths[0], loader('a')), 1)
+        self.assertEqual(memo.get(paths[1], loader('b')), 2)
+        self.assertEqual(memo.get(paths[0], loader('a')), 1)
+        # b is the least recently used
+        self.assertEqual(memo.get(paths[2], loader('c')), 3)
+        self.assertEqual(len(memo), 2)
+        self.assertFalse(paths[1] in memo)
+        self.assertEqual(memo.get(paths[1], loader('b')), 4)
+        # a changed file is loaded again
+        open(paths[1], 'w').write('bb')
+        self.assertEqual(memo.get(paths[1], loader('b')), 5)
+        self.assertEqual(loads, ['a', 'b', 'c', 'b', 'b'])
+
+    def test_get_spike_store(self):
+        store = spikestore.get_spike_store(self.datafile)
+        self.assertTrue(spikestore.get_spike_store(self.datafile) is store)
+        spikestore._stores.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_spikestore.py ends here
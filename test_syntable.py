@@ -0,0 +1,123 @@
+# test_syntable.py --- 
+# 
+# Filename: test_syntable.py
+# Description: 
+# Author: 
+# Maintainer: 
+# Created: Sun Oct 18 23:20:09 2026 (+0530)
+# Version: 
+# Last-Updated: Sun Oct 18 23:20:09 2026 (+0530)
+#           By: 
+#     Update #: 0
+# URL: 
+# Keywords: 
+# Compatibility: 
+# 
+# 
+
+# Commentary: 
+# 
+# 
+# 
+# 
+
+# Change log:
+# 
+# 
+# 
+# Code:
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+import sidecar
+import analyzer
+from syntable import SynapseTable, SynapseIndex, SUFFIX, multiplicity_histogram
+
+class TestSynapseTable(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'network_test.h5.new')
+        self.syntab = np.array([('TCR_1/comp_1', 'SupPyrRS_2/comp_5', 'ampa', 1.0, 0.5),
+                                ('SupPyrRS_0/comp_1', 'nRT_0/comp_2', 'ampa', 2.0, 0.5),
+                                ('nRT_0/comp_1', 'TCR_0/comp_3', 'gaba', 3.0, 1.5),
+                                ('TCR_1/comp_1', 'SupPyrRS_2/comp_7', 'nmda', 4.0, 2.5),
+                                ('SupPyrRS_1/comp_2', 'SupPyrRS_2/comp_6', 'ampa', 5.0, 0.5)],
+                               dtype=[('source', '|S35'), ('dest', '|S35'), ('type', '|S4'), ('Gbar', 'f8'), ('tau1', 'f8')])
+        netfile = h5.File(self.filename, 'w')
+        netfile.create_dataset('/network/synapse', data=self.syntab)
+        netfile.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_records(self):
+        table = SynapseTable(self.filename, cache=False)
+        self.assertEqual(len(table), len(self.syntab))
+        self.assertEqual(table.records().tolist(), self.syntab.tolist())
+        self.assertEqual(table.records([3, 1]).tolist(), self.syntab[[3, 1]].tolist())
+
+    def test_select(self):
+        table = SynapseTable(self.filename, cache=False)
+        # same as the np.char.startswith selections it replaces
+        expected = np.nonzero(np.char.startswith(self.syntab['dest'], 'SupPyrRS_2/') & 
+                              np.char.startswith(self.syntab['source'], 'TCR') &
+                              np.char.startswith(self.syntab['type'], ''))[0]
+        np.testing.assert_array_equal(table.select(dst='SupPyrRS_2', srcprefix='TCR'), expected)
+        np.testing.assert_array_equal(table.select(dst='SupPyrRS_2', syntype='am'), [0, 4])
+        np.testing.assert_array_equal(table.select(src='TCR_1'), [0, 3])
+        self.assertEqual(len(table.select(dst='DeepBasket_0')), 0)
+        self.assertEqual(table.presynaptic_cells('SupPyrRS_2'), ['SupPyrRS_1', 'TCR_1'])
+        self.assertEqual(table.postsynaptic_cells('nRT_0'), ['TCR_0'])
+
+    def test_index(self):
+        table = SynapseTable(self.filename, cache=False)
+        index = SynapseIndex(table)
+        self.assertEqual(sorted(index.incoming('SupPyrRS_2')), [0, 3, 4])
+        self.assertEqual(sorted(index.outgoing('TCR_1')), [0, 3])
+        self.assertEqual(len(index.incoming('DeepBasket_0')), 0)
+        self.assertEqual(sorted(index.synapses_between('TCR_1', 'SupPyrRS_2')), [0, 3])
+        self.assertEqual(len(index.synapses_between('TCR_1', 'nRT_0')), 0)
+        self.assertEqual(len(index.synapses_between('TCR_1', 'DeepBasket_0')), 0)
+        self.assertEqual(index.presynaptic('SupPyrRS_2'), ['SupPyrRS_1', 'TCR_1'])
+        self.assertEqual(index.postsynaptic('TCR_1'), ['SupPyrRS_2'])
+        self.assertEqual(index.postsynaptic('TCR_0'), [])
+
+    def test_pair_counts(self):
+        table = SynapseTable(self.filename, cache=False)
+        rows, counts, = table.cell_pair_counts()
+        expected = {}
+        for row in self.syntab:
+            key = row['source'].partition('/')[0] + '-' + row['dest'].partition('/')[0]
+            expected[key] = expected.get(key, 0) + 1
+        self.assertEqual(dict(zip(table.pair_labels(rows).tolist(), counts.tolist())), expected)
+        rows, counts, = table.compartment_pair_counts()
+        self.assertEqual(len(counts), len(self.syntab))
+        self.assertEqual(sorted(table.pair_labels(rows, compartments=True).tolist()),
+                         sorted([row['source'] + '-' + row['dest'] for row in self.syntab]))
+        np.testing.assert_array_equal(multiplicity_histogram([1, 2, 1, 1]), [0, 3, 1])
+
+    def test_find_bad_files(self):
+        missing = os.path.join(self.tmpdir, 'network_missing.h5')
+        self.assertEqual(analyzer.find_bad_files([self.filename, missing], maxcount=1, workers=1), ([missing], []))
+        self.assertEqual(analyzer.find_bad_files([self.filename], maxcount=0, workers=1), ([], [self.filename]))
+        # checking leaves no sidecar behind
+        self.assertFalse(os.path.exists(sidecar.sidecar_path(self.filename, SUFFIX)))
+
+    def test_sidecar(self):
+        table = SynapseTable(self.filename)
+        self.assertTrue(os.path.isdir(sidecar.sidecar_path(self.filename, SUFFIX)))
+        cached = SynapseTable(self.filename)
+        self.assertTrue(isinstance(cached.src_cell, np.memmap))
+        self.assertEqual(cached.records().tolist(), self.syntab.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# 
+# test_syntable.py ends here
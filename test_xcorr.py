@@ -0,0 +1,99 @@
+# test_xcorr.py ---
+#
+# Filename: test_xcorr.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 01:02:36 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 01:02:36 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+#
+#
+#
+
+# Change log:
+#
+#
+#
+
+# Code:
+
+import unittest
+import numpy as np
+import xcorr
+
+def ncc(a, b):
+    """Reference: util.ncc without importing util."""
+    a = (a - np.mean(a))/np.std(a)
+    b = (b - np.mean(b))/np.std(b)
+    ffta = np.fft.fft(a, 2*len(a)-1)
+    fftb = np.fft.fft(b, 2*len(b)-1)
+    res = np.fft.ifft(ffta * np.conj(fftb)).real
+    return np.fft.fftshift(res)/(len(a) - 1)
+
+class TestXcorr(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(7)
+        self.data = np.cumsum(np.random.normal(size=(11, 97)), axis=1)
+
+    def test_next_fast_len(self):
+        for n in [1, 2, 7, 97, 193, 1001, 4097]:
+            value = xcorr.next_fast_len(n)
+            self.assertTrue(value >= n)
+            for factor in [2, 3, 5]:
+                while value % factor == 0:
+                    value //= factor
+            self.assertEqual(value, 1)
+        self.assertEqual(xcorr.next_fast_len(193), 200)
+
+    def test_pair_index(self):
+        pairs = xcorr.pairs(5)
+        self.assertEqual(len(pairs), xcorr.pair_count(5))
+        for row, (ii, jj) in enumerate(pairs):
+            self.assertEqual(xcorr.pair_index(5, ii, jj), row)
+
+    def test_full(self):
+        out = xcorr.all_pairs_xcorr(self.data, blocksize=4)
+        length = self.data.shape[1]
+        self.assertEqual(out.shape, (xcorr.pair_count(len(self.data)), 2 * length - 1))
+        for row, (ii, jj) in enumerate(xcorr.pairs(len(self.data))):
+            np.testing.assert_allclose(out[row], ncc(self.data[ii], self.data[jj]), atol=1e-10)
+
+    def test_maxlag(self):
+        maxlag = 10
+        out = xcorr.all_pairs_xcorr(self.data, maxlag=maxlag, blocksize=3)
+        center = self.data.shape[1] - 1
+        for row, (ii, jj) in enumerate(xcorr.pairs(len(self.data))):
+            expected = ncc(self.data[ii], self.data[jj])[center - maxlag:center + maxlag + 1]
+            np.testing.assert_allclose(out[row], expected, atol=1e-10)
+
+    def test_stream(self):
+        maxlag = 6
+        expected = xcorr.all_pairs_xcorr(self.data, maxlag=maxlag)
+        out = np.zeros(expected.shape)
+        # chunks shorter than maxlag and not dividing the length
+        xcorr.stream_xcorr(out, list(self.data), maxlag, blocksize=4, chunksize=5)
+        np.testing.assert_allclose(out, expected, atol=1e-10)
+
+    def test_series_stats(self):
+        length, mean, std, = xcorr.series_stats(list(self.data), chunksize=10)
+        self.assertEqual(length, self.data.shape[1])
+        np.testing.assert_allclose(mean, self.data.mean(axis=1))
+        np.testing.assert_allclose(std, self.data.std(axis=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+#
+# test_xcorr.py ends here
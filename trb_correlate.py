@@ -35,9 +35,21 @@ import numpy
 from scipy.signal import correlate
 from datetime import datetime
 import tables
-from util import ncc
+import xcorr
+from runconfig import get_runconfig
 
-def find_xcorr(inputfilename, outputfilename):
+def find_xcorr(inputfilename, outputfilename, maxlag=None, blocksize=64, chunksize=4096):
+    """Save the correlation of the Vm of every pair of cells.
+
+    If maxlag is None, the full correlation for each cell is saved in
+    a separate file {outputfilename}_{cell}.h5.
+
+    Otherwise only the lags up to maxlag (in the time unit of plotdt)
+    are computed, streaming the Vm data in chunks of chunksize samples
+    instead of loading all of it, and saved in {outputfilename}.h5 in
+    the layout of xcorr.save_xcorr. See save_xcorr_lagged."""
+    if maxlag is not None:
+        return save_xcorr_lagged(inputfilename, '%s.h5' % (outputfilename), maxlag, blocksize=blocksize, chunksize=chunksize)
     datafile = h5py.File(inputfilename, 'r')
     vmnode = datafile['/Vm']
     vmdata = []
@@ -80,7 +92,34 @@ def find_xcorr(inputfilename, outputfilename):
     print 'Finished correlation computation and saving in :', dt.days * 86400 + dt.seconds + dt.microseconds, 'seconds'
     outfile.close()
 
-def save_xcorr_h5py(datafilename, netfilename, outfilename, node='Vm', numcells=-1):
+def save_xcorr_lagged(datafilename, outfilename, maxlag, node='Vm', blocksize=64, chunksize=4096):
+    """Save the normalized correlation (as util.ncc) of all pairs of
+    series under /{node} for lags up to maxlag (in the time unit of
+    plotdt), reading the data in chunks of chunksize samples.
+
+    Memory use is about blocksize x number of cells x number of lags
+    floats, independent of the length of the recording."""
+    t_start = datetime.now()
+    datafile = h5py.File(datafilename, 'r')
+    outfile = h5py.File(outfilename, 'w')
+    try:
+        plotdt = get_runconfig(datafile).plotdt
+        if plotdt is None:
+            plotdt = 1.0
+        datanode = datafile['/%s' % (node)]
+        cell = [name for name in datanode]
+        series = [datanode[name] for name in cell]
+        maxlag = min(int(maxlag / plotdt + 0.5), len(series[0]) - 1)
+        corrgroup = outfile.create_group('/%s' % (node))
+        corrarray = xcorr.create_xcorr_datasets(corrgroup, cell, maxlag, plotdt, blocksize)
+        xcorr.stream_xcorr(corrarray, series, maxlag, blocksize, chunksize)
+    finally:
+        outfile.close()
+        datafile.close()
+    t_delta = datetime.now() - t_start
+    print 'Computed and saved correlations up to lag %d in %g seconds' % (maxlag, t_delta.days * 86400 + t_delta.seconds + t_delta.microseconds * 1e-6)
+
+def save_xcorr_h5py(datafilename, netfilename, outfilename, node='Vm', numcells=-1, maxlag=None, blocksize=64):
     """Same as save_xcorr_pytables using h5py. For comparing h5py with
     pytables."""
     print 'save_xcorr_h5py'
@@ -126,16 +165,10 @@ def save_xcorr_h5py(datafilename, netfilename, outfilename, node='Vm', numcells=
         cell = [cell[index] for index in indices]
         vmdata = [vmdata[index] for index in indices]
     t_start = datetime.now()
-    lags = 2 * int(simtime/plotdt) - 1
-    time = numpy.fft.fftshift(numpy.fft.fftfreq(lags, 1/(plotdt*lags)))
+    if maxlag is not None:
+        maxlag = int(maxlag / plotdt + 0.5)
     corrgroup = outfile.create_group('/%s' % (node))
-    timearray = corrgroup.create_dataset('t', data=time, compression='gzip')
-    for ii in range(len(cell)):
-        left = vmdata[ii]
-        for jj in range(len(cell)):
-            right = vmdata[jj]
-            corr = ncc(left, right)
-            corrarray = corrgroup.create_dataset('%s-%s' % (cell[ii], cell[jj]), data=corr, chunks=corr.shape)
+    xcorr.save_xcorr(corrgroup, cell, numpy.vstack(vmdata), plotdt, maxlag, blocksize)
     outfile.close()
     datafile.close()
     netfile.close()
@@ -144,7 +177,7 @@ def save_xcorr_h5py(datafilename, netfilename, outfilename, node='Vm', numcells=
     print 'Computed and saved correlatioons in %g seconds' % (t_delta.days * 86400 + t_delta.seconds + t_delta.microseconds * 1e-6)
     
 
-def save_xcorr_pytables(datafilename, netfilename, outfilename, node='Vm', numcells=-1):
+def save_xcorr_pytables(datafilename, netfilename, outfilename, node='Vm', numcells=-1, maxlag=None, blocksize=64):
     """Save the cross correlation. I am hoping that pytables will give
     better performance in disk space.
 
@@ -159,6 +192,15 @@ def save_xcorr_pytables(datafilename, netfilename, outfilename, node='Vm', numce
     numcells -- number of cells among which cross correlation is to be
     computed. if -1, all cells in datafile are used.
 
+    maxlag -- largest lag (in the time unit of plotdt) to save. All
+    lags are saved if None.
+
+    blocksize -- number of cells correlated together. Memory use
+    grows as blocksize^2.
+
+    The correlations of all pairs of cells (i, j) with i <= j are
+    saved as rows of /{node}/xcorr, the pair in each row in
+    /{node}/pairs and the cell names in /{node}/cells (see xcorr.py).
     """
     print 'save_xcorr_pytables'
     t_start = datetime.now()
@@ -196,18 +238,21 @@ def save_xcorr_pytables(datafilename, netfilename, outfilename, node='Vm', numce
         cell = [cell[index] for index in indices]
         vmdata = [vmdata[index] for index in indices]
     t_start = datetime.now()
-    lags = 2*int(simtime/plotdt)-1
-    time = numpy.fft.fftshift(numpy.fft.fftfreq(lags, 1/(plotdt*lags)))
+    vmdata = numpy.vstack(vmdata)
+    if maxlag is None or maxlag / plotdt > vmdata.shape[1] - 1:
+        maxlag = vmdata.shape[1] - 1
+    else:
+        maxlag = int(maxlag / plotdt + 0.5)
+    npairs = xcorr.pair_count(len(cell))
+    nlags = 2 * maxlag + 1
     corrgroup = outfile.createGroup(outfile.root, node, 'Correlation between %s series' % (node))
-    timearray = outfile.createCArray(corrgroup, 't', tables.FloatAtom(), time.shape)
-    timearray[:] = time[:]
-    for ii in range(len(cell)):
-        left = vmdata[ii]
-        for jj in range(len(cell)):
-            right = vmdata[jj]
-            corr = ncc(left, right)
-            corrarray = outfile.createCArray(corrgroup, '%s__%s' % (cell[ii], cell[jj]), tables.FloatAtom(), corr.shape)
-            corrarray[:] = corr[:]
+    timearray = outfile.createCArray(corrgroup, 't', tables.FloatAtom(), (nlags,))
+    timearray[:] = numpy.arange(-maxlag, maxlag + 1) * plotdt
+    outfile.createArray(corrgroup, 'cells', numpy.array(cell, dtype=str))
+    outfile.createArray(corrgroup, 'pairs', xcorr.pairs(len(cell)))
+    corrarray = outfile.createCArray(corrgroup, 'xcorr', tables.FloatAtom(), (npairs, nlags),
+                                     chunkshape=(xcorr.chunk_rows(npairs, nlags, blocksize), nlags))
+    xcorr.fill_xcorr(corrarray, vmdata, maxlag, blocksize)
     outfile.close()
     datafile.close()
     netfile.close()
@@ -44,13 +44,14 @@
 # 
 
 # Code:
-import h5py as h5
 from subprocess import call
 import pylab
 import gzip
 import numpy
 from scipy import signal
 
+import netfingerprint
+
 def almost_equal(left, right, epsilon=1e-6):
     """check if two floats are almost equal"""
     if left == right:
@@ -82,56 +83,42 @@ def ncc(a, b):
 def print_diff(message, left, right, ldiff, rdiff):
     print '%s: %s [%s] <-> %s [%s]' % (message, left.name, ldiff, right.name, rdiff)
     
+def node_path(node, path):
+    """Name of the node at `path` below h5py node `node`."""
+    if not path:
+        return node.name
+    return '%s/%s' % (node.name.rstrip('/'), path)
+
 def check_network_identity(left, right):
-    """Compare two hdf5 network files for equality."""
-    ret = True
+    """Compare two hdf5 network files (or groups or datasets in them)
+    for equality.
+
+    The nodes are compared by their fingerprints (see
+    netfingerprint.py), so unchanged parts are not compared element
+    by element, and for datasets that differ only the chunks with
+    different digests are read to find the rows that differ."""
     if type(left) != type(right):
         print_diff('Different types:', left, right, left.__class__.__name__, right.__class__.__name__)
         return False
-    if isinstance(left, h5.Group):
-        lkeys = sorted(left.keys())
-        rkeys = sorted(right.keys())
-        if len(lkeys) != len(rkeys):
-            print_diff('Different childcount:', left, right,  len(lkeys), len(rkeys))
-            return False
-        for ii in range(len(lkeys)):
-            if lkeys[ii] != rkeys[ii]:
-                print_diff('Different children:', left, right, lkeys[ii], rkeys[ii])
-                ret = False
-            next_ret = check_network_identity(left[lkeys[ii]], right[rkeys[ii]])
-            if ret:
-                ret = next_ret
-        return ret
-    if isinstance(left, h5.Dataset):
-        if left.shape != right.shape:
-            print_diff('Datasets of unequal length:', left, right, len(left), len(right))
-            return False
-        ldata = left[:]
-        rdata = right[:]
-        if ldata.dtype != rdata.dtype:
-            print_diff('Datatypes don\'t match:', left, right, ldata.dtype, rdata.dtype)
-            ret = False
+    lprint = netfingerprint.node_fingerprint(left)
+    rprint = netfingerprint.node_fingerprint(right)
+    ret = True
+    for path, reason, ldiff, rdiff, in netfingerprint.diff(lprint, rprint):
+        ret = False
+        lname = node_path(left, path)
+        rname = node_path(right, path)
+        if reason == 'missing':
+            print 'Different children: %s [%s] <-> %s [%s]' % (lname, ldiff, rname, rdiff)
+        elif reason == 'kind':
+            print 'Different types: %s [%s] <-> %s [%s]' % (lname, ldiff, rname, rdiff)
+        elif reason == 'meta':
+            print 'Datatypes or shapes don\'t match: %s [%s] <-> %s [%s]' % (lname, ldiff, rname, rdiff)
         else:
-            fnames = ldata.dtype.names
-            if fnames is not None:
-                for fname in fnames:
-                    for ii in range(min(len(ldata), len(rdata))):
-                        res = ldata[fname][ii] == rdata[fname][ii]
-                        if isinstance(res, numpy.ndarray):
-                            res = res.all()
-                        if not res:
-                            print_diff('Entries do not match (%s[%d])' % (fname, ii), left, right, str(ldata[fname][ii]), str(rdata[fname][ii]))
-                            ret = False
-            else:
-                for ii in range(min(len(ldata), len(rdata))):
-                    res = ldata[ii] == rdata[ii]
-                    if isinstance(res, numpy.ndarray):
-                        res = res.all()
-                    if not res:
-                        print_diff('Entries do not match [%d])' % (ii), left, right, str(ldata[ii]), str(rdata[ii]))
-                        ret = False
+            lnode = left[path] if path else left
+            rnode = right[path] if path else right
+            rows = netfingerprint.diff_rows(lnode, rnode, lprint, rprint, path)
+            print 'Entries do not match: %s <-> %s, %d rows: %s' % (lname, rname, len(rows), rows[:10].tolist())
     return ret
-            
 
 
 
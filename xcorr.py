@@ -0,0 +1,276 @@
+# xcorr.py ---
+#
+# Filename: xcorr.py
+# Description:
+# Author:
+# Maintainer:
+# Created: Mon Oct 19 00:41:09 2026 (+0530)
+# Version:
+# Last-Updated: Mon Oct 19 00:41:09 2026 (+0530)
+#           By:
+#     Update #: 0
+# URL:
+# Keywords:
+# Compatibility:
+#
+#
+
+# Commentary:
+#
+# Normalized cross correlation of all pairs of a set of series.
+#
+# util.ncc(a, b) subtracts the mean, divides by the standard deviation
+# and multiplies the FFTs of the two series. Calling it for every
+# ordered pair of N cells computes 2 N^2 FFTs and saves every pair
+# twice (the correlation of b with a is that of a with b reversed).
+# Here the rFFT of each normalized series is computed once, with a
+# length that has only 2, 3 and 5 as factors, and the products are
+# taken for blocks of `blocksize` x `blocksize` cells. Only the pairs
+# (i, j) with i <= j are computed.
+#
+# The correlations are written as the rows of one 2D array (an h5py
+# dataset, a pytables CArray or a numpy array): row pair_index(n, i,
+# j) holds the correlation of series i with series j for lags -maxlag
+# to maxlag samples, the same values as util.ncc(data[i], data[j])
+# gives for those lags. When maxlag is less than the length of the
+# series the FFT is correspondingly shorter.
+#
+# Memory use is bounded by the spectra of all the series plus
+# blocksize^2 correlations of length nfft.
+#
+# For long recordings where only short lags are of interest,
+# stream_xcorr() does not hold the series in memory. It reads them in
+# time chunks of `chunksize` samples (from h5py datasets or anything
+# else that can be sliced), each extended by maxlag samples on either
+# side as in overlap-save, and adds the products for each lag in
+# -maxlag..maxlag to the correlations of a block of `blocksize` rows.
+# This takes O(T * maxlag) operations per pair instead of
+# O(T log T) for a full length FFT. The mean and standard deviation
+# for normalization are found in a first pass over the chunks.
+#
+
+# Change log:
+#
+#
+#
+#
+
+# Code:
+
+import numpy as np
+
+def next_fast_len(n):
+    """Smallest integer >= n with no prime factor other than 2, 3 and
+    5."""
+    best = 1
+    while best < n:
+        best *= 2
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            value = power35
+            while value < n:
+                value *= 2
+            best = min(best, value)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+def pair_count(n):
+    """Number of pairs (i, j) with i <= j among n series."""
+    return n * (n + 1) // 2
+
+def pair_index(n, i, j):
+    """Row of the pair (i, j), i <= j, in the upper triangle of n
+    series stored row by row."""
+    return i * n - i * (i - 1) // 2 + (j - i)
+
+def pairs(n):
+    """Array of (i, j) for all the pairs in the order of pair_index."""
+    rows, cols, = np.triu_indices(n)
+    return np.column_stack((rows, cols))
+
+def normalized_spectra(data, nfft):
+    """rFFT of length nfft of each row of `data` after subtracting the
+    mean and dividing by the standard deviation."""
+    data = np.asarray(data, dtype=np.float64)
+    data = data - data.mean(axis=1)[:, np.newaxis]
+    data /= data.std(axis=1)[:, np.newaxis]
+    return np.fft.rfft(data, nfft, axis=1)
+
+def xcorr_blocks(data, maxlag=None, blocksize=64):
+    """Generate the correlations of all pairs of rows of `data` (2D
+    array of series of equal length) block by block.
+
+    maxlag -- largest lag in samples to keep (all the lags if None).
+
+    blocksize -- number of series in a block.
+
+    Yields (i, start, values) where values[k] is the correlation of
+    series i with series start + k for lags -maxlag to maxlag."""
+    data = np.asarray(data)
+    count, length, = data.shape
+    if maxlag is None or maxlag > length - 1:
+        maxlag = length - 1
+    # A circular correlation of length nfft >= length + maxlag has no
+    # wrap around for lags up to maxlag.
+    nfft = next_fast_len(length + maxlag)
+    spectra = normalized_spectra(data, nfft)
+    lags = np.r_[nfft - maxlag:nfft, 0:maxlag + 1]
+    scale = 1.0 / (length - 1)
+    for rowstart in range(0, count, blocksize):
+        rowend = min(count, rowstart + blocksize)
+        left = spectra[rowstart:rowend, np.newaxis, :]
+        for colstart in range(rowstart, count, blocksize):
+            colend = min(count, colstart + blocksize)
+            right = np.conj(spectra[np.newaxis, colstart:colend, :])
+            block = np.fft.irfft(left * right, nfft, axis=2)[:, :, lags] * scale
+            for ii in range(rowstart, rowend):
+                start = max(ii, colstart)
+                if start < colend:
+                    yield (ii, start, block[ii - rowstart, start - colstart:])
+
+def fill_xcorr(out, data, maxlag=None, blocksize=64):
+    """Write the correlations of all pairs of rows of `data` into
+    `out`, a 2D array-like of shape (pair_count(len(data)), 2 *
+    maxlag + 1) that supports slice assignment. See xcorr_blocks."""
+    count = len(data)
+    for ii, start, values, in xcorr_blocks(data, maxlag, blocksize):
+        row = pair_index(count, ii, start)
+        out[row:row + len(values)] = values
+
+def all_pairs_xcorr(data, maxlag=None, blocksize=64):
+    """Return an array with the correlations of all pairs of rows of
+    `data` in the order of pair_index. See xcorr_blocks."""
+    data = np.asarray(data)
+    if maxlag is None or maxlag > data.shape[1] - 1:
+        maxlag = data.shape[1] - 1
+    out = np.zeros((pair_count(len(data)), 2 * maxlag + 1))
+    fill_xcorr(out, data, maxlag, blocksize)
+    return out
+
+def series_stats(series, chunksize=65536):
+    """Mean and standard deviation of each of `series` (a list of 1D
+    arrays or h5py datasets of equal length) reading chunksize
+    samples at a time.
+
+    Returns (length, mean, std)."""
+    length = len(series[0])
+    count = 0
+    mean = np.zeros(len(series))
+    sqdev = np.zeros(len(series))
+    for start in range(0, length, chunksize):
+        chunk = read_chunk(series, start, min(length, start + chunksize))
+        size = chunk.shape[1]
+        chunkmean = chunk.mean(axis=1)
+        chunksqdev = ((chunk - chunkmean[:, np.newaxis])**2).sum(axis=1)
+        # Combine the sums of squared deviations of the two parts
+        delta = chunkmean - mean
+        total = count + size
+        sqdev += chunksqdev + delta**2 * count * size / total
+        mean += delta * size / total
+        count = total
+    return (length, mean, np.sqrt(sqdev / length))
+
+def read_chunk(series, start, stop):
+    """Samples start to stop of each of `series` as a 2D float64
+    array."""
+    return np.vstack([np.asarray(item[start:stop], dtype=np.float64) for item in series])
+
+def read_padded(series, start, stop, length, mean, std):
+    """Normalized samples start to stop of each of `series`, zero
+    outside 0 to length."""
+    ret = np.zeros((len(series), stop - start))
+    first = max(0, start)
+    last = min(length, stop)
+    if first < last:
+        chunk = read_chunk(series, first, last)
+        ret[:, first - start:last - start] = (chunk - mean[:, np.newaxis]) / std[:, np.newaxis]
+    return ret
+
+def stream_xcorr_rows(series, rows, columns, maxlag, stats, chunksize=4096):
+    """Correlations of series[i] with series[j] for i in rows and j in
+    columns for lags -maxlag to maxlag, reading the series in time
+    chunks. `stats` is as returned by series_stats.
+
+    Returns an array of shape (len(rows), len(columns), 2 * maxlag +
+    1) with the same values as util.ncc for those lags."""
+    length, mean, std, = stats
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    left = [series[ii] for ii in rows]
+    right = [series[jj] for jj in columns]
+    ret = np.zeros((len(rows), len(columns), 2 * maxlag + 1))
+    for start in range(0, length, chunksize):
+        stop = min(length, start + chunksize)
+        size = stop - start
+        # c[m] = sum_t a[t + m] b[t], so a is needed maxlag samples
+        # beyond both ends of the chunk of b
+        second = read_padded(right, start, stop, length, mean[columns], std[columns])
+        first = read_padded(left, start - maxlag, stop + maxlag, length, mean[rows], std[rows])
+        for lag in range(2 * maxlag + 1):
+            ret[:, :, lag] += np.dot(first[:, lag:lag + size], second.T)
+    ret /= length - 1
+    return ret
+
+def stream_xcorr(out, series, maxlag, blocksize=64, chunksize=4096):
+    """Write the correlations of all pairs of `series` for lags
+    -maxlag to maxlag into `out`, with rows in the order of pair_index
+    (see fill_xcorr), reading the series in time chunks.
+
+    series -- list of 1D arrays or h5py datasets of equal length.
+
+    blocksize -- number of rows of out computed in one pass over the
+    data. Memory use is blocksize * len(series) * (2 * maxlag + 1)
+    floats.
+
+    chunksize -- number of samples read at a time."""
+    count = len(series)
+    stats = series_stats(series)
+    for rowstart in range(0, count, blocksize):
+        rowend = min(count, rowstart + blocksize)
+        block = stream_xcorr_rows(series, range(rowstart, rowend), range(rowstart, count), maxlag, stats, chunksize)
+        for ii in range(rowstart, rowend):
+            row = pair_index(count, ii, ii)
+            out[row:row + count - ii] = block[ii - rowstart, ii - rowstart:]
+
+def chunk_rows(npairs, nlags, blocksize, chunkbytes=1 << 20):
+    """Number of rows per chunk of the xcorr dataset: at most
+    blocksize and about chunkbytes of float64."""
+    return max(1, min(npairs, blocksize, chunkbytes // (8 * nlags)))
+
+def create_xcorr_datasets(group, names, maxlag, plotdt=1.0, blocksize=64, compression='gzip'):
+    """Create the datasets for the correlations of all pairs of the
+    series named in `names` in the h5py group `group`:
+
+    xcorr -- 2D dataset with one row per pair, to be filled.
+
+    pairs -- (i, j) of each row of xcorr.
+
+    cells -- `names`, the name of each series.
+
+    t -- the lag of each column of xcorr, in samples times plotdt.
+
+    maxlag is in samples. Returns the xcorr dataset."""
+    npairs = pair_count(len(names))
+    nlags = 2 * maxlag + 1
+    group.create_dataset('t', data=np.arange(-maxlag, maxlag + 1) * plotdt)
+    group.create_dataset('cells', data=np.asarray(names, dtype=str))
+    group.create_dataset('pairs', data=pairs(len(names)), compression=compression)
+    return group.create_dataset('xcorr', shape=(npairs, nlags), dtype=np.float64,
+                                chunks=(chunk_rows(npairs, nlags, blocksize), nlags),
+                                compression=compression)
+
+def save_xcorr(group, names, data, plotdt=1.0, maxlag=None, blocksize=64, compression='gzip'):
+    """Save the correlations of all pairs of rows of `data` in the h5py
+    group `group`. See create_xcorr_datasets. maxlag is in samples."""
+    data = np.asarray(data)
+    if maxlag is None or maxlag > data.shape[1] - 1:
+        maxlag = data.shape[1] - 1
+    dataset = create_xcorr_datasets(group, names, maxlag, plotdt, blocksize, compression)
+    fill_xcorr(dataset, data, maxlag, blocksize)
+    return dataset
+
+#
+# xcorr.py ends here